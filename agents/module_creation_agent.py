@@ -11,6 +11,8 @@ FEATURES (STEPS 5.1-5.7):
 - STEP 5.5: Learning mode-driven structure (theory/project/interview/research)
 - STEP 5.6: PDF integration (contextual guidance)
 - STEP 5.7: Provenance & attribution tracking (source validation)
+- Parallel mode: skeleton call + concurrent per-module calls
+- Targeted regeneration: rewrite selected modules, splice back, rebalance hours
 
 INPUT:
 - ExecutionContext (user_input, retrieved_documents, web_search_results, pdf_text)
@@ -23,20 +25,25 @@ INTEGRATION:
 - Non-blocking: Failures flagged but pipeline continues
 """
 
+import asyncio
 import logging
-import json
 import math
-from typing import Optional, Dict, Any, List
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Optional, Dict, Any, List, Tuple, Union
 from datetime import datetime
 
 from schemas.user_input import UserInputSchema
 from schemas.course_outline import (
-    CourseOutlineSchema, Module, Lesson, LearningObjective, BloomLevel, Reference, SourceType
+    CourseOutlineSchema, Module, Lesson, LearningObjective, BloomLevel, Reference, SourceType,
+    ValidatorFeedbackSchema
 )
 from schemas.execution_context import ExecutionContext
 from services.llm_service import get_llm_service
+from services.outline_cache import OutlineCache, get_outline_cache
 from utils.duration_allocator import DurationAllocator
 from utils.learning_mode_templates import LearningModeTemplates
+from utils.streaming_json import IncrementalJSONParser, parse_json_document
 
 logger = logging.getLogger(__name__)
 
@@ -73,10 +80,29 @@ class ModuleCreationAgent:
     - Orchestration logic (Orchestrator)
     """
     
-    def __init__(self):
-        """Initialize with LLM service and utilities."""
+    # Two-phase generation (ExecutionContext.execution_mode = "parallel_modules"):
+    # one short skeleton call, then one concurrent call per module
+    PARALLEL_MODULES_MODE = "parallel_modules"
+    SKELETON_MAX_TOKENS = 2000
+    MODULE_MAX_TOKENS = 1500
+    
+    # Contexts of recent outlines, kept so regenerate_modules() can reuse
+    # retrieval / web / PDF context without re-running those stages
+    MAX_REMEMBERED_CONTEXTS = 64
+    
+    def __init__(self, outline_cache: Optional[OutlineCache] = None, stream_responses: bool = True):
+        """
+        Initialize with LLM service and utilities.
+        
+        Args:
+            outline_cache: Outline cache (defaults to the global cache)
+            stream_responses: Parse the LLM response while it streams
+        """
         self.llm_service = get_llm_service()
         self.duration_allocator = DurationAllocator()
+        self.outline_cache = outline_cache or get_outline_cache()
+        self.stream_responses = stream_responses
+        self._contexts: "OrderedDict[Tuple[str, str], ExecutionContext]" = OrderedDict()
     
     async def run(self, context: ExecutionContext) -> CourseOutlineSchema:
         """
@@ -101,6 +127,21 @@ class ModuleCreationAgent:
             extra={"execution_id": context.execution_id, "course": user_input.course_title}
         )
         
+        # Serve repeated requests (same input + same sources) from cache
+        cache_key = None
+        if self.outline_cache is not None:
+            cache_key = OutlineCache.make_key(context)
+            cached = self.outline_cache.get(cache_key)
+            if cached is not None:
+                logger.info(
+                    "Phase 5: Course outline served from cache",
+                    extra={"execution_id": context.execution_id, "cache_key": cache_key[:16]}
+                )
+                for module in cached.modules:
+                    context.emit("module", module)
+                self._remember_context(cached, context)
+                return cached
+        
         # 2. Pre-process duration & depth allocation (STEP 5.4)
         duration_plan = self.duration_allocator.allocate(
             total_hours=user_input.duration_hours,
@@ -114,22 +155,30 @@ class ModuleCreationAgent:
         # 4. Build multi-layer prompt (STEP 5.3)
         prompt = self._build_prompt(context, duration_plan, mode_template)
         
-        # 5. Call LLM
+        # 5-6. Call LLM and parse response (streamed: modules are parsed and
+        # built while the rest of the outline is still being generated)
         logger.debug(f"Calling LLM for outline synthesis (execution_id={context.execution_id})")
-        llm_response = await self.llm_service.generate(prompt, temperature=0.7, max_tokens=8000)
-        
-        # 6. Parse response
-        parsed_data = self._parse_llm_response(llm_response.content)
+        if context.execution_mode == self.PARALLEL_MODULES_MODE:
+            parsed_data, modules = await self._generate_parallel(context, duration_plan, mode_template)
+        elif self.stream_responses:
+            parsed_data, modules = await self._generate_streaming(prompt, context)
+        else:
+            llm_response = await self.llm_service.generate(prompt, temperature=0.7, max_tokens=8000)
+            parsed_data, modules = self._parse_llm_response(llm_response.content), None
         
         # 7. Structure into CourseOutlineSchema
         outline = self._structure_outline(
-            parsed_data, context, user_input, duration_plan, mode_template
+            parsed_data, context, user_input, duration_plan, mode_template, modules=modules
         )
         
         # 8. Validate schema
         if not isinstance(outline, CourseOutlineSchema):
             raise ValueError(f"Expected CourseOutlineSchema, got {type(outline)}")
         
+        if cache_key is not None:
+            self.outline_cache.put(cache_key, outline)
+        self._remember_context(outline, context)
+        
         logger.info(
             "Phase 5: Course outline synthesized successfully",
             extra={
@@ -142,6 +191,373 @@ class ModuleCreationAgent:
         
         return outline
     
+    async def _generate_streaming(
+        self,
+        prompt: str,
+        context: ExecutionContext,
+    ) -> Tuple[Dict[str, Any], Optional[List[Module]]]:
+        """
+        Stream the LLM response, building each Module as soon as it closes.
+        
+        Streaming consumers receive a "module" event per Module.
+        
+        Args:
+            prompt: Outline synthesis prompt
+            context: ExecutionContext (receives "module" events)
+            
+        Returns:
+            (parsed_data, modules); modules is None if any streamed module
+            was invalid, so _structure_outline rebuilds and reports it
+        """
+        parser = IncrementalJSONParser(stream_arrays=("modules",))
+        chunks: List[str] = []
+        modules: List[Module] = []
+        all_valid = True
+        
+        async for chunk in self.llm_service.generate_streaming(prompt, temperature=0.7, max_tokens=8000):
+            chunks.append(chunk)
+            for _, module_data in parser.feed(chunk):
+                try:
+                    module = self._create_module(module_data)
+                except Exception as e:
+                    logger.debug(f"Streamed module invalid, deferring to final pass: {e}")
+                    all_valid = False
+                    continue
+                modules.append(module)
+                context.emit("module", module)
+        
+        try:
+            parsed_data = parse_json_document("".join(chunks), parser=parser)
+        except ValueError as e:
+            raise ValueError(f"Unable to extract valid JSON from LLM response: {e}")
+        
+        if not all_valid or len(modules) != len(parsed_data.get("modules", [])):
+            return parsed_data, None
+        return parsed_data, modules
+    
+    async def regenerate_modules(
+        self,
+        outline: Union[CourseOutlineSchema, Dict[str, Any]],
+        module_ids: Optional[List[str]] = None,
+        feedback: Optional[Union[ValidatorFeedbackSchema, List[str], str]] = None,
+        context: Optional[ExecutionContext] = None,
+    ) -> CourseOutlineSchema:
+        """
+        Rewrite only the listed modules and splice them back into the outline.
+        
+        Retrieval, web search and PDF context are reused from the context the
+        outline was generated with; no other stage runs again. Hours of the
+        regenerated modules are rebalanced so the course total is unchanged.
+        
+        Args:
+            outline: Outline to revise (CourseOutlineSchema or dict)
+            module_ids: Modules to regenerate (default: feedback.regenerate_modules)
+            feedback: ValidatorFeedbackSchema, list of notes, or a single note
+            context: Original ExecutionContext (default: remembered from run())
+            
+        Returns:
+            New CourseOutlineSchema (input outline is not modified)
+            
+        Raises:
+            ValueError: If no modules are selected, an ID is unknown, or the
+                original context is not available
+        """
+        if isinstance(outline, dict):
+            outline = CourseOutlineSchema.model_validate(outline)
+        
+        if isinstance(feedback, ValidatorFeedbackSchema):
+            if module_ids is None:
+                module_ids = feedback.regenerate_modules
+            notes = list(feedback.feedback) + [
+                f"{key}: {value}" for key, value in (feedback.targeted_edits or {}).items()
+            ]
+        elif isinstance(feedback, str):
+            notes = [feedback]
+        else:
+            notes = list(feedback or [])
+        
+        if not module_ids:
+            raise ValueError("No modules selected for regeneration")
+        
+        known_ids = [m.module_id for m in outline.modules]
+        unknown = [module_id for module_id in module_ids if module_id not in known_ids]
+        if unknown:
+            raise ValueError(f"Unknown module IDs: {unknown}")
+        
+        context = context or self._contexts.get(self._outline_key(outline))
+        if context is None:
+            raise ValueError("Original ExecutionContext not available; pass context=")
+        
+        mode_template = LearningModeTemplates.get_template(context.user_input.learning_mode)
+        outlines = [m.model_dump(include={"module_id", "title", "description"}) for m in outline.modules]
+        selected = set(module_ids)
+        
+        logger.info(
+            f"Phase 5: Regenerating modules {sorted(selected)}",
+            extra={"execution_id": context.execution_id, "course": outline.course_title}
+        )
+        
+        async def rewrite(index: int, current: Module) -> Module:
+            prompt = self._build_regeneration_prompt(context, outlines, index, current, notes, mode_template)
+            response = await self.llm_service.generate(
+                prompt, temperature=0.7, max_tokens=self.MODULE_MAX_TOKENS
+            )
+            module_data = self._parse_llm_response(response.content)
+            module_data["module_id"] = current.module_id
+            module_data.setdefault("estimated_hours", current.estimated_hours)
+            return self._create_module(module_data)
+        
+        indices = [i for i, m in enumerate(outline.modules) if m.module_id in selected]
+        rewritten = await asyncio.gather(*(rewrite(i, outline.modules[i]) for i in indices))
+        
+        modules = list(outline.modules)
+        for index, module in zip(indices, rewritten):
+            modules[index] = module
+        modules = self._rebalance_hours(modules, selected, outline.total_duration_hours)
+        
+        revised = CourseOutlineSchema(**{
+            **outline.model_dump(exclude={"modules", "completeness_score", "generation_timestamp"}),
+            "modules": modules,
+            "completeness_score": self._calculate_completeness(modules, outline.references),
+            "generation_timestamp": datetime.now().isoformat(),
+        })
+        
+        for module in rewritten:
+            context.emit("module", module)
+        self._remember_context(revised, context)
+        return revised
+    
+    @staticmethod
+    def _rebalance_hours(
+        modules: List[Module],
+        regenerated_ids: set,
+        total_hours: float,
+    ) -> List[Module]:
+        """
+        Scale regenerated modules' hours so the course total is preserved.
+        
+        Untouched modules keep their hours; the regenerated ones share the
+        rest in proportion to their proposed hours. If the untouched modules
+        already exceed the total, every module is scaled instead.
+        """
+        fixed = sum(m.estimated_hours for m in modules if m.module_id not in regenerated_ids)
+        flexible = [m for m in modules if m.module_id in regenerated_ids]
+        proposed = sum(m.estimated_hours for m in flexible)
+        
+        available = total_hours - fixed
+        if available > 0 and proposed > 0:
+            scale, scaled_ids = available / proposed, regenerated_ids
+        else:
+            scale = total_hours / sum(m.estimated_hours for m in modules)
+            scaled_ids = {m.module_id for m in modules}
+        
+        return [
+            m.model_copy(update={"estimated_hours": round(m.estimated_hours * scale, 2)})
+            if m.module_id in scaled_ids else m
+            for m in modules
+        ]
+    
+    def _build_regeneration_prompt(
+        self,
+        context: ExecutionContext,
+        outlines: List[Dict[str, Any]],
+        index: int,
+        current: Module,
+        notes: List[str],
+        mode_template: Dict[str, Any],
+    ) -> str:
+        """Prompt to rewrite one existing module using reviewer feedback."""
+        plan = "\n".join(
+            f"{'→' if i == index else ' '} {m['module_id']}: {m['title']}"
+            for i, m in enumerate(outlines)
+        )
+        feedback_lines = "\n".join(f"- {note}" for note in notes) or "- Improve depth and measurability"
+        current_json = current.model_dump_json(
+            include={"title", "description", "estimated_hours", "learning_objectives", "lessons", "assessment_type"}
+        )
+        
+        return f"""You are an expert curriculum designer. Revise ONE module of an existing course outline.
+
+OUTPUT FORMAT (STRICT JSON ONLY):
+{{
+  "title": "string",
+  "description": "module overview",
+  "estimated_hours": 6.0,
+  "learning_objectives": [
+    {{"statement": "measurable objective", "bloom_level": "understand|apply|analyze", "assessment_method": "quiz|project|discussion"}}
+  ],
+  "lessons": [{{"title": "string", "duration_minutes": 60, "key_concepts": ["concept"]}}],
+  "assessment_type": "quiz|project|exam|capstone",
+  "prerequisites": ["string"],
+  "has_capstone": false
+}}
+CRITICAL: Return ONLY valid JSON.
+
+{self._build_user_section(context.user_input)}
+
+{self._summarize_context(context)}
+
+COURSE PLAN (revise the module marked →):
+{plan}
+
+CURRENT MODULE:
+{current_json}
+
+REVIEWER FEEDBACK:
+{feedback_lines}
+
+REQUIREMENTS:
+- Address every feedback point
+- 3-5 objectives (specific, measurable)
+- Mode emphasis: {', '.join(mode_template['assessment_emphasis']['primary'])}
+- Do not repeat content of other modules
+
+Generate the revised module."""
+    
+    @staticmethod
+    def _outline_key(outline: CourseOutlineSchema) -> Tuple[str, str]:
+        """Identity of one generated outline (for context reuse)."""
+        return (outline.course_title, outline.generation_timestamp)
+    
+    def _remember_context(self, outline: CourseOutlineSchema, context: ExecutionContext) -> None:
+        """Keep the synthesis context of a recent outline (bounded LRU)."""
+        key = self._outline_key(outline)
+        self._contexts[key] = replace(context, event_listener=None)  # Don't pin stream consumers
+        self._contexts.move_to_end(key)
+        while len(self._contexts) > self.MAX_REMEMBERED_CONTEXTS:
+            self._contexts.popitem(last=False)
+    
+    async def _generate_parallel(
+        self,
+        context: ExecutionContext,
+        duration_plan: Dict[str, Any],
+        mode_template: Dict[str, Any],
+    ) -> Tuple[Dict[str, Any], List[Module]]:
+        """
+        Two-phase synthesis: skeleton first, then every module concurrently.
+        
+        Wall-clock time is roughly the skeleton call plus the slowest module
+        call, instead of one long call that grows with the module count.
+        
+        Args:
+            context: ExecutionContext (receives "module" events)
+            duration_plan: DurationAllocator output
+            mode_template: Learning mode template
+            
+        Returns:
+            (parsed_data, modules) in skeleton order
+        """
+        # Phase A: titles, hours and course-level fields only
+        skeleton_prompt = self._build_skeleton_prompt(context, duration_plan, mode_template)
+        skeleton_response = await self.llm_service.generate(
+            skeleton_prompt, temperature=0.7, max_tokens=self.SKELETON_MAX_TOKENS
+        )
+        skeleton = self._parse_llm_response(skeleton_response.content)
+        outlines = skeleton.get("modules", [])
+        if not outlines:
+            raise ValueError("Skeleton response contained no modules")
+        
+        # Phase B: fill in lessons/objectives for every module at once
+        async def fill(index: int, module_outline: Dict[str, Any]) -> Tuple[Dict[str, Any], Module]:
+            prompt = self._build_module_prompt(context, outlines, index, mode_template)
+            response = await self.llm_service.generate(
+                prompt, temperature=0.7, max_tokens=self.MODULE_MAX_TOKENS
+            )
+            detail = self._parse_llm_response(response.content)
+            # Skeleton owns identity and hours; the module call owns the content
+            module_data = {**detail, **{k: v for k, v in module_outline.items() if v is not None}}
+            module_data.setdefault("module_id", f"M_{index + 1}")
+            module = self._create_module(module_data)
+            context.emit("module", module)
+            return module_data, module
+        
+        filled = await asyncio.gather(*(fill(i, m) for i, m in enumerate(outlines)))
+        
+        parsed_data = dict(skeleton)
+        parsed_data["modules"] = [module_data for module_data, _ in filled]
+        return parsed_data, [module for _, module in filled]
+    
+    def _build_skeleton_prompt(
+        self,
+        context: ExecutionContext,
+        duration_plan: Dict[str, Any],
+        mode_template: Dict[str, Any],
+    ) -> str:
+        """Prompt for the skeleton call (module titles and hours, no lessons)."""
+        user_input = context.user_input
+        
+        return f"""You are an expert curriculum designer. Plan the module structure of a course based on Bloom's taxonomy.
+
+OUTPUT FORMAT (STRICT JSON ONLY):
+{{
+  "course_summary": "150-300 word overview",
+  "modules": [
+    {{"module_id": "M_1", "title": "string", "description": "module overview", "estimated_hours": 6.0}}
+  ],
+  "course_level_objectives": [{{"statement": "string", "bloom_level": "string"}}],
+  "references": [{{"title": "string", "source_type": "retrieved|web|pdf", "confidence_score": 0.85}}]
+}}
+CRITICAL: Return ONLY valid JSON.
+
+{self._build_user_section(user_input)}
+
+{self._summarize_context(context)}
+
+REQUIREMENTS:
+- {duration_plan['num_modules']} modules, ~{duration_plan['avg_hours_per_module']:.1f}h each
+- Total: ~{user_input.duration_hours}h
+- Mode emphasis: {', '.join(mode_template['assessment_emphasis']['primary'])}
+- Logically sequenced
+- No lessons or objectives yet (filled in per module)
+
+Generate the module plan."""
+    
+    def _build_module_prompt(
+        self,
+        context: ExecutionContext,
+        outlines: List[Dict[str, Any]],
+        index: int,
+        mode_template: Dict[str, Any],
+    ) -> str:
+        """Prompt for one module of the skeleton (lessons and objectives)."""
+        user_input = context.user_input
+        module = outlines[index]
+        plan = "\n".join(
+            f"{'→' if i == index else ' '} {m.get('module_id', f'M_{i + 1}')}: {m.get('title', '')}"
+            for i, m in enumerate(outlines)
+        )
+        
+        return f"""You are an expert curriculum designer. Write ONE module of a course outline.
+
+OUTPUT FORMAT (STRICT JSON ONLY):
+{{
+  "learning_objectives": [
+    {{"statement": "measurable objective", "bloom_level": "understand|apply|analyze", "assessment_method": "quiz|project|discussion"}}
+  ],
+  "lessons": [{{"title": "string", "duration_minutes": 60, "key_concepts": ["concept"]}}],
+  "assessment_type": "quiz|project|exam|capstone",
+  "prerequisites": ["string"],
+  "has_capstone": false
+}}
+CRITICAL: Return ONLY valid JSON.
+
+{self._build_user_section(user_input)}
+
+COURSE PLAN (write the module marked →):
+{plan}
+
+MODULE: {module.get('title', '')}
+Description: {module.get('description', '')}
+Hours: {module.get('estimated_hours', '')}
+
+REQUIREMENTS:
+- 3-5 objectives (specific, measurable)
+- Lessons fit within the module hours
+- Mode emphasis: {', '.join(mode_template['assessment_emphasis']['primary'])}
+- Do not repeat content of other modules
+
+Generate the module."""
+    
     def _validate_context(self, context: ExecutionContext):
         """
         STEP 5.2: Validate execution context.
@@ -209,12 +625,7 @@ class ModuleCreationAgent:
 CRITICAL: Return ONLY valid JSON."""
         
         # LAYER 3: User input
-        user_section = f"""USER INPUT:
-Title: {user_input.course_title}
-Description: {user_input.course_description}
-Audience: {user_input.audience_level} ({user_input.audience_category})
-Depth: {user_input.depth_requirement}
-Duration: {user_input.duration_hours}h | Mode: {user_input.learning_mode}"""
+        user_section = self._build_user_section(user_input)
         
         # LAYER 4: Context (trimmed)
         context_section = self._summarize_context(context)
@@ -245,6 +656,15 @@ Generate the course outline."""
         
         return full_prompt
     
+    def _build_user_section(self, user_input: UserInputSchema) -> str:
+        """STEP 5.3: User input layer (shared by all prompt variants)."""
+        return f"""USER INPUT:
+Title: {user_input.course_title}
+Description: {user_input.course_description}
+Audience: {user_input.audience_level} ({user_input.audience_category})
+Depth: {user_input.depth_requirement}
+Duration: {user_input.duration_hours}h | Mode: {user_input.learning_mode}"""
+    
     def _summarize_context(self, context: ExecutionContext) -> str:
         """STEP 5.4: Summarize multi-source context."""
         sections = []
@@ -311,50 +731,15 @@ Generate the course outline."""
         """
         Parse LLM JSON response with fallback handling.
         
-        Handles:
+        Handles (single pass, see utils/streaming_json.py):
         - Clean JSON
         - JSON in markdown code blocks
         - JSON in text with extra content
         """
-        
-        response = response.strip()
-        
-        # Try 1: Direct JSON
         try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            pass
-        
-        # Try 2: Extract from markdown code block
-        if "```json" in response:
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            if end > start:
-                try:
-                    return json.loads(response[start:end].strip())
-                except json.JSONDecodeError:
-                    pass
-        
-        # Try 3: Extract from code block without language tag
-        if "```" in response:
-            start = response.find("```") + 3
-            end = response.find("```", start)
-            if end > start:
-                try:
-                    return json.loads(response[start:end].strip())
-                except json.JSONDecodeError:
-                    pass
-        
-        # Try 4: Find JSON object in text
-        start = response.find("{")
-        end = response.rfind("}") + 1
-        if start >= 0 and end > start:
-            try:
-                return json.loads(response[start:end])
-            except json.JSONDecodeError:
-                pass
-        
-        raise ValueError(f"Unable to extract valid JSON from LLM response: {response[:200]}...")
+            return parse_json_document(response)
+        except ValueError:
+            raise ValueError(f"Unable to extract valid JSON from LLM response: {response[:200]}...")
     
     def _structure_outline(
         self,
@@ -362,11 +747,15 @@ Generate the course outline."""
         context: ExecutionContext,
         user_input: UserInputSchema,
         duration_plan: Dict[str, Any],
-        mode_template: Dict[str, Any]
+        mode_template: Dict[str, Any],
+        modules: Optional[List[Module]] = None,
     ) -> CourseOutlineSchema:
         """
         STEP 5.1: Assemble into CourseOutlineSchema with validation.
         
+        `modules` may be passed in when they were already built while the
+        response streamed; otherwise they are built from parsed_data.
+        
         Applies business rules:
         - Enforce duration constraints
         - Validate module structure
@@ -375,10 +764,8 @@ Generate the course outline."""
         """
         
         # Create modules from parsed data
-        modules = []
-        for module_data in parsed_data.get("modules", []):
-            module = self._create_module(module_data)
-            modules.append(module)
+        if modules is None:
+            modules = [self._create_module(module_data) for module_data in parsed_data.get("modules", [])]
         
         # Build references with complete provenance (STEP 5.7)
         references = self._build_references(parsed_data, context)
@@ -10,6 +10,12 @@ Responsibility:
 - Validate output
 - Log execution
 
+Steps 4-8 are declared as a stage graph (see agents/pipeline.py):
+
+    retrieval ───────┐
+    web_search ──────┼──→ module_creation ──→ validation ──→ persistence
+    pdf_extraction ──┘
+
 Explicitly NOT responsible for:
 - Calling LLM directly (delegated to agents)
 - Deciding content logic (delegated to ModuleCreationAgent)
@@ -21,20 +27,89 @@ Explicitly NOT responsible for:
 ⚠️ Phase 2 Constraint: Orchestrator calls exactly ONE agent.
 """
 
+import asyncio
+import copy
 import logging
-from typing import Optional, Union
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from uuid import uuid4
 
 from schemas.user_input import UserInputSchema
 from schemas.course_outline import CourseOutlineSchema
 from schemas.execution_context import ExecutionContext
+from schemas.retrieval_agent_output import RetrievalAgentOutput
+from schemas.web_search_agent_output import WebSearchAgentOutput
 from agents.module_creation_agent import ModuleCreationAgent, get_module_creation_agent
+from agents.pipeline import PipelineEngine, PipelineStage
 from agents.retrieval_agent import RetrievalAgent
 from agents.web_search_agent import WebSearchAgent
+from services.llm_service import LLMRateLimiter, RateLimitedLLMService
+from tools.pdf_loader import PDFProcessor
+from utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class BatchResult:
+    """One finished item of CourseOrchestratorAgent.run_many()."""
+    
+    index: int  # Position in the submitted batch
+    outline: Optional[dict] = None  # CourseOutlineSchema as dict on success
+    error: Optional[Exception] = None  # Failure for this item (batch continues)
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class StreamEvent:
+    """
+    Progress event yielded by CourseOrchestratorAgent.stream().
+    
+    Types:
+    - "stage":   {"stage": name, "status": ..., "elapsed_ms": ...}
+    - "module":  Module, as soon as the LLM has finished writing it
+    - "outline": final CourseOutlineSchema as dict (always the last event)
+    """
+    
+    type: str
+    data: Any
+
+
+class _SharedRequest:
+    """Progress of one coalesced generation, replayed to every caller that joins it."""
+    
+    def __init__(self, deadline: float):
+        self.events: List[StreamEvent] = []
+        self.listeners: List[Callable[[StreamEvent], None]] = []
+        self.callers = 0  # Callers currently waiting for the outline
+        self.deadline = deadline  # Latest deadline among the callers (time.monotonic())
+        self.context: Optional[ExecutionContext] = None  # Set once the generation starts
+    
+    def extend(self, deadline: float) -> None:
+        """Keep the generation running until a later-joining caller's deadline."""
+        if deadline > self.deadline:
+            self.deadline = deadline
+            if self.context is not None:
+                self.context.deadline = deadline
+    
+    def publish(self, event_type: str, data: Any) -> None:
+        """Event listener for the generation's ExecutionContext."""
+        event = StreamEvent(event_type, data)
+        self.events.append(event)
+        for listener in list(self.listeners):
+            listener(event)
+    
+    def subscribe(self, listener: Callable[[StreamEvent], None]) -> None:
+        """Deliver every event so far, then each new one."""
+        for event in self.events:
+            listener(event)
+        self.listeners.append(listener)
+
+
 class CourseOrchestratorAgent:
     """
     Single-pass orchestrator for Phase 2.
@@ -47,49 +122,222 @@ class CourseOrchestratorAgent:
     - ExecutionContext: Data structuring
     """
     
-    def __init__(self):
-        """Initialize orchestrator with agents for all phases."""
+    # Per-agent deadlines for the enrichment stage (seconds)
+    RETRIEVAL_TIMEOUT_SECONDS = 15.0
+    WEB_SEARCH_TIMEOUT_SECONDS = 20.0
+    
+    # End-to-end budget for one run() call (seconds)
+    REQUEST_TIMEOUT_SECONDS = 90.0
+    
+    # Agents are asked to wrap up this long before their stage deadline, so
+    # partial results arrive before the stage is cancelled
+    AGENT_DEADLINE_MARGIN_SECONDS = 0.25
+    
+    def __init__(
+        self,
+        retrieval_timeout: Optional[float] = None,
+        web_search_timeout: Optional[float] = None,
+        db_service=None,
+        request_timeout: Optional[float] = None,
+        execution_mode: str = "single_pass",
+    ):
+        """
+        Initialize orchestrator with agents for all phases.
+        
+        Args:
+            retrieval_timeout: Deadline for RetrievalAgent (seconds)
+            web_search_timeout: Deadline for WebSearchAgent (seconds)
+            db_service: Optional BaseDatabase; enables the persistence stage
+            request_timeout: Default end-to-end budget per run() (seconds)
+            execution_mode: "single_pass" (one LLM call) or "parallel_modules"
+                (skeleton + concurrent per-module calls)
+        """
         self.module_agent = get_module_creation_agent()  # Phase 5 singleton
         self.retrieval_agent = RetrievalAgent()
         self.web_search_agent = WebSearchAgent()
+        self.retrieval_timeout = self.RETRIEVAL_TIMEOUT_SECONDS if retrieval_timeout is None else retrieval_timeout
+        self.web_search_timeout = self.WEB_SEARCH_TIMEOUT_SECONDS if web_search_timeout is None else web_search_timeout
+        self.request_timeout = self.REQUEST_TIMEOUT_SECONDS if request_timeout is None else request_timeout
+        self.execution_mode = execution_mode
+        self.db_service = db_service
+        self.request_coalescer = SingleFlight()  # Dedupes identical in-flight run()/stream() calls
+        self._shared_requests: Dict[asyncio.Future, _SharedRequest] = {}  # Keyed by the shared task
+        self.query_coalescer: Optional[SingleFlight] = None  # Set per batch by run_many()
         self.logger = logger
+        self.pipeline = PipelineEngine(self._build_stages())
+    
+    def _build_stages(self) -> List[PipelineStage]:
+        """
+        Declare Steps 4-8 as a stage graph.
+        
+        Enrichment stages are non-blocking with their own deadlines; synthesis
+        and validation are blocking. Persistence is only wired when a database
+        service was supplied.
+        """
+        stages = [
+            PipelineStage(
+                name="retrieval",
+                run=self._run_retrieval,
+                outputs=("retrieved_documents",),
+                timeout=self.retrieval_timeout,
+                blocking=False,
+            ),
+            PipelineStage(
+                name="web_search",
+                run=self._run_web_search,
+                outputs=("web_search_results",),
+                timeout=self.web_search_timeout,
+                blocking=False,
+            ),
+            PipelineStage(
+                name="pdf_extraction",
+                run=self._run_pdf_extraction,
+                outputs=("uploaded_pdf_text",),
+                blocking=False,
+            ),
+            PipelineStage(
+                name="module_creation",
+                run=self._run_module_creation,
+                inputs=("retrieved_documents", "web_search_results", "uploaded_pdf_text"),
+                outputs=("generated_outline",),
+            ),
+            PipelineStage(
+                name="validation",
+                run=self._run_validation,
+                inputs=("generated_outline",),
+            ),
+        ]
+        
+        if self.db_service is not None:
+            stages.append(
+                PipelineStage(
+                    name="persistence",
+                    run=self._run_persistence,
+                    inputs=("generated_outline",),
+                    outputs=("persisted_course_id",),
+                    after=("validation",),
+                    blocking=False,
+                )
+            )
+        
+        return stages
     
     async def run(
         self,
         user_input: Union[UserInputSchema, dict],
         session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
     ) -> dict:
         """
         Execute single-pass course generation.
         
-        Phase 2: Straight-through pipeline
-        - No validation agent
-        - No web search
-        - No PDF retrieval
-        - No retry logic
+        Runs the stage graph built by _build_stages():
+        - Retrieval, web search and PDF extraction in parallel (non-blocking)
+        - Module creation once enrichment has settled
+        - Schema validation, then optional persistence
+        - No retry logic (Phase 6)
+        
+        Concurrent run() and stream() calls with the same normalized input
+        (see UserInputSchema.fingerprint) share one generation. It runs until
+        the latest of their deadlines; each caller stops waiting at its own.
+        
+        The whole request runs under one deadline: enrichment agents return
+        partial results as it approaches, and anything still running once it
+        is spent is cancelled.
         
         Args:
             user_input: UserInputSchema or dict with educator requirements
             session_id: Session identifier for logging/persistence
+            timeout: End-to-end budget in seconds (default: request_timeout)
             
         Returns:
             CourseOutlineSchema as dict with generated course outline
             
         Raises:
             ValueError: If input invalid or output doesn't match schema
-            TimeoutError: If LLM times out
+            TimeoutError: If the request deadline is spent before an outline exists
             RuntimeError: If LLM service fails
         """
         
         # Step 1: Normalize input
         user_input = self._validate_and_normalize_input(user_input)
         
+        # Identical in-flight requests share one generation; each caller
+        # waits no longer than its own budget and gets its own copy of the result
+        budget = self.request_timeout if timeout is None else timeout
+        deadline = time.monotonic() + budget
+        task, shared = self._join_request(user_input, session_id, deadline)
+        shared.callers += 1
+        try:
+            outline = await asyncio.wait_for(asyncio.shield(task), timeout=self._time_left(deadline))
+        except asyncio.TimeoutError:
+            if task.done():
+                raise  # The generation itself ran out of time
+            raise TimeoutError(f"No outline within the request budget of {budget:.2f}s") from None
+        finally:
+            shared.callers -= 1
+        return copy.deepcopy(outline)
+    
+    def _join_request(
+        self,
+        user_input: UserInputSchema,
+        session_id: Optional[str],
+        deadline: float,
+    ) -> Tuple[asyncio.Future, _SharedRequest]:
+        """
+        Join the in-flight generation of an identical request, or start one.
+        
+        A joined generation's deadline is pushed out to this caller's, so
+        it is not cut short by an earlier caller with a smaller budget.
+        
+        Returns:
+            (shared generation task, its replayable progress events)
+        """
+        shared = _SharedRequest(deadline)
+        task = self.request_coalescer.start(
+            self._request_key(user_input, session_id),
+            lambda: self._generate(user_input, session_id, shared),
+        )
+        if task not in self._shared_requests:  # Started by this call
+            self._shared_requests[task] = shared
+            task.add_done_callback(self._shared_requests.pop)
+            return task, shared
+        shared = self._shared_requests[task]
+        shared.extend(deadline)
+        return task, shared
+    
+    @staticmethod
+    def _time_left(deadline: float) -> float:
+        """Seconds until a time.monotonic() deadline (never negative)."""
+        return max(0.0, deadline - time.monotonic())
+    
+    def _request_key(self, user_input: UserInputSchema, session_id: Optional[str]) -> tuple:
+        """
+        Coalescing key for a request.
+        
+        Persistence is per session, so with a database configured only
+        requests from the same session are merged.
+        """
+        if self.db_service is not None:
+            return (user_input.fingerprint(), session_id)
+        return (user_input.fingerprint(),)
+    
+    async def _generate(
+        self,
+        user_input: UserInputSchema,
+        session_id: Optional[str],
+        shared: _SharedRequest,
+    ) -> dict:
+        """Run Steps 2-8 for one (already normalized) request."""
         # Step 2: Build execution context
         context = ExecutionContext(
             user_input=user_input,
             session_id=session_id or str(uuid4()),
-            execution_mode="single_pass",
+            execution_mode=self.execution_mode,
+            deadline=shared.deadline,
+            event_listener=shared.publish,
         )
+        shared.context = context
         
         # Step 3: Log execution start
         self.logger.info(
@@ -102,76 +350,302 @@ class CourseOrchestratorAgent:
             }
         )
         
-        # Step 4: Call RetrievalAgent (Phase 3 - gets institutional knowledge)
+        # Steps 4-7: Run stage graph (enrichment in parallel → synthesis → validation)
         try:
-            retrieval_output = await self.retrieval_agent.run(context)
-            context.retrieved_documents = retrieval_output.to_dict()
-            
-            self.logger.info(
-                f"Retrieval complete: {retrieval_output.returned_count} chunks retrieved",
-                extra={
-                    "execution_id": context.execution_id,
-                    "retrieval_confidence": retrieval_output.retrieval_confidence,
-                }
-            )
+            await self.pipeline.run(context)
         except Exception as e:
-            self.logger.warning(
-                f"Retrieval failed (non-blocking): {str(e)}",
-                extra={"execution_id": context.execution_id},
-            )
-            # Phase 3 is non-blocking: if retrieval fails, continue to generation
-            context.retrieved_documents = None
-        
-        # Step 5: Call WebSearchAgent (Phase 4 - gets public knowledge)
-        try:
-            web_search_output = await self.web_search_agent.run(context)
-            context.web_search_results = web_search_output.to_dict()
-            
-            self.logger.info(
-                f"Web search complete: {web_search_output.result_count} external results, "
-                f"confidence={web_search_output.confidence_score:.2f}",
+            self.logger.error(
+                f"Pipeline failed: {str(e)}",
                 extra={
                     "execution_id": context.execution_id,
-                    "web_search_tool": web_search_output.tool_used.value,
-                    "web_search_confidence": web_search_output.confidence_score,
-                }
-            )
-        except Exception as e:
-            self.logger.warning(
-                f"Web search failed (non-blocking): {str(e)}",
-                extra={"execution_id": context.execution_id},
-            )
-            # Phase 4 is non-blocking: if web search fails, continue to generation
-            context.web_search_results = None
-        
-        # Step 6: Call ModuleCreationAgent (now uses both institutional + public knowledge)
-        try:
-            outline = await self.module_agent.run(context)
-        except Exception as e:
-            self.logger.error(
-                f"Module agent failed: {str(e)}",
-                extra={"execution_id": context.execution_id},
+                    "stage_status": context.stage_status,
+                },
                 exc_info=True,
             )
             raise
         
-        # Step 7: Validate output
-        if not isinstance(outline, CourseOutlineSchema):
-            raise ValueError(f"Expected CourseOutlineSchema, got {type(outline)}")
+        outline = context.generated_outline
         
-        # Step 8: Log completion
+        # Log completion
         self.logger.info(
             "Course generation complete",
             extra={
                 "execution_id": context.execution_id,
                 "modules": len(outline.modules),
                 "duration_hours": outline.total_duration_hours,
+                "stage_timings": context.stage_timings,
             }
         )
         
         # Convert to dict for downstream consumers
         return outline.model_dump()
     
+    async def stream(
+        self,
+        user_input: Union[UserInputSchema, dict],
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Execute course generation, yielding progress as it happens.
+        
+        Same pipeline as run(), but the caller sees each stage finish and
+        each Module as soon as its JSON closes in the LLM stream, instead of
+        waiting for the whole outline. Like run(), a stream joins the
+        in-flight generation of an identical request: events emitted before
+        it joined are replayed first. Closing the stream early cancels the
+        generation only if no other caller is waiting for it.
+        
+        Args:
+            user_input: UserInputSchema or dict with educator requirements
+            session_id: Session identifier for logging/persistence
+            timeout: End-to-end budget in seconds (default: request_timeout)
+            
+        Yields:
+            StreamEvent items; the last one is the "outline" event
+            
+        Raises:
+            Same as run()
+        """
+        user_input = self._validate_and_normalize_input(user_input)
+        events: asyncio.Queue = asyncio.Queue()
+        
+        budget = self.request_timeout if timeout is None else timeout
+        deadline = time.monotonic() + budget
+        task, shared = self._join_request(user_input, session_id, deadline)
+        shared.callers += 1
+        shared.subscribe(events.put_nowait)
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=self._time_left(deadline))
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"No outline within the request budget of {budget:.2f}s") from None
+                if event is None:
+                    break
+                yield event
+            yield StreamEvent("outline", copy.deepcopy(task.result()))
+        finally:
+            shared.callers -= 1
+            if events.put_nowait in shared.listeners:
+                shared.listeners.remove(events.put_nowait)
+            if not task.done() and shared.callers == 0:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+    
+    async def run_many(
+        self,
+        user_inputs: Iterable[Union[UserInputSchema, dict]],
+        max_concurrency: int = 4,
+        llm_requests_per_minute: Optional[float] = None,
+        llm_max_concurrent: Optional[int] = None,
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Generate outlines for a whole batch (e.g., an overnight catalogue run).
+        
+        - At most max_concurrency outlines are in flight; inputs are pulled
+          lazily, so memory depends on the concurrency limit, not batch size
+        - All LLM calls in the batch share one rate budget
+        - Identical retrieval / web search queries run once per batch
+        - Results stream back in completion order as BatchResult items;
+          a failed item does not stop the batch
+        
+        Args:
+            user_inputs: Iterable of UserInputSchema or dict
+            max_concurrency: Outlines generated at the same time
+            llm_requests_per_minute: Shared LLM pacing budget (None = unlimited)
+            llm_max_concurrent: Shared cap on in-flight LLM calls (None = unlimited)
+            
+        Yields:
+            BatchResult per input, as each one finishes
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        
+        limiter = None
+        if llm_requests_per_minute or llm_max_concurrent:
+            limiter = LLMRateLimiter(llm_requests_per_minute, llm_max_concurrent)
+        batch = self._batch_view(SingleFlight(memoize=True), limiter)
+        
+        inputs: asyncio.Queue = asyncio.Queue(maxsize=max_concurrency)
+        results: asyncio.Queue = asyncio.Queue(maxsize=max_concurrency)
+        
+        async def feed() -> None:
+            for index, user_input in enumerate(user_inputs):
+                await inputs.put((index, user_input))
+            for _ in range(max_concurrency):
+                await inputs.put(None)
+        
+        async def work() -> None:
+            while True:
+                item = await inputs.get()
+                if item is None:
+                    break
+                index, user_input = item
+                try:
+                    outline = await batch.run(user_input)
+                    await results.put(BatchResult(index=index, outline=outline))
+                except Exception as e:
+                    await results.put(BatchResult(index=index, error=e))
+            # Not in a finally: a worker cancelled because the consumer stopped
+            # reading would block forever on the full results queue
+            await results.put(None)
+        
+        feeder = asyncio.ensure_future(feed())
+        workers = [asyncio.ensure_future(work()) for _ in range(max_concurrency)]
+        
+        # The feeder is watched alongside the results: if the input iterable
+        # raises, no end markers are queued and the workers would wait forever
+        getter: Optional[asyncio.Future] = None
+        watched = {feeder}
+        try:
+            active = len(workers)
+            while active:
+                if getter is None:
+                    getter = asyncio.ensure_future(results.get())
+                done, _ = await asyncio.wait({getter, *watched}, return_when=asyncio.FIRST_COMPLETED)
+                if feeder in done:
+                    watched = set()
+                    if feeder.exception() is not None:
+                        await feeder  # Surface errors raised by the input iterable
+                if getter not in done:
+                    continue
+                result, getter = getter.result(), None
+                if result is None:
+                    active -= 1
+                    continue
+                yield result
+            await feeder
+        finally:
+            pending = [feeder, *workers] + ([getter] if getter is not None else [])
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.logger.info("Batch generation finished", extra={"coalescing": batch.query_coalescer.stats()})
+    
+    def _batch_view(
+        self,
+        coalescer: SingleFlight,
+        limiter: Optional[LLMRateLimiter],
+    ) -> "CourseOrchestratorAgent":
+        """
+        Shallow copy of this orchestrator scoped to one batch.
+        
+        Shares the (stateless) agents, but carries the batch's query
+        coalescer and, if requested, a module agent whose LLM calls go
+        through the batch's rate limiter. The module agent singleton itself
+        is never mutated.
+        """
+        batch = copy.copy(self)
+        batch.query_coalescer = coalescer
+        if limiter is not None:
+            batch.module_agent = copy.copy(self.module_agent)
+            batch.module_agent.llm_service = RateLimitedLLMService(
+                self.module_agent.llm_service, limiter
+            )
+        batch.pipeline = PipelineEngine(batch._build_stages())
+        return batch
+    
+    async def _run_retrieval(self, context: ExecutionContext) -> None:
+        """Step 4: Call RetrievalAgent (Phase 3 - gets institutional knowledge)."""
+        agent_context = context.with_deadline(
+            self.retrieval_timeout, margin=self.AGENT_DEADLINE_MARGIN_SECONDS
+        )
+        if self.query_coalescer is None:
+            retrieval_output = await self.retrieval_agent.run(agent_context)
+        else:
+            user_input = context.user_input
+            filters = self.retrieval_agent._build_metadata_filters(user_input) or {}
+            key = (
+                "retrieval",
+                tuple(self.retrieval_agent._generate_search_queries(user_input)),
+                tuple(sorted(filters.items())),
+            )
+            retrieval_output = await self.query_coalescer.do(
+                key,
+                lambda: self.retrieval_agent.run(agent_context),
+                cacheable=self._complete_retrieval,
+            )
+        context.retrieved_documents = retrieval_output.to_dict()
+        
+        self.logger.info(
+            f"Retrieval complete: {retrieval_output.returned_count} chunks retrieved",
+            extra={
+                "execution_id": context.execution_id,
+                "retrieval_confidence": retrieval_output.retrieval_confidence,
+            }
+        )
+    
+    async def _run_web_search(self, context: ExecutionContext) -> None:
+        """Step 5: Call WebSearchAgent (Phase 4 - gets public knowledge)."""
+        agent_context = context.with_deadline(
+            self.web_search_timeout, margin=self.AGENT_DEADLINE_MARGIN_SECONDS
+        )
+        if self.query_coalescer is None:
+            web_search_output = await self.web_search_agent.run(agent_context)
+        else:
+            user_input = context.user_input
+            queries = await self.web_search_agent._generate_search_queries(user_input)
+            # Synthesis reads the title and description as well as the queries
+            key = ("web_search", tuple(queries), user_input.course_title, user_input.course_description)
+            web_search_output = await self.query_coalescer.do(
+                key,
+                lambda: self.web_search_agent.run(agent_context),
+                cacheable=self._complete_web_search,
+            )
+        context.web_search_results = web_search_output.to_dict()
+        
+        self.logger.info(
+            f"Web search complete: {web_search_output.result_count} external results, "
+            f"confidence={web_search_output.confidence_score:.2f}",
+            extra={
+                "execution_id": context.execution_id,
+                "web_search_tool": web_search_output.tool_used.value,
+                "web_search_confidence": web_search_output.confidence_score,
+            }
+        )
+    
+    @staticmethod
+    def _complete_retrieval(output: RetrievalAgentOutput) -> bool:
+        """False for the degraded output RetrievalAgent returns on errors or at the deadline."""
+        return output.retrieval_confidence > 0 and "(partial:" not in (output.execution_notes or "")
+    
+    @staticmethod
+    def _complete_web_search(output: WebSearchAgentOutput) -> bool:
+        """False for the degraded output WebSearchAgent returns on errors or at the deadline."""
+        return output.confidence_score > 0 and not (output.search_notes or "").startswith("Partial results")
+    
+    async def _run_pdf_extraction(self, context: ExecutionContext) -> None:
+        """Extract text from the educator's uploaded PDF (if any)."""
+        pdf_path = getattr(context.user_input, "pdf_path", None)
+        if not pdf_path:
+            return
+        
+        loop = asyncio.get_running_loop()
+        context.uploaded_pdf_text = await loop.run_in_executor(
+            None, PDFProcessor.extract_text, pdf_path
+        ) or None
+    
+    async def _run_module_creation(self, context: ExecutionContext) -> None:
+        """Step 6: Call ModuleCreationAgent (uses institutional + public knowledge)."""
+        context.generated_outline = await self.module_agent.run(context)
+    
+    async def _run_validation(self, context: ExecutionContext) -> None:
+        """Step 7: Validate output (schema gate; Phase 6 rubric plugs in here)."""
+        outline = context.generated_outline
+        if not isinstance(outline, CourseOutlineSchema):
+            raise ValueError(f"Expected CourseOutlineSchema, got {type(outline)}")
+    
+    async def _run_persistence(self, context: ExecutionContext) -> None:
+        """Step 8: Persist the validated outline."""
+        context.persisted_course_id = await self.db_service.save_course(
+            user_id=context.session_id,
+            course_data=context.generated_outline.model_dump(),
+            session_id=context.session_id,
+        )
+    
     def _validate_and_normalize_input(
         self,
         user_input: Union[UserInputSchema, dict]
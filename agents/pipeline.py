@@ -0,0 +1,238 @@
+"""
+PHASE 2+: Pipeline Engine
+
+Declarative stage graph that replaces the orchestrator's hard-coded Steps 1-8.
+
+Each stage declares which ExecutionContext fields it reads (inputs) and which
+it writes (outputs). The engine derives the dependency graph from those
+declarations and:
+- Runs independent stages concurrently
+- Skips stages whose outputs are already cached on the context
+- Applies a per-stage deadline, clamped to the request deadline
+  (ExecutionContext.deadline); once the budget is spent, stages that have
+  not started are skipped and running ones are cancelled
+- Records per-stage timings and status in ExecutionContext (and emits a
+  "stage" event for streaming consumers)
+
+Non-blocking stages (retrieval, web search, ...) never abort the pipeline:
+on failure or timeout their outputs are set to None and dependents still run.
+A blocking stage failure cancels everything still running and re-raises.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from schemas.execution_context import ExecutionContext
+
+logger = logging.getLogger(__name__)
+
+
+# Stage status values recorded in ExecutionContext.stage_status
+STAGE_COMPLETED = "completed"
+STAGE_SKIPPED = "skipped"
+STAGE_FAILED = "failed"
+STAGE_TIMED_OUT = "timed_out"
+
+
+@dataclass
+class PipelineStage:
+    """
+    Single node of the pipeline graph.
+
+    The stage callable receives the ExecutionContext and writes its results
+    onto the fields named in `outputs`.
+    """
+
+    name: str
+    run: Callable[[ExecutionContext], Awaitable[None]]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    after: Tuple[str, ...] = ()  # Ordering-only dependencies (stage names)
+    timeout: Optional[float] = None  # Seconds; None = no deadline
+    blocking: bool = True  # False = failures/timeouts are logged and ignored
+
+    def is_cached(self, context: ExecutionContext) -> bool:
+        """A stage is cached when every output is already on the context."""
+        return bool(self.outputs) and all(
+            getattr(context, field_name, None) is not None for field_name in self.outputs
+        )
+
+
+class PipelineEngine:
+    """
+    Runs a graph of PipelineStages against an ExecutionContext.
+
+    Design:
+    - Graph is validated once at construction (unknown deps, cycles)
+    - A stage starts as soon as all of its dependencies have finished
+    - Inputs without a producing stage are treated as seed fields
+    """
+
+    def __init__(self, stages: List[PipelineStage]):
+        """
+        Build and validate the stage graph.
+
+        Args:
+            stages: Pipeline stages (order is irrelevant)
+
+        Raises:
+            ValueError: If names/outputs collide or the graph has a cycle
+        """
+        self.stages: Dict[str, PipelineStage] = {}
+        producers: Dict[str, str] = {}
+
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate pipeline stage: {stage.name}")
+            self.stages[stage.name] = stage
+            for field_name in stage.outputs:
+                if field_name in producers:
+                    raise ValueError(
+                        f"Output '{field_name}' produced by both "
+                        f"'{producers[field_name]}' and '{stage.name}'"
+                    )
+                producers[field_name] = stage.name
+
+        self.dependencies: Dict[str, Set[str]] = {}
+        for stage in stages:
+            deps = {producers[f] for f in stage.inputs if f in producers}
+            for name in stage.after:
+                if name not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' runs after unknown stage '{name}'")
+                deps.add(name)
+            deps.discard(stage.name)
+            self.dependencies[stage.name] = deps
+
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        """Return stage names in dependency order (raises on cycles)."""
+        remaining = {name: set(deps) for name, deps in self.dependencies.items()}
+        order = []
+
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise ValueError(f"Pipeline graph has a cycle: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+        return order
+
+    async def run(self, context: ExecutionContext) -> ExecutionContext:
+        """
+        Execute all stages, maximizing concurrency.
+
+        Args:
+            context: ExecutionContext (mutated in place)
+
+        Returns:
+            The same ExecutionContext
+
+        Raises:
+            TimeoutError: If a blocking stage misses its deadline
+            Exception: Whatever a blocking stage raised
+        """
+        done: Set[str] = set()
+        running: Dict[asyncio.Task, str] = {}
+
+        try:
+            while len(done) < len(self.stages):
+                for name in self.order:
+                    if name in done or name in running.values():
+                        continue
+                    if not self.dependencies[name] <= done:
+                        continue
+                    task = asyncio.ensure_future(self._run_stage(self.stages[name], context))
+                    running[task] = name
+
+                finished, _ = await asyncio.wait(
+                    running.keys(), return_when=asyncio.FIRST_COMPLETED
+                )
+                error = None
+                for task in finished:
+                    done.add(running.pop(task))
+                    if error is None and task.exception() is not None:
+                        error = task.exception()
+                if error is not None:
+                    raise error  # Blocking stage failed
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running.keys(), return_exceptions=True)
+
+        return context
+
+    async def _run_stage(self, stage: PipelineStage, context: ExecutionContext) -> None:
+        """Run one stage, recording timing/status and applying its policy."""
+        if stage.is_cached(context):
+            context.stage_timings[stage.name] = 0.0
+            context.stage_status[stage.name] = STAGE_SKIPPED
+            logger.info(
+                f"Stage '{stage.name}' skipped (outputs cached)",
+                extra={"execution_id": context.execution_id},
+            )
+            self._emit_stage_event(stage, context)
+            return
+
+        # Stage deadline, clamped to whatever is left of the request deadline
+        timeout = stage.timeout
+        remaining = context.remaining_time()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        
+        start = time.perf_counter()
+        try:
+            if timeout is None:
+                await stage.run(context)
+            elif timeout <= 0:
+                raise asyncio.TimeoutError  # Budget already spent; don't start
+            else:
+                await asyncio.wait_for(stage.run(context), timeout=timeout)
+            context.stage_status[stage.name] = STAGE_COMPLETED
+        except asyncio.TimeoutError:
+            context.stage_status[stage.name] = STAGE_TIMED_OUT
+            self._clear_outputs(stage, context)
+            reason = "request deadline" if timeout != stage.timeout else "stage deadline"
+            if stage.blocking:
+                raise TimeoutError(f"Stage '{stage.name}' timed out after {timeout:.2f}s ({reason})")
+            logger.warning(
+                f"Stage '{stage.name}' timed out after {timeout:.2f}s ({reason}, non-blocking)",
+                extra={"execution_id": context.execution_id},
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            context.stage_status[stage.name] = STAGE_FAILED
+            self._clear_outputs(stage, context)
+            if stage.blocking:
+                raise
+            logger.warning(
+                f"Stage '{stage.name}' failed (non-blocking): {str(e)}",
+                extra={"execution_id": context.execution_id},
+            )
+        finally:
+            context.stage_timings[stage.name] = (time.perf_counter() - start) * 1000
+            self._emit_stage_event(stage, context)
+    
+    @staticmethod
+    def _emit_stage_event(stage: PipelineStage, context: ExecutionContext) -> None:
+        """Report a finished stage to the streaming consumer (if any)."""
+        context.emit("stage", {
+            "stage": stage.name,
+            "status": context.stage_status.get(stage.name, "cancelled"),
+            "elapsed_ms": context.stage_timings.get(stage.name),
+        })
+
+    @staticmethod
+    def _clear_outputs(stage: PipelineStage, context: ExecutionContext) -> None:
+        """Reset a failed stage's outputs so dependents see None."""
+        for field_name in stage.outputs:
+            setattr(context, field_name, None)
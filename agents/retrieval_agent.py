@@ -4,16 +4,36 @@ PHASE 3 — Retrieval Agent
 Intelligent knowledge retrieval without LLM hallucination.
 Decides WHAT to retrieve based on user context.
 vector_store handles HOW to retrieve.
+
+Hybrid retrieval (KEYWORD_INDEX_ENABLED, default on): every query runs as
+a dense vector search and a BM25 keyword search (services/keyword_index.py)
+concurrently, and the ranked lists are fused with reciprocal-rank fusion
+(RRF): score(chunk) = sum over lists of 1 / (RETRIEVAL_RRF_K + rank).
+
+Diversification (RETRIEVAL_MMR_LAMBDA, default 0.7; 1.0 disables): the
+top results are picked from the ranked candidates by maximal marginal
+relevance (utils/diversity.py) over their stored embeddings, so
+overlapping chunks of one document don't fill every slot.
+
+Confidence averages the cosine similarity of the returned chunks;
+chunks only the keyword search found are scored against the query
+embeddings too (one read of their stored vectors).
 """
 
+import asyncio
 import logging
+import os
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 
+import numpy as np
+
 from schemas.user_input import UserInputSchema
 from schemas.execution_context import ExecutionContext
 from schemas.retrieval_agent_output import RetrievalAgentOutput, RetrievedChunk
+from services.keyword_index import get_keyword_index
 from services.vector_store import get_vector_store
+from utils.diversity import mmr_select
 
 
 # Configure logging
@@ -31,10 +51,22 @@ class RetrievalAgent:
     - Explainable decisions
     """
     
+    # Candidates taken from each ranked list before fusion
+    FUSION_DEPTH = 20
+    
+    # Ranked candidates diversified by MMR
+    MMR_CANDIDATES = 50
+    
     def __init__(self):
         """Initialize retrieval agent."""
         self.vector_store = get_vector_store()
         self.agent_name = "RetrievalAgent"
+        self.keyword_index = (
+            get_keyword_index(self.vector_store)
+            if os.getenv("KEYWORD_INDEX_ENABLED", "true").lower() == "true" else None
+        )
+        self.rrf_k = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+        self.mmr_lambda = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7"))
     
     async def run(self, context: ExecutionContext) -> RetrievalAgentOutput:
         """
@@ -86,29 +118,81 @@ class RetrievalAgent:
             
             logger.info(f"[{execution_id}] Applied filters: {metadata_filters}")
             
-            # Execute searches and aggregate results
-            all_results = []
-            for query in search_queries:
+            # Execute all searches as one batched vector store call, plus one
+            # batched keyword search when hybrid (blocking; run concurrently
+            # off the event loop). Searches still running at the request
+            # deadline are abandoned.
+            dense_lists = []
+            keyword_lists = []
+            query_vectors = []  # Filled by the dense search; scores keyword-only hits
+            timed_out = False
+            if search_queries:
+                loop = asyncio.get_running_loop()
+                # Fusion and MMR need a candidate pool deeper than top-k
+                deep = self.keyword_index is not None or self.mmr_lambda < 1.0
+                depth = self.FUSION_DEPTH if deep else 5
+                
+                def dense_search():
+                    query_vectors.extend(self.vector_store.embedding_service.embed_queries(search_queries))
+                    return self.vector_store.similarity_search_by_vectors(
+                        np.asarray(query_vectors),
+                        k=depth,
+                        metadata_filters=metadata_filters,
+                        include_embeddings=self.mmr_lambda < 1.0,  # MMR reads them
+                    )
+                
+                searches = [loop.run_in_executor(None, dense_search)]
+                if self.keyword_index is not None:
+                    searches.append(
+                        loop.run_in_executor(
+                            None, self._keyword_search, search_queries, depth, metadata_filters
+                        )
+                    )
                 try:
-                    results = self.vector_store.similarity_search(
-                        query=query,
-                        k=5,
-                        metadata_filters=metadata_filters
+                    ranked_lists = await asyncio.wait_for(
+                        asyncio.gather(*searches), timeout=context.remaining_time()
+                    )
+                    dense_lists = ranked_lists[0]
+                    keyword_lists = ranked_lists[1] if len(ranked_lists) > 1 else []
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    logger.warning(
+                        f"[{execution_id}] Deadline reached: batched search of "
+                        f"{len(search_queries)} queries cancelled"
                     )
-                    all_results.extend(results)
-                except Exception as e:
-                    logger.warning(f"[{execution_id}] Search query failed: {e}")
-                    continue
             
+            all_results = [result for results in dense_lists + keyword_lists for result in results]
             output.total_hits = len(all_results)
             
             # Deduplicate and rank results
-            unique_results = self._deduplicate_results(all_results)
-            ranked_results = sorted(unique_results, key=lambda x: x["similarity_score"], reverse=True)
+            if any(keyword_lists):
+                ranked_results = self._reciprocal_rank_fusion(dense_lists + keyword_lists, self.rrf_k)
+            else:
+                unique_results = self._deduplicate_results(all_results)
+                ranked_results = sorted(unique_results, key=lambda x: x["similarity_score"], reverse=True)
             
-            # Keep top-k
+            # Keep top-k, diversified by MMR when enabled
             k = 5
-            top_results = ranked_results[:k]
+            pool = ranked_results[:self.MMR_CANDIDATES if self.mmr_lambda < 1.0 else k]
+            if query_vectors and any("distance" not in r for r in pool):
+                try:
+                    await asyncio.wait_for(
+                        asyncio.get_running_loop().run_in_executor(
+                            None, self._score_keyword_hits, pool, np.asarray(query_vectors)
+                        ),
+                        timeout=context.remaining_time(),
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"[{execution_id}] Deadline reached: keyword-only hits left unscored")
+            top_results = pool[:k]
+            if self.mmr_lambda < 1.0 and len(pool) > k:
+                try:
+                    top_results = await asyncio.wait_for(
+                        asyncio.get_running_loop().run_in_executor(None, self._diversify, pool, k),
+                        timeout=context.remaining_time(),
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"[{execution_id}] Deadline reached: MMR skipped, keeping relevance order")
             output.returned_count = len(top_results)
             
             logger.info(f"[{execution_id}] Returned top-{k} results from {output.total_hits} total hits")
@@ -129,6 +213,10 @@ class RetrievalAgent:
             output.retrieval_confidence = self._calculate_confidence(top_results)
             output.knowledge_summary = self._summarize_knowledge(chunks, user_input)
             output.execution_notes = f"Successfully retrieved {len(chunks)} relevant chunks"
+            if timed_out:
+                output.execution_notes += (
+                    f" (partial: {len(search_queries)} queries cancelled at the deadline)"
+                )
             
             logger.info(
                 f"[{execution_id}] RetrievalAgent.run() completed. "
@@ -189,7 +277,7 @@ class RetrievalAgent:
         
         # Match audience level
         if user_input.audience_level:
-            filters["audience_level"] = user_input.audience_level.value
+            filters["audience_level"] = user_input.audience_level
         
         # Match subject domain (heuristic from audience category)
         if user_input.audience_category:
@@ -201,11 +289,128 @@ class RetrievalAgent:
                 "creative": "creative",
                 "other": "other",
             }
-            domain = category_to_domain.get(user_input.audience_category.value, "other")
+            domain = category_to_domain.get(user_input.audience_category, "other")
             filters["subject_domain"] = domain
         
         return filters if filters else None
     
+    def _keyword_search(
+        self,
+        queries: List[str],
+        k: int,
+        metadata_filters: Optional[Dict[str, str]],
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        BM25 search of every query (runs in an executor thread).
+        
+        The keyword index tracks deletions itself (IngestionPipeline
+        deletes chunks from it before the vector store), so its hits are
+        used without a per-query lookup in the store. Failures degrade to
+        dense-only retrieval.
+        
+        Returns:
+            One ranked result list per query (empty lists on error)
+        """
+        try:
+            return self.keyword_index.search_batch(queries, k=k, metadata_filters=metadata_filters)
+        except Exception as e:
+            logger.warning(f"Keyword search failed, using vector search only: {e}")
+            return [[] for _ in queries]
+    
+    @staticmethod
+    def _reciprocal_rank_fusion(ranked_lists: List[List[Dict[str, Any]]], rrf_k: int = 60) -> List[Dict[str, Any]]:
+        """
+        Fuse ranked result lists with reciprocal-rank fusion.
+        
+        Each list contributes 1 / (rrf_k + rank) to a chunk's score, so a
+        chunk ranked well by both searches (or by several queries) rises
+        to the top without comparing cosine and BM25 scales. The vector
+        search's similarity_score is kept; chunks only the keyword search
+        found get 0.0 until _score_keyword_hits gives them their cosine.
+        
+        Args:
+            ranked_lists: Result lists, each best first
+            rrf_k: Rank damping constant (60 is the usual choice)
+            
+        Returns:
+            Unique results with fusion_score, best first
+        """
+        fused: Dict[str, Dict[str, Any]] = {}
+        for results in ranked_lists:
+            for rank, result in enumerate(results, start=1):
+                entry = fused.setdefault(result.get("document_id", ""), {"fusion_score": 0.0})
+                for key, value in result.items():
+                    if key in ("similarity_score", "keyword_score"):
+                        entry[key] = max(entry.get(key, value), value)  # Best over queries
+                    else:
+                        entry.setdefault(key, value)
+                entry["fusion_score"] += 1.0 / (rrf_k + rank)
+        
+        for entry in fused.values():
+            entry.setdefault("similarity_score", 0.0)
+        return sorted(fused.values(), key=lambda r: (r["fusion_score"], r["similarity_score"]), reverse=True)
+    
+    def _score_keyword_hits(self, results: List[Dict[str, Any]], query_vectors: np.ndarray) -> None:
+        """
+        Give keyword-only hits their cosine similarity to the queries
+        (runs in an executor thread).
+        
+        Their stored vectors are read in one call and kept as "embedding"
+        for MMR; similarity_score becomes the best cosine over the
+        queries, so confidence isn't dragged down by the 0.0 placeholder.
+        Hits the store no longer holds keep 0.0.
+        
+        Args:
+            results: Results to score in place (dense hits carry "distance" and are skipped)
+            query_vectors: (q, dim) query embeddings
+        """
+        keyword_only = [r for r in results if "distance" not in r]
+        try:
+            vectors = self.vector_store.get_embeddings([r["document_id"] for r in keyword_only])
+        except Exception as e:
+            logger.warning(f"Scoring keyword-only hits failed: {e}")
+            return
+        queries = query_vectors / np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+        for result in keyword_only:
+            vector = vectors.get(result["document_id"])
+            if vector is None:
+                continue
+            result["embedding"] = vector
+            result["similarity_score"] = float(np.max(queries @ vector) / max(np.linalg.norm(vector), 1e-12))
+    
+    def _diversify(self, ranked_results: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """
+        Pick k of the ranked candidates by maximal marginal relevance
+        (runs in an executor thread).
+        
+        Relevance is the fusion_score when hybrid, else the similarity
+        score. Candidates are compared by the "embedding" the dense search
+        (or _score_keyword_hits) attached; one without counts as unrelated.
+        Falls back to the relevance order when no candidate has one.
+        
+        Args:
+            ranked_results: Unique results, best first
+            k: Number of results
+            
+        Returns:
+            k results in MMR selection order
+        """
+        candidates = ranked_results[:self.MMR_CANDIDATES]
+        try:
+            vectors = [r.get("embedding") for r in candidates]
+            present = [vector for vector in vectors if vector is not None]
+            if not present:
+                return candidates[:k]
+            embeddings = np.zeros((len(candidates), len(present[0])), dtype=np.float32)
+            for i, vector in enumerate(vectors):
+                if vector is not None:
+                    embeddings[i] = vector
+            relevance = [r.get("fusion_score", r["similarity_score"]) for r in candidates]
+            return [candidates[i] for i in mmr_select(relevance, embeddings, k, self.mmr_lambda)]
+        except Exception as e:
+            logger.warning(f"MMR diversification failed, keeping relevance order: {e}")
+            return candidates[:k]
+    
     @staticmethod
     def _deduplicate_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -283,7 +488,7 @@ class RetrievalAgent:
         summary = (
             f"Retrieved {len(chunks)} relevant knowledge chunks "
             f"({source_summary}) aligned with '{user_input.course_title}' "
-            f"for {user_input.audience_level.value} learners."
+            f"for {user_input.audience_level} learners."
         )
         
         return summary
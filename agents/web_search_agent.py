@@ -61,6 +61,9 @@ class WebSearchAgent:
     ❌ No direct UI access
     """
     
+    # Stats marker for queries abandoned at the request deadline
+    DEADLINE_TOOL = "deadline_exceeded"
+    
     def __init__(self):
         """Initialize Web Search Agent."""
         self.agent_name = "WebSearchAgent"
@@ -102,8 +105,10 @@ class WebSearchAgent:
             queries = await self._generate_search_queries(user_input)
             self.logger.debug(f"Generated {len(queries)} search queries")
             
-            # Step 2: Execute batch search
-            all_results, stats = await self._execute_batch_search(queries)
+            # Step 2: Execute batch search (cut short at the request deadline)
+            all_results, stats = await self._execute_batch_search(
+                queries, timeout=context.remaining_time()
+            )
             self.logger.info(f"Search results: {len(all_results)} total across {len(queries)} queries")
             
             # Step 3: Deduplicate and score
@@ -118,6 +123,13 @@ class WebSearchAgent:
             output.result_count = len(unique_results)
             output.high_quality_result_count = len([r for r in unique_results if r.relevance_score > 0.7])
             
+            timed_out = [q for q, s in stats.items() if s["tool"] == self.DEADLINE_TOOL]
+            if timed_out:
+                output.search_notes = (
+                    f"Partial results: {len(queries) - len(timed_out)}/{len(queries)} "
+                    f"queries finished before the deadline. {output.search_notes or ''}"
+                ).strip()
+            
             self.logger.info(
                 f"WebSearchAgent complete: confidence={output.confidence_score:.2f}, "
                 f"time={output.execution_time_ms:.0f}ms, results={output.result_count}"
@@ -160,21 +172,54 @@ class WebSearchAgent:
     
     async def _execute_batch_search(
         self, 
-        queries: List[str]
+        queries: List[str],
+        timeout: Optional[float] = None,
     ) -> Tuple[List[SearchResult], dict]:
         """
         Execute batch search across all queries with fallback.
         
+        Queries run concurrently; once the timeout elapses, whatever has
+        finished is returned and the remaining queries are abandoned.
+        
         Args:
             queries: Search queries
+            timeout: Seconds to wait (None = wait for all queries)
             
         Returns:
             Tuple of (all_results, stats)
         """
-        all_results, stats = self.toolchain.batch_search(
-            queries, 
-            max_results_per_query=5
-        )
+        # Provider calls are blocking HTTP; run them off the event loop so
+        # the orchestrator can overlap web search with retrieval.
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(None, self.toolchain.search, query, 5)
+            for query in queries
+        ]
+        
+        all_results = []
+        stats = {}
+        if not futures:
+            return all_results, stats
+        
+        done, pending = await asyncio.wait(futures, timeout=timeout)
+        for future in pending:
+            future.cancel()
+        
+        for query, future in zip(queries, futures):
+            if future in done and future.exception() is None:
+                results, tool = future.result()
+                all_results.extend(results)
+                stats[query] = {"count": len(results), "tool": tool}
+            elif future in done:
+                self.logger.warning(f"Search failed for '{query}': {future.exception()}")
+                stats[query] = {"count": 0, "tool": "error"}
+            else:
+                stats[query] = {"count": 0, "tool": self.DEADLINE_TOOL}
+        
+        if pending:
+            self.logger.warning(
+                f"Web search deadline reached: {len(pending)}/{len(queries)} queries abandoned"
+            )
         
         return all_results, stats
     
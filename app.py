@@ -19,7 +19,9 @@ Workflow:
 
 import streamlit as st
 import asyncio
-from typing import Optional, Dict, Any
+import queue
+import threading
+from typing import Optional, Dict, Any, Tuple
 from datetime import datetime
 
 # Imports
@@ -54,6 +56,17 @@ def init_session():
     return st.session_state.session_id
 
 
+@st.cache_resource
+def get_orchestrator_runtime() -> Tuple[CourseOrchestratorAgent, asyncio.AbstractEventLoop]:
+    """
+    One orchestrator and event loop shared by every session, so identical
+    in-flight requests from different users share one generation.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="orchestrator-loop", daemon=True).start()
+    return CourseOrchestratorAgent(), loop
+
+
 def get_session_data() -> Optional[Dict[str, Any]]:
     """Get current session data."""
     sm = init_session_manager()
@@ -329,6 +342,43 @@ def render_output_panel(outline_dict: Dict[str, Any]):
         st.caption("Schema validation: ✅ Valid")
 
 
+def generate_with_progress(user_input: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Consume orchestrator.stream() on the shared loop, showing stages and
+    modules as they arrive.
+    """
+    orchestrator, loop = get_orchestrator_runtime()
+    status = st.empty()
+    modules_preview = st.container()
+    outline = None
+    
+    events: "queue.Queue" = queue.Queue()
+    
+    async def forward():
+        try:
+            async for event in orchestrator.stream(user_input):
+                events.put(event)
+        finally:
+            events.put(None)
+    
+    generation = asyncio.run_coroutine_threadsafe(forward(), loop)
+    for event in iter(events.get, None):
+        if event.type == "stage":
+            stage = event.data["stage"].replace("_", " ").title()
+            status.info(f"⏳ {stage}: {event.data['status']}")
+        elif event.type == "module":
+            module = event.data
+            modules_preview.markdown(
+                f"**{module.module_id}: {module.title}** ({module.estimated_hours:g}h)"
+            )
+        elif event.type == "outline":
+            outline = event.data
+    generation.result()  # Raises the generation's error, if any
+    
+    status.empty()
+    return outline
+
+
 def render_sidebar_controls():
     """Render sidebar controls (reset, debug) in persistent left column."""
     st.markdown("---")
@@ -395,11 +445,9 @@ def main():
             st.info("⏳ Generating course outline...")
             
             try:
-                # Call orchestrator
-                orchestrator = CourseOrchestratorAgent()
-                
-                # Run async agent
-                outline = asyncio.run(orchestrator.run(user_input.model_dump()))
+                # Run the shared orchestrator (streamed: modules appear as
+                # they are written; identical in-flight requests are coalesced)
+                outline = generate_with_progress(user_input.model_dump())
                 
                 # Store in session
                 update_session_data("current_outline", outline)
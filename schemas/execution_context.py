@@ -5,9 +5,10 @@ Standardizes what agents receive across all phases.
 Designed to support Phase 3-9 extensions without code changes.
 """
 
-from dataclasses import dataclass, field, asdict
-from typing import Optional, Dict, Any
+from dataclasses import dataclass, field, asdict, replace
+from typing import Optional, Dict, Any, Callable
 from datetime import datetime
+import time
 import uuid
 
 
@@ -41,6 +42,7 @@ class ExecutionContext:
     # Execution control
     execution_mode: str = "single_pass"  # Phase 2 only
     max_tokens: int = 8000
+    deadline: Optional[float] = None  # time.monotonic() by which the request must finish
     
     # Phase 3+ extensions (initialized as None)
     retrieved_documents: Optional[Any] = None
@@ -48,9 +50,52 @@ class ExecutionContext:
     # Phase 4+ extensions
     web_search_results: Optional[Any] = None
     
+    # Phase 5+ extensions
+    generated_outline: Optional[Any] = None  # CourseOutlineSchema
+    persisted_course_id: Optional[str] = None
+    
     # Phase 6+ extensions
     validator_feedback: Optional[Dict[str, Any]] = None
     
+    # Pipeline observability (stage name -> elapsed ms / status)
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    stage_status: Dict[str, str] = field(default_factory=dict)
+    
+    # Streaming consumer: called as listener(event_type, data) for stage /
+    # module events (set by CourseOrchestratorAgent.stream)
+    event_listener: Optional[Callable[[str, Any], None]] = None
+    
+    def emit(self, event_type: str, data: Any) -> None:
+        """Forward a progress event to the streaming consumer, if any."""
+        if self.event_listener is not None:
+            self.event_listener(event_type, data)
+    
+    def remaining_time(self) -> Optional[float]:
+        """Seconds left before the deadline (None = no deadline, never negative)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def is_expired(self) -> bool:
+        """True once the request deadline has passed."""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+    
+    def with_deadline(self, seconds: float, margin: float = 0.0) -> "ExecutionContext":
+        """
+        Copy of this context with a tighter deadline (for one agent/stage).
+        
+        Args:
+            seconds: Budget from now
+            margin: Seconds reserved for the caller after the agent returns
+            
+        Returns:
+            Shallow copy whose deadline is min(current, now + seconds) - margin
+        """
+        deadline = time.monotonic() + seconds
+        if self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+        return replace(self, deadline=deadline - margin)
+    
     def to_dict(self) -> Dict[str, Any]:
         """
         Serialize context to dict for logging/debugging.
@@ -65,6 +110,8 @@ class ExecutionContext:
             "created_at": self.created_at.isoformat(),
             "user_input": self.user_input.model_dump() if hasattr(self.user_input, 'model_dump') else (self.user_input.dict() if hasattr(self.user_input, 'dict') else str(self.user_input)),
             "has_pdf_text": self.uploaded_pdf_text is not None,
+            "stage_timings": dict(self.stage_timings),
+            "stage_status": dict(self.stage_status),
         }
     
     def __repr__(self) -> str:
@@ -8,6 +8,8 @@ This is the first contract any agent receives.
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
 from enum import Enum
+import hashlib
+import json
 
 
 class AudienceLevel(str, Enum):
@@ -110,3 +112,23 @@ class UserInputSchema(BaseModel):
     )
     
     model_config = ConfigDict(use_enum_values=True)  # Serialize enums as strings
+    
+    def fingerprint(self) -> str:
+        """
+        Stable hash of the request's meaning (used for request coalescing).
+        
+        Free-text fields are case-folded and whitespace-collapsed, so trivially
+        different submissions of the same course map to the same key.
+        
+        Returns:
+            Hex sha256 digest
+        """
+        def normalize_text(value: Optional[str]) -> Optional[str]:
+            return " ".join(value.split()).casefold() if value else None
+        
+        payload = self.model_dump(mode="json")
+        for field_name in ("course_title", "course_description", "custom_constraints"):
+            payload[field_name] = normalize_text(payload[field_name])
+        
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
@@ -11,6 +11,7 @@ Every chunk MUST conform to this schema to ensure:
 
 from dataclasses import dataclass, field
 from datetime import datetime
+import hashlib
 from typing import Optional
 from enum import Enum
 
@@ -81,7 +82,7 @@ class VectorDocument:
     - content must be 500-800 tokens (roughly)
     - metadata is ALWAYS required
     - embedding computed separately by embedding service
-    - id is auto-generated by ChromaDB
+    - id defaults to a content hash (see stable_id)
     """
     
     content: str
@@ -91,7 +92,7 @@ class VectorDocument:
     """Mandatory metadata for filtering and tracing"""
     
     document_id: Optional[str] = None
-    """Unique identifier (auto-generated by ChromaDB if None)"""
+    """Unique identifier (stable_id() if None)"""
     
     embedding: Optional[list] = None
     """Embedding vector (computed by embedding service, not stored)"""
@@ -99,6 +100,12 @@ class VectorDocument:
     chunk_index: int = 0
     """Sequential chunk number from original document"""
     
+    page_start: Optional[int] = None
+    """First source page (1-based) of the chunk, for paged sources (PDF)"""
+    
+    page_end: Optional[int] = None
+    """Last source page of the chunk"""
+    
     def validate(self):
         """Ensure document meets all requirements."""
         if not self.content or len(self.content.strip()) == 0:
@@ -115,6 +122,25 @@ class VectorDocument:
         
         return True
     
+    def stable_id(self) -> str:
+        """
+        Deterministic id from source, chunk position and content.
+        
+        Identical across processes and runs (unlike hash(), which is
+        salted per process), so re-ingesting a chunk addresses the
+        same stored row. The source is the file path (original_url) when
+        known: source_name is only a display title, shared by same-named
+        files in different folders.
+        
+        Returns:
+            "doc_" + 32 hex chars of sha256
+        """
+        source = self.metadata.original_url or self.metadata.source_name or ""
+        digest = hashlib.sha256(
+            f"{source}\0{self.chunk_index}\0{self.content}".encode("utf-8")
+        ).hexdigest()
+        return f"doc_{digest[:32]}"
+    
     def to_chroma_format(self) -> dict:
         """
         Convert to ChromaDB storage format.
@@ -143,8 +169,12 @@ class VectorDocument:
         if self.metadata.session_id:
             metadata_dict["session_id"] = self.metadata.session_id
         
+        if self.page_start is not None:
+            metadata_dict["page_start"] = str(self.page_start)
+            metadata_dict["page_end"] = str(self.page_end if self.page_end is not None else self.page_start)
+        
         return {
-            "id": self.document_id or f"doc_{hash(self.content) % 10**8}",
+            "id": self.document_id or self.stable_id(),
             "document": self.content,
             "metadatas": metadata_dict,
         }
@@ -181,4 +211,6 @@ class VectorDocument:
             metadata=metadata,
             document_id=chroma_doc.get("id"),
             chunk_index=int(meta.get("chunk_index", 0)),
+            page_start=int(meta["page_start"]) if meta.get("page_start") else None,
+            page_end=int(meta["page_end"]) if meta.get("page_end") else None,
         )
@@ -18,6 +18,8 @@ from .llm_service import (
     LLMConfig,
     LLMResponse,
     LLMFactory,
+    LLMRateLimiter,
+    RateLimitedLLMService,
     OpenAIService,
     AnthropicService,
     get_llm_service,
@@ -44,6 +46,8 @@ __all__ = [
     "LLMConfig",
     "LLMResponse",
     "LLMFactory",
+    "LLMRateLimiter",
+    "RateLimitedLLMService",
     "OpenAIService",
     "AnthropicService",
     "get_llm_service",
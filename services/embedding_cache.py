@@ -0,0 +1,401 @@
+"""
+PHASE 3+: Embedding Cache
+
+Content-addressed cache in front of an EmbeddingService.
+
+Key = sha256(model identity from get_config() + text), so identical chunk
+text and repeated queries (course titles, topics) are embedded once, and a
+model change (name, dimension, version, backend) invalidates every entry.
+
+Tiers:
+- Memory: bounded LRU of float32 vectors, per process
+- Disk: one float32 matrix file accessed through np.memmap plus a SQLite
+  index (key -> row), shared across restarts
+
+Cached vectors are float32 (the precision the vector store keeps), and a
+miss returns the same float32 value a later hit will, so results don't
+depend on cache state. The disk tier assumes a single writer process.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from services.embedding_service import EmbeddingService
+
+# Config keys that identify the model (counters/stats are excluded)
+_IDENTITY_KEYS = ("backend", "model_name", "embedding_dim", "version")
+_SQLITE_MAX_VARIABLES = 500
+
+
+def model_identity(service: EmbeddingService) -> str:
+    """Stable hash of the service's model-defining configuration."""
+    config = service.get_config()
+    identity = {key: config.get(key) for key in _IDENTITY_KEYS}
+    encoded = json.dumps(identity, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class EmbeddingDiskStore:
+    """
+    Append-only on-disk vector store: memory-mapped float32 rows + SQLite index.
+
+    Rows are written to the memmap before their index entry is committed,
+    so a reader never sees a key whose vector is missing.
+    """
+
+    GROWTH_ROWS = 1024
+
+    def __init__(self, directory: str, embedding_dim: int):
+        """
+        Open (or create) a store.
+
+        Args:
+            directory: Store directory (one per model identity)
+            embedding_dim: Vector dimension
+        """
+        self.directory = directory
+        self.embedding_dim = embedding_dim
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.index_path = os.path.join(directory, "index.sqlite3")
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+            )
+            self._next_row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM embeddings").fetchone()[0]
+
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._open_vectors(max(self._next_row, 1))
+
+    def __len__(self) -> int:
+        return self._next_row
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up vectors.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            key -> float32 vector (copies), for keys present on disk
+        """
+        found: Dict[str, np.ndarray] = {}
+        with self._connect() as conn:
+            for start in range(0, len(keys), _SQLITE_MAX_VARIABLES):
+                chunk = list(keys[start:start + _SQLITE_MAX_VARIABLES])
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, row FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, row in rows:
+                    if row >= self._capacity:
+                        self._open_vectors(row + 1)  # Written by an earlier run
+                    found[key] = np.array(self._vectors[row])
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """
+        Append vectors for new keys (existing keys are left untouched).
+
+        Args:
+            items: key -> vector of length embedding_dim
+        """
+        if not items:
+            return
+        with self._connect() as conn:
+            existing = set()
+            keys = list(items)
+            for start in range(0, len(keys), _SQLITE_MAX_VARIABLES):
+                chunk = keys[start:start + _SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(chunk))
+                existing.update(
+                    key for (key,) in conn.execute(
+                        f"SELECT key FROM embeddings WHERE key IN ({placeholders})", chunk
+                    )
+                )
+            new_keys = [key for key in keys if key not in existing]
+            if not new_keys:
+                return
+
+            first_row = self._next_row
+            self._open_vectors(first_row + len(new_keys))
+            for offset, key in enumerate(new_keys):
+                self._vectors[first_row + offset] = items[key]
+            self._vectors.flush()
+
+            conn.executemany(
+                "INSERT INTO embeddings (key, row) VALUES (?, ?)",
+                [(key, first_row + offset) for offset, key in enumerate(new_keys)],
+            )
+            self._next_row = first_row + len(new_keys)
+
+    def clear(self) -> None:
+        """Drop every stored vector."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM embeddings")
+        self._next_row = 0
+
+    def close(self) -> None:
+        """Release the memory map."""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+            self._capacity = 0
+
+    def _open_vectors(self, min_rows: int) -> None:
+        """(Re)map the vector file with room for at least min_rows rows."""
+        if self._vectors is not None and min_rows <= self._capacity:
+            return
+        row_bytes = self.embedding_dim * np.dtype(np.float32).itemsize
+        on_disk = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        capacity = max(on_disk, min_rows)
+        if capacity > on_disk:
+            capacity = max(capacity, on_disk + self.GROWTH_ROWS, on_disk * 2)
+            with open(self.vectors_path, "ab") as handle:
+                handle.truncate(capacity * row_bytes)
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.embedding_dim)
+        )
+        self._capacity = capacity
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Short-lived index connection (commit on success, always closed)."""
+        conn = sqlite3.connect(self.index_path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+class CachedEmbeddingService(EmbeddingService):
+    """
+    EmbeddingService decorator adding a two-tier embedding cache.
+
+    Drop-in replacement: same methods and return types as the wrapped
+    service. Misses within one batch are embedded in a single call to the
+    wrapped service; duplicate texts in a batch are embedded once.
+    """
+
+    def __init__(
+        self,
+        service: EmbeddingService,
+        max_memory_entries: int = 10_000,
+        cache_dir: Optional[str] = None,
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            service: Embedding service to wrap
+            max_memory_entries: LRU capacity of the memory tier
+            cache_dir: Root directory of the disk tier (None = memory only)
+        """
+        self.service = service
+        self.model_name = service.model_name
+        self.embedding_dim = service.embedding_dim
+        self.version = service.version
+        self.max_memory_entries = max_memory_entries
+        self.identity = model_identity(service)
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk: Optional[EmbeddingDiskStore] = None
+        if cache_dir:
+            self.disk = EmbeddingDiskStore(
+                os.path.join(cache_dir, self.identity[:16]), self.embedding_dim
+            )
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, text: str) -> str:
+        """Cache key: sha256 over model identity and text."""
+        return hashlib.sha256(f"{self.identity}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed_matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Serve embeddings from cache, computing misses in one batch.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), embedding_dim)
+
+        Raises:
+            ValueError: If any text is empty
+        """
+        for text in texts:
+            if not text or len(text.strip()) == 0:
+                raise ValueError("Cannot embed empty text")
+
+        keys = [self.make_key(text) for text in texts]
+        found = self._lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            computed = self.service.embed_batch(list(missing.values()))
+            found.update(self._store(dict(zip(missing, computed))))
+
+        matrix = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        for row, key in enumerate(keys):
+            matrix[row] = found[key]
+        return matrix
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query, using the wrapped service's query path on a miss.
+
+        Args:
+            query: Search query text
+
+        Returns:
+            Embedding vector
+        """
+        key = self.make_key(query)
+        found = self._lookup([key])
+        if key not in found:
+            vector = np.asarray(self.service.embed_query(query), dtype=np.float32)
+            found = self._store({key: vector})
+        return found[key].tolist()
+
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Embed several queries, using the wrapped service's query path for misses.
+
+        Args:
+            queries: Search query texts
+
+        Returns:
+            float32 array of shape (len(queries), embedding_dim)
+        """
+        for query in queries:
+            if not query or len(query.strip()) == 0:
+                raise ValueError("Cannot embed empty text")
+
+        keys = [self.make_key(query) for query in queries]
+        found = self._lookup(keys)
+        missing: Dict[str, str] = {}
+        for key, query in zip(keys, queries):
+            if key not in found:
+                missing.setdefault(key, query)
+        if missing:
+            computed = self.service.embed_queries(list(missing.values()))
+            found.update(self._store(dict(zip(missing, computed))))
+
+        matrix = np.empty((len(queries), self.embedding_dim), dtype=np.float32)
+        for row, key in enumerate(keys):
+            matrix[row] = found[key]
+        return matrix
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+        Async embed_query; misses use the wrapped service's async path.
+
+        Args:
+            query: Search query text
+
+        Returns:
+            Embedding vector
+        """
+        key = self.make_key(query)
+        found = self._lookup([key])
+        if key not in found:
+            vector = np.asarray(await self.service.aembed_query(query), dtype=np.float32)
+            found = self._store({key: vector})
+        return found[key].tolist()
+
+    def close(self) -> None:
+        """Close the disk tier and the wrapped service."""
+        if self.disk is not None:
+            self.disk.close()
+        self.service.close()
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+            if self.disk is not None:
+                self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tier sizes."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self.disk) if self.disk is not None else 0,
+            }
+
+    def get_config(self) -> dict:
+        """Wrapped service config plus cache statistics."""
+        config = self.service.get_config()
+        config["cache"] = self.stats()
+        return config
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Find keys in memory, then on disk (disk hits are promoted)."""
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for key in unique:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+
+            remaining = [key for key in unique if key not in found]
+            if remaining and self.disk is not None:
+                for key, vector in self.disk.get_many(remaining).items():
+                    self._remember(key, vector)
+                    found[key] = vector
+                    self.disk_hits += 1
+
+            self.misses += sum(1 for key in remaining if key not in found)
+        return found
+
+    def _store(self, vectors: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Insert computed vectors into both tiers; returns them as float32."""
+        stored = {key: np.asarray(vector, dtype=np.float32) for key, vector in vectors.items()}
+        with self._lock:
+            for key, vector in stored.items():
+                self._remember(key, vector)
+            if self.disk is not None:
+                self.disk.put_many(stored)
+        return stored
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Insert into the memory tier, evicting least recently used entries."""
+        vector.setflags(write=False)  # Shared between callers
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
@@ -4,18 +4,37 @@ PHASE 3 — Embedding Service
 Standardizes embedding generation across the system.
 Single source of truth for embeddings to avoid drift.
 Uses deterministic embeddings for reproducibility.
+
+Embeddings are computed as one (n, dim) NumPy matrix per batch; the
+single-text path is the same engine with n = 1, so both always agree.
+
+Backends (EMBEDDING_BACKEND):
+- deterministic (default): hash-seeded vectors, no model needed
+- sentence_transformers: local CPU model loaded from EMBEDDING_MODEL_PATH
+  (offline); concurrent queries are micro-batched into one forward pass
 """
 
+import asyncio
 import hashlib
-from typing import List, Optional
+import os
+from typing import List, Optional, Sequence
 import json
 
+import numpy as np
+
+from utils.micro_batcher import MicroBatcher
+
+# LCG constants of the deterministic pseudo-embedding
+_LCG_MULTIPLIER = 1103515245
+_LCG_INCREMENT = 12345
+_LCG_MODULUS_MASK = (1 << 31) - 1
+
 
 class EmbeddingService:
     """
     Vendor-agnostic embedding service.
-    Currently uses deterministic embeddings for Phase 3 testing.
-    Will be replaced with OllamaEmbeddings or HuggingFaceEmbeddings in Phase 5.
+    Uses deterministic embeddings by default (Phase 3 testing); see
+    SentenceTransformerEmbeddingService for a real local model.
     """
     
     def __init__(self, model_name: str = "mock-embedding-v1", embedding_dim: int = 384):
@@ -46,25 +65,7 @@ class EmbeddingService:
         if not text or len(text.strip()) == 0:
             raise ValueError("Cannot embed empty text")
         
-        # Deterministic embedding for Phase 3 testing
-        # Hash the text to get consistent pseudo-random values
-        hash_obj = hashlib.sha256(text.encode())
-        hash_int = int(hash_obj.hexdigest(), 16)
-        
-        # Generate embedding by seeding pseudo-random sequence
-        embeddings = []
-        for i in range(self.embedding_dim):
-            seed = (hash_int + i) % (2**32)
-            # Simple pseudo-random: scale to [-1, 1]
-            value = ((seed * 1103515245 + 12345) % (2**31)) / (2**30) - 1.0
-            embeddings.append(value)
-        
-        # Normalize to unit length
-        magnitude = sum(x**2 for x in embeddings) ** 0.5
-        if magnitude > 0:
-            embeddings = [x / magnitude for x in embeddings]
-        
-        return embeddings
+        return self._embed_matrix([text])[0].tolist()
     
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """
@@ -76,7 +77,64 @@ class EmbeddingService:
         Returns:
             List of embedding vectors
         """
-        return [self.embed_text(text) for text in texts]
+        return self._embed_matrix(texts).tolist()
+    
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts as one matrix.
+        
+        Preferred for ingestion: no per-vector Python lists are built.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            float32 array of shape (len(texts), embedding_dim)
+            
+        Raises:
+            ValueError: If any text is empty
+        """
+        return self._embed_matrix(texts).astype(np.float32)
+    
+    def _embed_matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Vectorized deterministic embedding (float64, unit rows).
+        
+        Element (j, i) is ((seed_j + i) * a + c) mod 2^31 / 2^30 - 1, where
+        seed_j is sha256(text_j) mod 2^32. Since 2^31 divides 2^32, this is
+        computed with wrapping uint32 arithmetic as (base_j + a*i) & mask.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            float64 array of shape (len(texts), embedding_dim)
+            
+        Raises:
+            ValueError: If any text is empty
+        """
+        seeds = np.empty(len(texts), dtype=np.uint32)
+        for row, text in enumerate(texts):
+            if not text or len(text.strip()) == 0:
+                raise ValueError("Cannot embed empty text")
+            # Only the low 32 bits of the hash survive the mod 2^32
+            seeds[row] = int.from_bytes(hashlib.sha256(text.encode()).digest()[-4:], "big")
+        
+        multiplier = np.uint32(_LCG_MULTIPLIER)
+        steps = np.arange(self.embedding_dim, dtype=np.uint32) * multiplier
+        bases = seeds * multiplier + np.uint32(_LCG_INCREMENT)
+        values = (bases[:, None] + steps[None, :]) & np.uint32(_LCG_MODULUS_MASK)
+        
+        # Scale to [-1, 1] (exact in float64)
+        embeddings = values.astype(np.float64)
+        embeddings *= 2.0 ** -30
+        embeddings -= 1.0
+        
+        # Normalize to unit length
+        magnitude = np.sqrt(np.einsum("ij,ij->i", embeddings, embeddings))
+        nonzero = magnitude > 0
+        embeddings[nonzero] /= magnitude[nonzero, None]
+        return embeddings
     
     def embed_query(self, query: str) -> List[float]:
         """
@@ -91,6 +149,34 @@ class EmbeddingService:
         """
         return self.embed_text(query)
     
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Embed several search queries as one matrix.
+        
+        Args:
+            queries: Search query texts
+            
+        Returns:
+            float32 array of shape (len(queries), embedding_dim)
+        """
+        return self.embed_batch(queries)
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+        Async embed_query; the computation runs on a worker thread.
+        
+        Args:
+            query: Search query text
+            
+        Returns:
+            Embedding vector
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.embed_query, query)
+    
+    def close(self) -> None:
+        """Release background resources (no-op for the deterministic backend)."""
+    
     def get_config(self) -> dict:
         """
         Get embedding service configuration.
@@ -129,6 +215,189 @@ class EmbeddingService:
         return True
 
 
+class SentenceTransformerEmbeddingService(EmbeddingService):
+    """
+    Local sentence-transformers model on CPU.
+    
+    Design:
+    - Loaded from a local model directory only (no network access)
+    - Vectors are L2-normalized, like the deterministic backend
+    - embed_query/aembed_query/embed_queries go through a MicroBatcher, so
+      queries from concurrent requests share one forward pass
+    - Bulk paths (embed_texts/embed_batch) call the model directly
+    """
+    
+    def __init__(
+        self,
+        model_path: str,
+        device: str = "cpu",
+        encode_batch_size: int = 32,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+    ):
+        """
+        Initialize and load the model.
+        
+        Args:
+            model_path: Directory containing a saved sentence-transformers model
+            device: Torch device ("cpu")
+            encode_batch_size: Forward-pass size used by model.encode
+            max_batch_size: Maximum queries coalesced per micro-batch
+            max_wait_ms: Collection window for micro-batches
+            
+        Raises:
+            ValueError: If model_path is not a local directory
+            ImportError: If sentence-transformers is not installed
+        """
+        if not model_path or not os.path.isdir(model_path):
+            raise ValueError(f"Embedding model directory not found: {model_path!r}")
+        
+        try:
+            import sentence_transformers
+        except ImportError:
+            raise ImportError("sentence-transformers package required: pip install sentence-transformers")
+        
+        self.model = sentence_transformers.SentenceTransformer(model_path, device=device)
+        super().__init__(
+            model_name=os.path.basename(os.path.normpath(model_path)),
+            embedding_dim=self.model.get_sentence_embedding_dimension(),
+        )
+        self.version = f"sentence-transformers-{sentence_transformers.__version__}"
+        self.encode_batch_size = encode_batch_size
+        self.batcher = MicroBatcher(
+            self.embed_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+        )
+    
+    def _embed_matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Run the model on a batch of texts.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            float32 array of shape (len(texts), embedding_dim)
+            
+        Raises:
+            ValueError: If any text is empty
+        """
+        for text in texts:
+            if not text or len(text.strip()) == 0:
+                raise ValueError("Cannot embed empty text")
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        return self.model.encode(
+            list(texts),
+            batch_size=self.encode_batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a search query via the micro-batcher (blocks the calling thread).
+        
+        Args:
+            query: Search query text
+            
+        Returns:
+            Embedding vector
+        """
+        if not query or len(query.strip()) == 0:
+            raise ValueError("Cannot embed empty text")
+        return self.batcher.submit(query).result().tolist()
+    
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Embed a request's search queries via the micro-batcher (blocks the
+        calling thread), so they share a forward pass with other requests.
+        
+        Args:
+            queries: Search query texts
+            
+        Returns:
+            float32 array of shape (len(queries), embedding_dim)
+        """
+        for query in queries:
+            if not query or len(query.strip()) == 0:
+                raise ValueError("Cannot embed empty text")
+        if not queries:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        return np.stack([future.result() for future in self.batcher.submit_many(queries)])
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+        Embed a search query via the micro-batcher without blocking the loop.
+        
+        Args:
+            query: Search query text
+            
+        Returns:
+            Embedding vector
+        """
+        if not query or len(query.strip()) == 0:
+            raise ValueError("Cannot embed empty text")
+        return (await self.batcher.asubmit(query)).tolist()
+    
+    def close(self) -> None:
+        """Stop the micro-batcher."""
+        self.batcher.close()
+    
+    def get_config(self) -> dict:
+        """Config including the micro-batching counters."""
+        config = super().get_config()
+        config["backend"] = "sentence_transformers"
+        config["micro_batching"] = self.batcher.stats()
+        return config
+
+
+def create_embedding_service() -> EmbeddingService:
+    """
+    Build the embedding backend selected by environment.
+    
+    Env:
+        EMBEDDING_BACKEND: deterministic | sentence_transformers
+        EMBEDDING_MODEL_PATH: local model directory (sentence_transformers)
+        EMBEDDING_DEVICE, EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_WAIT_MS
+        EMBEDDING_CACHE_ENABLED: true | false | auto (default: cache model
+            backends; the deterministic backend is cheaper than a lookup)
+        EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES
+        
+    Returns:
+        EmbeddingService instance
+        
+    Raises:
+        ValueError: On an unknown backend
+    """
+    backend = os.getenv("EMBEDDING_BACKEND", "deterministic").lower()
+    
+    if backend == "deterministic":
+        service = EmbeddingService()
+    elif backend == "sentence_transformers":
+        service = SentenceTransformerEmbeddingService(
+            model_path=os.getenv("EMBEDDING_MODEL_PATH", ""),
+            device=os.getenv("EMBEDDING_DEVICE", "cpu"),
+            max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64")),
+            max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "2")),
+        )
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    
+    cache_enabled = os.getenv("EMBEDDING_CACHE_ENABLED", "auto").lower()
+    if cache_enabled == "true" or (cache_enabled == "auto" and backend != "deterministic"):
+        from services.embedding_cache import CachedEmbeddingService
+        service = CachedEmbeddingService(
+            service,
+            max_memory_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000")),
+            cache_dir=os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings") or None,
+        )
+    
+    return service
+
+
 # Singleton instance
 _embedding_service: Optional[EmbeddingService] = None
 
@@ -146,12 +415,20 @@ def get_embedding_service(force_new: bool = False) -> EmbeddingService:
     global _embedding_service
     
     if force_new or _embedding_service is None:
-        _embedding_service = EmbeddingService()
+        _embedding_service = create_embedding_service()
     
     return _embedding_service
 
 
+def set_embedding_service(service: EmbeddingService) -> None:
+    """Override global embedding service (useful for testing)."""
+    global _embedding_service
+    _embedding_service = service
+
+
 def reset_embedding_service():
     """Reset the global embedding service (for testing)."""
     global _embedding_service
+    if _embedding_service is not None:
+        _embedding_service.close()
     _embedding_service = None
@@ -0,0 +1,490 @@
+"""
+PHASE 3+: Keyword (BM25) Index
+
+On-disk inverted index over chunk text, kept next to the vector store so
+retrieval can pair dense similarity with exact keyword matching. Short
+queries such as course titles are where BM25 beats embeddings.
+
+- Storage: SQLite FTS5 (porter-stemmed unicode61 tokens) over a chunks
+  table keyed by document id. FTS5 keeps the postings and the statistics
+  bm25() needs (term frequencies, document lengths), updated per write
+- Ranking: Okapi BM25 via FTS5's built-in bm25() (k1=1.2, b=0.75)
+- Queries: free text is reduced to its terms (stopwords dropped) and ORed,
+  so any query string is safe to pass
+- Filters: the vector store's filter expressions, compiled to SQL over an
+  indexed (field, value, chunk) table that triggers keep in step with the
+  chunks, so the filter is evaluated inside the one ranked query
+- Cost cap: a query scores at most KEYWORD_INDEX_MAX_CANDIDATES chunks
+  that pass its filter; past that, its most common terms are dropped and,
+  if one term alone still matches too many chunks, its newest are scored
+
+The index lives at <persist_directory>/<collection>.bm25.sqlite3 when the
+vector store persists, else in a temporary directory that goes away with
+it (KEYWORD_INDEX_PATH overrides). IngestionPipeline writes every chunk it
+stores in the vector store here too and deletes chunks here first, so
+RetrievalAgent can use keyword hits without checking the store.
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from schemas.vector_document import VectorDocument
+from services.metadata_index import MetadataFilter, is_operator_dict
+from services.vector_store import VectorStore, get_vector_store
+
+_SQLITE_MAX_VARIABLES = 500
+
+_TERM = re.compile(r"\w+")
+
+# Scalar metadata entries of one chunk row into chunk_fields (trigger body)
+_INDEX_FIELDS = (
+    "INSERT OR IGNORE INTO chunk_fields (field, value, chunk_id) "
+    "SELECT key, value, {row}.rowid FROM json_each({row}.metadata) WHERE type NOT IN ('object', 'array');"
+)
+
+# Dropped from queries: they match most chunks and carry no topic
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or "
+    "that the their this to was were will with".split()
+)
+
+
+class KeywordIndex:
+    """
+    BM25 full-text index of stored chunks.
+
+    Connections are short-lived (one per call), so the index can be shared
+    by threads and read by other processes while a writer runs.
+
+    Usage:
+        index = KeywordIndex("./chroma_db/academic_knowledge.bm25.sqlite3")
+        index.upsert_documents(vector_docs)
+        hits = index.search("Introduction to Python", k=10)
+    """
+
+    def __init__(self, path: Optional[str] = None, max_candidates: Optional[int] = None):
+        """
+        Open (or create) an index.
+
+        Args:
+            path: SQLite file (default: a new temporary directory, removed by close())
+            max_candidates: Matches scored per query at most
+                (default: KEYWORD_INDEX_MAX_CANDIDATES or 20000)
+        """
+        self.max_candidates = max_candidates or int(os.getenv("KEYWORD_INDEX_MAX_CANDIDATES", "20000"))
+        self._temp_directory = None
+        if path is None:
+            self._temp_directory = tempfile.mkdtemp(prefix="keyword-index-")
+            path = os.path.join(self._temp_directory, "bm25.sqlite3")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    rowid INTEGER PRIMARY KEY,
+                    doc_id TEXT NOT NULL UNIQUE,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                    content, content='chunks', content_rowid='rowid', tokenize='porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                    INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE OF content ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+                    INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content);
+                END;
+                """
+            )
+            has_fields = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunk_fields'"
+            ).fetchone()
+            conn.executescript(
+                f"""
+                CREATE TABLE IF NOT EXISTS chunk_fields (
+                    field TEXT NOT NULL,
+                    value,
+                    chunk_id INTEGER NOT NULL,
+                    PRIMARY KEY (field, value, chunk_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS chunk_fields_chunk ON chunk_fields(chunk_id);
+                CREATE TRIGGER IF NOT EXISTS fields_ai AFTER INSERT ON chunks BEGIN
+                    {_INDEX_FIELDS.format(row="new")}
+                END;
+                CREATE TRIGGER IF NOT EXISTS fields_ad AFTER DELETE ON chunks BEGIN
+                    DELETE FROM chunk_fields WHERE chunk_id = old.rowid;
+                END;
+                CREATE TRIGGER IF NOT EXISTS fields_au AFTER UPDATE OF metadata ON chunks BEGIN
+                    DELETE FROM chunk_fields WHERE chunk_id = old.rowid;
+                    {_INDEX_FIELDS.format(row="new")}
+                END;
+                """
+            )
+            if not has_fields:  # Index created before metadata filtering moved into SQL
+                conn.execute(
+                    "INSERT OR IGNORE INTO chunk_fields (field, value, chunk_id) "
+                    "SELECT j.key, j.value, chunks.rowid FROM chunks, json_each(chunks.metadata) AS j "
+                    "WHERE j.type NOT IN ('object', 'array')"
+                )
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def upsert_documents(self, documents: Sequence[VectorDocument]) -> int:
+        """
+        Insert or replace chunks by id (unchanged chunks are not re-indexed).
+
+        Args:
+            documents: VectorDocuments, as stored in the vector store
+
+        Returns:
+            Number of documents given
+        """
+        rows = []
+        for doc in documents:
+            record = doc.to_chroma_format()
+            rows.append((record["id"], record["document"], json.dumps(record["metadatas"], sort_keys=True)))
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO chunks (doc_id, content, metadata) VALUES (?, ?, ?)
+                ON CONFLICT(doc_id) DO UPDATE SET content = excluded.content, metadata = excluded.metadata
+                WHERE content != excluded.content OR metadata != excluded.metadata
+                """,
+                rows,
+            )
+        return len(rows)
+
+    def delete_documents(self, ids: Sequence[str]) -> int:
+        """
+        Delete chunks by id (unknown ids are ignored).
+
+        Returns:
+            Number of chunks deleted
+        """
+        deleted = 0
+        with self._connect() as conn:
+            for chunk in self._batches(ids):
+                placeholders = ",".join("?" * len(chunk))
+                deleted += conn.execute(f"DELETE FROM chunks WHERE doc_id IN ({placeholders})", chunk).rowcount
+        return deleted
+
+    def clear(self) -> None:
+        """Drop every chunk."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks")
+
+    def close(self) -> None:
+        """Remove a temporary index (files given by path are kept)."""
+        if self._temp_directory is not None:
+            shutil.rmtree(self._temp_directory, ignore_errors=True)
+            self._temp_directory = None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def existing_ids(self, ids: Sequence[str]) -> set:
+        """Subset of ids already indexed."""
+        found: set = set()
+        with self._connect() as conn:
+            for chunk in self._batches(ids):
+                placeholders = ",".join("?" * len(chunk))
+                found.update(
+                    doc_id for (doc_id,) in conn.execute(
+                        f"SELECT doc_id FROM chunks WHERE doc_id IN ({placeholders})", chunk
+                    )
+                )
+        return found
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 top-k for one query.
+
+        Args:
+            query: Free text
+            k: Number of results
+            metadata_filters: Filter expression (see services/metadata_index.py)
+
+        Returns:
+            Results best first: content, keyword_score (higher is better),
+            metadata, document_id
+        """
+        return self.search_batch([query], k=k, metadata_filters=metadata_filters)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 10,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        BM25 top-k for several queries over one connection.
+
+        Args:
+            queries: Free-text queries
+            k: Results per query
+            metadata_filters: Filter expression, shared
+
+        Returns:
+            One result list per query (same order as queries)
+        """
+        if k < 1:
+            raise ValueError("k must be >= 1")
+        with self._connect() as conn:
+            return [self._search(conn, query, k, metadata_filters) for query in queries]
+
+    def _search(
+        self,
+        conn: sqlite3.Connection,
+        query: str,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Ranked, filtered hits of one query (one SQL query, filter included)."""
+        terms = self.query_terms(query)
+        if not terms:
+            return []
+        condition, params = _filter_sql(metadata_filters)
+        terms, min_rowid = self._cap_candidates(conn, terms, condition, params)
+        expression = " OR ".join(f'"{term}"' for term in terms)
+        rows = conn.execute(
+            f"""
+            SELECT chunks.doc_id, chunks.content, chunks.metadata, bm25(chunks_fts) AS rank
+            FROM chunks_fts JOIN chunks ON chunks.rowid = chunks_fts.rowid
+            WHERE chunks_fts MATCH ? AND chunks_fts.rowid >= ? AND {condition}
+            ORDER BY rank LIMIT ?
+            """,
+            (expression, min_rowid, *params, k),
+        ).fetchall()
+        return [
+            {
+                "content": content,
+                "keyword_score": -rank,  # FTS5 ranks best (most negative) first
+                "metadata": json.loads(metadata),
+                "document_id": doc_id,
+            }
+            for doc_id, content, metadata, rank in rows
+        ]
+
+    def _cap_candidates(
+        self,
+        conn: sqlite3.Connection,
+        terms: List[str],
+        condition: str,
+        params: List[Any],
+    ) -> Tuple[List[str], int]:
+        """
+        Bound the matches one query scores by max_candidates.
+
+        Only matches that pass the filter are scored, so a filter leaving
+        at most max_candidates chunks needs no cap. Otherwise terms are
+        kept rarest first while their combined match counts fit the cap
+        (the rarest is always kept); if that one alone exceeds it, only
+        its newest max_candidates matches are scored.
+
+        Returns:
+            (terms to match, lowest chunk rowid to score)
+        """
+        counts = {
+            term: conn.execute("SELECT COUNT(*) FROM chunks_fts WHERE chunks_fts MATCH ?", (f'"{term}"',)).fetchone()[0]
+            for term in terms
+        }
+        if sum(counts.values()) <= self.max_candidates:
+            return terms, 0
+        if params:
+            allowed = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM chunks WHERE {condition} LIMIT ?)",
+                (*params, self.max_candidates + 1),
+            ).fetchone()[0]
+            if allowed <= self.max_candidates:
+                return terms, 0
+        kept, total = [], 0
+        for term in sorted(terms, key=counts.get):
+            if kept and total + counts[term] > self.max_candidates:
+                break
+            kept.append(term)
+            total += counts[term]
+        if total <= self.max_candidates:
+            return kept, 0
+        row = conn.execute(
+            "SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+            (f'"{kept[0]}"', self.max_candidates - 1),
+        ).fetchone()
+        return kept, row[0] if row else 0
+
+    @staticmethod
+    def query_terms(query: str) -> List[str]:
+        """Distinct lowercase terms of free text, stopwords dropped (unless that leaves none)."""
+        terms = list(dict.fromkeys(term.lower() for term in _TERM.findall(query)))
+        return [term for term in terms if term not in _STOPWORDS] or terms
+
+    @classmethod
+    def match_expression(cls, query: str) -> Optional[str]:
+        """
+        FTS5 MATCH expression for free text: its distinct terms, ORed.
+
+        Returns:
+            Expression, or None if the query has no terms
+        """
+        terms = cls.query_terms(query)
+        if not terms:
+            return None
+        return " OR ".join(f'"{term}"' for term in terms)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _batches(ids: Sequence[str]) -> Iterator[List[str]]:
+        ids = list(ids)
+        for start in range(0, len(ids), _SQLITE_MAX_VARIABLES):
+            yield ids[start:start + _SQLITE_MAX_VARIABLES]
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Short-lived connection (commit on success, always closed)."""
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def _filter_sql(expression: Optional[MetadataFilter]) -> Tuple[str, List[Any]]:
+    """
+    Compile a filter expression (services/metadata_index.py dialect) into a
+    SQL condition on chunks.rowid, with the same semantics as MetadataIndex.
+
+    Returns:
+        (condition, parameters); "1" when there is no filter
+    """
+    if not expression:
+        return "1", []
+    if not isinstance(expression, dict):
+        raise ValueError(f"Filter expression must be a dict, got {expression!r}")
+    parts, params = [], []
+    for key, condition in expression.items():
+        if key in ("$and", "$or"):
+            compiled = [_filter_sql(term) for term in condition]
+            if not compiled:
+                parts.append("1" if key == "$and" else "0")
+                continue
+            joiner = " AND " if key == "$and" else " OR "
+            parts.append("(" + joiner.join(sql for sql, _ in compiled) + ")")
+            params.extend(param for _, term_params in compiled for param in term_params)
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported filter operator: {key}")
+        else:
+            sql, field_params = _field_sql(key, condition)
+            parts.append(sql)
+            params.extend(field_params)
+    return "(" + " AND ".join(parts) + ")", params
+
+
+def _field_sql(key: str, condition: Any) -> Tuple[str, List[Any]]:
+    """SQL condition on chunks.rowid for one field's condition."""
+    if not is_operator_dict(condition):
+        condition = {"$eq": condition}
+    parts, params = [], []
+    for operator, operand in condition.items():
+        if operator in ("$eq", "$ne"):
+            values = [operand]
+        elif operator in ("$in", "$nin"):
+            values = list(operand)
+        else:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        placeholders = ",".join("?" * len(values))
+        if operator in ("$eq", "$in"):
+            test = f"value IN ({placeholders})" if values else "0"
+        else:
+            test = f"value NOT IN ({placeholders})" if values else "1"
+        parts.append(f"chunks.rowid IN (SELECT chunk_id FROM chunk_fields WHERE field = ? AND {test})")
+        params.extend([key, *values])
+    return "(" + " AND ".join(parts) + ")", params
+
+
+def keyword_index_path(vector_store: VectorStore) -> Optional[str]:
+    """
+    Where the keyword index of a vector store lives.
+
+    Returns:
+        KEYWORD_INDEX_PATH, else a file next to a persistent store, else
+        None (temporary, like the store's own in-memory index)
+    """
+    override = os.getenv("KEYWORD_INDEX_PATH")
+    if override:
+        return override
+    if not vector_store.is_persistent:
+        return None
+    return os.path.join(vector_store.persist_directory, f"{vector_store.collection_name}.bm25.sqlite3")
+
+
+# Singleton instance, paired with the vector store it indexes
+_keyword_index: Optional[KeywordIndex] = None
+_keyword_index_store: Optional[VectorStore] = None
+
+
+def get_keyword_index(vector_store: Optional[VectorStore] = None, force_new: bool = False) -> KeywordIndex:
+    """
+    Get or create the keyword index of the global vector store.
+
+    A new index is opened whenever the global vector store was replaced
+    (e.g. after reset_vector_store), so the two always belong together.
+
+    Args:
+        vector_store: Store to pair with (default: get_vector_store())
+        force_new: Create new instance (for testing)
+
+    Returns:
+        KeywordIndex instance
+    """
+    global _keyword_index, _keyword_index_store
+
+    store = vector_store or get_vector_store()
+    if force_new or _keyword_index is None or _keyword_index_store is not store:
+        if _keyword_index is not None:
+            _keyword_index.close()
+        _keyword_index = KeywordIndex(keyword_index_path(store))
+        _keyword_index_store = store
+
+    return _keyword_index
+
+
+def reset_keyword_index():
+    """Reset the global keyword index (for testing)."""
+    global _keyword_index, _keyword_index_store
+    if _keyword_index is not None:
+        _keyword_index.close()
+    _keyword_index = None
+    _keyword_index_store = None
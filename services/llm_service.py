@@ -8,6 +8,7 @@ Supports: OpenAI, Anthropic, Azure OpenAI, Ollama, Gemini, etc.
 from abc import ABC, abstractmethod
 from typing import Optional, List, Dict, Any
 from enum import Enum
+import asyncio
 import os
 from dataclasses import dataclass
 from dotenv import load_dotenv
@@ -309,20 +310,22 @@ class GeminiService(BaseLLMService):
         """Stream response from Gemini API (as async generator)."""
         full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
         
-        import asyncio
-        loop = asyncio.get_event_loop()
-        
-        response = await loop.run_in_executor(
+        # The SDK stream is a blocking iterator; pull each chunk in the
+        # executor so the event loop keeps serving other work.
+        loop = asyncio.get_running_loop()
+        stream = await loop.run_in_executor(
             None,
-            lambda: self.client.models.generate_content(
+            lambda: iter(self.client.models.generate_content_stream(
                 model=self.model_name,
                 contents=full_prompt,
                 config=self._get_generation_config(**kwargs),
-                stream=True
-            )
+            ))
         )
         
-        for chunk in response:
+        while True:
+            chunk = await loop.run_in_executor(None, next, stream, None)
+            if chunk is None:
+                break
             if chunk.text:
                 yield chunk.text
 
@@ -344,6 +347,98 @@ class GeminiService(BaseLLMService):
         return len(text) // 4
 
 
+class LLMRateLimiter:
+    """
+    Shared LLM call budget.
+    
+    Enforces a requests-per-minute pace and/or a cap on concurrent calls
+    across everything that shares the limiter (e.g., one batch run).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        max_concurrent: Optional[int] = None,
+    ):
+        """
+        Initialize limiter.
+        
+        Args:
+            requests_per_minute: Max request starts per minute (None = unlimited)
+            max_concurrent: Max calls in flight at once (None = unlimited)
+        """
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        """Wait for a concurrency slot and the next pacing slot."""
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        
+        try:
+            if self.interval:
+                loop = asyncio.get_running_loop()
+                async with self._lock:
+                    now = loop.time()
+                    start_at = max(now, self._next_slot)
+                    self._next_slot = start_at + self.interval
+                if start_at > now:
+                    await asyncio.sleep(start_at - now)
+        except BaseException:
+            # Cancelled while pacing (e.g. a deadline): __aexit__ won't run
+            self.release()
+            raise
+
+    def release(self) -> None:
+        """Release the concurrency slot."""
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    async def __aenter__(self) -> "LLMRateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+class RateLimitedLLMService(BaseLLMService):
+    """Wraps any LLM service so every call draws from a shared LLMRateLimiter."""
+
+    def __init__(self, service: BaseLLMService, limiter: LLMRateLimiter):
+        """Initialize wrapper around an existing service."""
+        super().__init__(service.config)
+        self.service = service
+        self.limiter = limiter
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ) -> LLMResponse:
+        """Generate response once the limiter admits the call."""
+        async with self.limiter:
+            return await self.service.generate(prompt, system_prompt, **kwargs)
+
+    async def generate_streaming(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        **kwargs
+    ):
+        """Stream response; the slot is held until the stream ends."""
+        async with self.limiter:
+            async for chunk in self.service.generate_streaming(prompt, system_prompt, **kwargs):
+                yield chunk
+
+    def estimate_tokens(self, text: str) -> int:
+        """Delegate token estimation."""
+        return self.service.estimate_tokens(text)
+
+
 class LLMFactory:
     """Factory for creating LLM service instances."""
 
@@ -0,0 +1,357 @@
+"""
+PHASE 3+: Metadata Bitmap Index
+
+Inverted index from (metadata field, value) to the rows holding that
+value. The NumPy vector indexes use it to resolve a filter to its
+candidate rows before any vector is scored, so top-k runs over the
+survivors only instead of over every row.
+
+Filter expressions use the Chroma `where` dialect, so one filter works on
+every backend:
+    {"audience_level": "beginner"}                       equality
+    {"source_type": {"$in": ["syllabus", "example"]}}    $eq, $ne, $in, $nin
+    {"$or": [{"degree_level": "graduate"},
+             {"institution_name": "MIT"}]}               $and, $or (nestable)
+The entries of one dict are ANDed. $ne/$nin match rows that have the
+field with another value (rows without the field never match).
+
+Postings are sorted int32 row arrays (the array container of a compressed
+bitmap): 4 bytes per row holding a value and nothing for rows that don't,
+so high-cardinality fields such as session_id cost memory proportional to
+the corpus, not corpus x distinct values. AND intersects smallest posting
+first, OR merges, $ne/$nin take the complement within the field.
+Postings grow in place on append and are copied on any other change, so
+arrays handed to a search stay valid while writers continue.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+MetadataFilter = Dict[str, Any]
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+class _Posting:
+    """Sorted row numbers holding one (field, value)."""
+
+    __slots__ = ("rows", "count")
+
+    def __init__(self):
+        self.rows = np.empty(8, dtype=np.int32)
+        self.count = 0
+
+    def view(self) -> np.ndarray:
+        return self.rows[:self.count]
+
+    def add(self, row: int) -> None:
+        if self.count and row <= self.rows[self.count - 1]:
+            view = self.view()
+            position = int(np.searchsorted(view, row))
+            if view[position] != row:
+                self.rows = np.insert(view, position, row)
+                self.count += 1
+            return
+        if self.count == len(self.rows):
+            grown = np.empty(2 * len(self.rows), dtype=np.int32)
+            grown[:self.count] = self.rows[:self.count]
+            self.rows = grown
+        self.rows[self.count] = row
+        self.count += 1
+
+    def remove(self, row: int) -> None:
+        view = self.view()
+        position = int(np.searchsorted(view, row))
+        if position < self.count and view[position] == row:
+            self.rows = np.delete(view, position)
+            self.count -= 1
+
+
+class MetadataIndex:
+    """
+    Per-field, per-value postings over row numbers 0..len-1.
+
+    Not thread-safe: owners mutate and query it under their own lock.
+
+    Usage:
+        index = MetadataIndex.build(metadatas)
+        rows = index.candidates({"$or": [{"source_type": "syllabus"}, {"session_id": "s1"}]})
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[Any, _Posting]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def build(cls, metadatas: Iterable[Dict[str, Any]]) -> "MetadataIndex":
+        """Index rows 0..n-1 from their metadata."""
+        index = cls()
+        index.extend(metadatas)
+        return index
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, metadata: Dict[str, Any]) -> int:
+        """
+        Index a new row after the last one.
+
+        Returns:
+            Row number assigned
+        """
+        row = self._size
+        self._size += 1
+        for key, value in metadata.items():
+            posting = self._posting(key, value, create=True)
+            if posting is not None:
+                posting.add(row)
+        return row
+
+    def extend(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Append several rows."""
+        for metadata in metadatas:
+            self.append(metadata)
+
+    def append_postings(self, postings: Iterable[Tuple[str, Any, np.ndarray]], size: int) -> None:
+        """
+        Bulk-append rows given as postings (e.g. loaded from a stored index).
+
+        Arrays are adopted without copying (read-only memory maps are fine:
+        postings never write into an array they did not allocate).
+
+        Args:
+            postings: (field, value, sorted int32 rows), all rows >= len(self)
+            size: Row count afterwards
+        """
+        for key, value, rows in postings:
+            posting = self._posting(key, value, create=True)
+            if posting is None:
+                continue
+            posting.rows = np.concatenate([posting.view(), rows]) if posting.count else rows
+            posting.count = len(posting.rows)
+        self._size = size
+
+    def replace(self, row: int, old: Dict[str, Any], new: Dict[str, Any]) -> None:
+        """
+        Re-index a row whose metadata changed from old to new.
+
+        Args:
+            row: Row number
+            old: Metadata currently indexed for the row
+            new: Replacement metadata
+        """
+        for key in old.keys() | new.keys():
+            if key in old and key in new and old[key] == new[key]:
+                continue
+            if key in old:
+                posting = self._posting(key, old[key])
+                if posting is not None:
+                    posting.remove(row)
+            if key in new:
+                posting = self._posting(key, new[key], create=True)
+                if posting is not None:
+                    posting.add(row)
+
+    def delete_rows(self, rows: Sequence[int]) -> None:
+        """
+        Drop rows and renumber the rest compactly (as NumpyVectorIndex.delete does).
+
+        Args:
+            rows: Row numbers to drop
+        """
+        dropped = np.unique(np.asarray(rows, dtype=np.int64))
+        if len(dropped) == 0:
+            return
+        for key, postings in self._postings.items():
+            for value in list(postings):
+                view = postings[value].view()
+                kept = view[~np.isin(view, dropped, assume_unique=True)]
+                if len(kept) == 0:
+                    del postings[value]
+                    continue
+                posting = _Posting()
+                posting.rows = (kept - np.searchsorted(dropped, kept)).astype(np.int32)
+                posting.count = len(kept)
+                postings[value] = posting
+        self._postings = {key: postings for key, postings in self._postings.items() if postings}
+        self._size -= len(dropped)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def candidates(self, metadata_filters: Optional[MetadataFilter], size: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        Rows matching a filter expression.
+
+        Args:
+            metadata_filters: Filter expression (None/empty = no filter)
+            size: Only consider rows below this (a search snapshot)
+
+        Returns:
+            Sorted int32 row numbers, or None when there is no filter
+        """
+        if not metadata_filters:
+            return None
+        rows = self._evaluate(metadata_filters)
+        if size is not None and size < self._size:
+            rows = rows[:np.searchsorted(rows, size)]
+        return rows
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    def _evaluate(self, expression: MetadataFilter) -> np.ndarray:
+        """Sorted rows matching an expression (AND of its entries)."""
+        if not isinstance(expression, dict):
+            raise ValueError(f"Filter expression must be a dict, got {expression!r}")
+        parts = []
+        for key, condition in expression.items():
+            if key == "$and":
+                parts.append(self._intersect([self._evaluate(e) for e in condition]))
+            elif key == "$or":
+                parts.append(self._union([self._evaluate(e) for e in condition]))
+            elif key.startswith("$"):
+                raise ValueError(f"Unsupported filter operator: {key}")
+            else:
+                parts.append(self._field(key, condition))
+        return self._intersect(parts)
+
+    def _field(self, key: str, condition: Any) -> np.ndarray:
+        """Sorted rows where one field satisfies a condition."""
+        if not is_operator_dict(condition):
+            return self._rows(key, condition)
+        parts = []
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                parts.append(self._rows(key, operand))
+            elif operator == "$in":
+                parts.append(self._union([self._rows(key, value) for value in operand]))
+            elif operator == "$ne":
+                parts.append(self._complement(key, self._rows(key, operand)))
+            elif operator == "$nin":
+                parts.append(self._complement(key, self._union([self._rows(key, value) for value in operand])))
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+        return self._intersect(parts)
+
+    def _rows(self, key: str, value: Any) -> np.ndarray:
+        posting = self._posting(key, value)
+        return posting.view() if posting is not None else _EMPTY
+
+    def _complement(self, key: str, rows: np.ndarray) -> np.ndarray:
+        """Rows having the field, minus rows."""
+        present = self._union([posting.view() for posting in self._postings.get(key, {}).values()])
+        return np.setdiff1d(present, rows, assume_unique=True)
+
+    def _intersect(self, parts: List[np.ndarray]) -> np.ndarray:
+        if not parts:
+            return np.arange(self._size, dtype=np.int32)
+        parts = sorted(parts, key=len)
+        rows = parts[0]
+        for other in parts[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    @staticmethod
+    def _union(parts: List[np.ndarray]) -> np.ndarray:
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return _EMPTY
+        if len(parts) == 1:
+            return parts[0]
+        return np.unique(np.concatenate(parts))
+
+    def _posting(self, key: str, value: Any, create: bool = False) -> Optional[_Posting]:
+        """Posting of (key, value); None for unhashable values."""
+        try:
+            hash(value)
+        except TypeError:
+            return None
+        postings = self._postings.get(key)
+        if postings is None:
+            if not create:
+                return None
+            postings = self._postings[key] = {}
+        posting = postings.get(value)
+        if posting is None and create:
+            posting = postings[value] = _Posting()
+        return posting
+
+
+def conjuncts(metadata_filters: Optional[MetadataFilter]) -> List[Tuple[str, Any]]:
+    """
+    Top-level AND terms of an expression as (key, condition) pairs.
+
+    Nested $and lists are flattened; a $or term is kept whole as ("$or", [...]).
+    """
+    terms: List[Tuple[str, Any]] = []
+    for key, condition in (metadata_filters or {}).items():
+        if key == "$and":
+            for expression in condition:
+                terms.extend(conjuncts(expression))
+        else:
+            terms.append((key, condition))
+    return terms
+
+
+def allowed_values(condition: Any) -> Optional[Set[str]]:
+    """
+    Values (as strings) a field may take under an equality or $in condition.
+
+    Returns:
+        Set of values, or None for any other condition
+    """
+    if not is_operator_dict(condition):
+        return {str(condition)}
+    if set(condition) == {"$eq"}:
+        return {str(condition["$eq"])}
+    if set(condition) == {"$in"}:
+        return {str(value) for value in condition["$in"]}
+    return None
+
+
+def to_chroma_where(metadata_filters: Optional[MetadataFilter]) -> Optional[Dict[str, Any]]:
+    """
+    Translate a filter expression into a ChromaDB where clause.
+
+    Chroma wants one field per dict, explicit operators and at least two
+    terms per $and/$or, so shorthand forms are expanded here.
+
+    Args:
+        metadata_filters: Filter expression
+
+    Returns:
+        ChromaDB where clause (None when there is no filter)
+    """
+    if not metadata_filters:
+        return None
+    clauses = []
+    for key, condition in metadata_filters.items():
+        if key in ("$and", "$or"):
+            terms = [to_chroma_where(expression) for expression in condition]
+            terms = [term for term in terms if term]
+            if len(terms) == 1:
+                clauses.append(terms[0])
+            elif terms:
+                clauses.append({key: terms})
+        elif is_operator_dict(condition):
+            clauses.extend({key: {operator: operand}} for operator, operand in condition.items())
+        else:
+            clauses.append({key: {"$eq": condition}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def is_operator_dict(condition: Any) -> bool:
+    """True for {"$op": operand, ...} conditions (as opposed to a plain value)."""
+    return isinstance(condition, dict) and bool(condition) and all(str(key).startswith("$") for key in condition)
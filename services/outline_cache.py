@@ -0,0 +1,293 @@
+"""
+PHASE 5+: Outline Cache
+
+Content-addressed cache for synthesized course outlines.
+
+Key = normalized user input (UserInputSchema.fingerprint) + fingerprint of the
+context the outline was synthesized from (retrieved chunks, web sources, PDF).
+Same request + same sources → same key, so a repeated request is served
+without an LLM call.
+
+Tiers:
+- Memory: bounded LRU (OrderedDict), per process
+- Disk: SQLite table, shared across processes and restarts
+
+Entries older than the TTL are treated as misses and evicted on access.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from schemas.course_outline import CourseOutlineSchema
+from schemas.execution_context import ExecutionContext
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(value: Any) -> str:
+    """Hash a JSON-serializable value canonically."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def context_fingerprint(context: ExecutionContext) -> str:
+    """
+    Fingerprint the synthesis context, ignoring volatile fields.
+
+    Only source identity is hashed (chunk ids, URLs, PDF text); timestamps,
+    latencies and derived summaries are left out so that re-running the same
+    searches yields the same fingerprint.
+
+    Args:
+        context: ExecutionContext after enrichment
+
+    Returns:
+        Hex sha256 digest
+    """
+    retrieved = context.retrieved_documents
+    if isinstance(retrieved, dict):
+        retrieved = retrieved.get("retrieved_chunks", [])
+    retrieved_ids = [
+        (doc.get("document_id") or _sha256(doc)) if isinstance(doc, dict) else _sha256(doc)
+        for doc in retrieved or []
+    ]
+
+    web = context.web_search_results or {}
+    web_ids = {
+        "query": web.get("search_query"),
+        "sources": [link.get("url") for link in web.get("source_links", [])],
+        "results": [
+            result.get("url") or result.get("title") for result in web.get("results", [])
+        ],
+    }
+
+    pdf_text = context.uploaded_pdf_text
+    pdf_id = hashlib.sha256(pdf_text.encode("utf-8")).hexdigest() if pdf_text else None
+
+    return _sha256({"retrieved": retrieved_ids, "web": web_ids, "pdf": pdf_id})
+
+
+class OutlineCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of CourseOutlineSchema results.
+
+    Design:
+    - Outlines are stored as JSON; every hit returns a fresh object, so
+      callers may mutate what they get back
+    - A disk hit is promoted into the memory tier
+    - Thread-safe (one lock around both tiers)
+    """
+
+    def __init__(
+        self,
+        max_memory_entries: int = 256,
+        ttl_seconds: float = 86400.0,
+        db_path: Optional[str] = None,
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            max_memory_entries: LRU capacity of the memory tier
+            ttl_seconds: Entry lifetime (both tiers)
+            db_path: SQLite file for the disk tier (None = memory only)
+        """
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.db_path:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS outline_cache ("
+                    "key TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+
+    @staticmethod
+    def make_key(context: ExecutionContext) -> str:
+        """Cache key for a context: normalized input + context fingerprint (+ mode)."""
+        return (
+            f"{context.user_input.fingerprint()}:{context_fingerprint(context)}"
+            f":{context.execution_mode}"
+        )
+
+    def get(self, key: str) -> Optional[CourseOutlineSchema]:
+        """
+        Look up an outline.
+
+        Args:
+            key: Cache key (see make_key)
+
+        Returns:
+            CourseOutlineSchema or None on miss/expiry
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, payload = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return CourseOutlineSchema.model_validate_json(payload)
+                del self._memory[key]
+                self.expirations += 1
+
+            if self.db_path:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT payload, created_at FROM outline_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        payload, created_at = row
+                        if now - created_at <= self.ttl_seconds:
+                            self._remember(key, created_at, payload)
+                            self.disk_hits += 1
+                            return CourseOutlineSchema.model_validate_json(payload)
+                        conn.execute("DELETE FROM outline_cache WHERE key = ?", (key,))
+                        self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, outline: CourseOutlineSchema) -> None:
+        """
+        Store an outline in both tiers.
+
+        Args:
+            key: Cache key (see make_key)
+            outline: Synthesized outline
+        """
+        payload = outline.model_dump_json()
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, payload)
+            if self.db_path:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO outline_cache (key, payload, created_at) "
+                        "VALUES (?, ?, ?)",
+                        (key, payload, created_at),
+                    )
+
+    def purge_expired(self) -> int:
+        """
+        Drop every expired entry from both tiers.
+
+        Returns:
+            Number of entries removed
+        """
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        with self._lock:
+            for key in [k for k, (created_at, _) in self._memory.items() if created_at < cutoff]:
+                del self._memory[key]
+                removed += 1
+            if self.db_path:
+                with self._connect() as conn:
+                    removed += conn.execute(
+                        "DELETE FROM outline_cache WHERE created_at < ?", (cutoff,)
+                    ).rowcount
+            self.expirations += removed
+        return removed
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+            if self.db_path:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM outline_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tier sizes."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            disk_entries = 0
+            if self.db_path:
+                with self._connect() as conn:
+                    disk_entries = conn.execute("SELECT COUNT(*) FROM outline_cache").fetchone()[0]
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def _remember(self, key: str, created_at: float, payload: str) -> None:
+        """Insert into the memory tier, evicting least recently used entries."""
+        self._memory[key] = (created_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Short-lived disk tier connection (commit on success, always closed)."""
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+# Global singleton instance (lazy-loaded)
+_outline_cache: Optional[OutlineCache] = None
+
+
+def get_outline_cache() -> Optional[OutlineCache]:
+    """
+    Get or create global outline cache from environment.
+
+    Returns None when OUTLINE_CACHE_ENABLED=false.
+    """
+    global _outline_cache
+
+    if _outline_cache is None:
+        if os.getenv("OUTLINE_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        _outline_cache = OutlineCache(
+            max_memory_entries=int(os.getenv("OUTLINE_CACHE_MAX_ENTRIES", "256")),
+            ttl_seconds=float(os.getenv("OUTLINE_CACHE_TTL_SECONDS", "86400")),
+            db_path=os.getenv("OUTLINE_CACHE_PATH", ".cache/outline_cache.sqlite3") or None,
+        )
+
+    return _outline_cache
+
+
+def set_outline_cache(cache: Optional[OutlineCache]) -> None:
+    """Override global outline cache (useful for testing)."""
+    global _outline_cache
+    _outline_cache = cache
+
+
+def reset_outline_cache() -> None:
+    """Reset global outline cache (useful for testing)."""
+    global _outline_cache
+    _outline_cache = None
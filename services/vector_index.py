@@ -0,0 +1,441 @@
+"""
+PHASE 3+: In-Process Vector Index
+
+NumPy backend for VectorStore when ChromaDB is unavailable (or not wanted).
+
+- Storage: one float32 matrix of unit vectors (amortized O(1) appends)
+- Search: exact cosine top-k (matrix product + argpartition)
+- Filters: resolved to candidate rows by a metadata bitmap index
+  (services/metadata_index.py) before scoring, so only survivors are scored
+- IVF: optional coarse quantizer (spherical k-means). Once trained, a
+  query only scores rows in its nprobe nearest lists. Trained
+  automatically when the index grows past ivf_threshold vectors.
+- Persistence: np.save; load() memory-maps the matrix (copy-on-write), so
+  pages are read on first use and later appends/upserts never touch the
+  saved file until the next save()
+
+Rows are addressed by document id; adding an existing id replaces it.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.metadata_index import MetadataIndex
+
+
+class NumpyVectorIndex:
+    """
+    Flat (exact) cosine index with an optional IVF coarse quantizer.
+
+    Thread-safe: mutations hold a lock; searches work on a consistent
+    snapshot of the matrix and do the heavy math outside the lock.
+    """
+
+    GROWTH_ROWS = 1024
+    VECTORS_FILE = "vectors.npy"
+    RECORDS_FILE = "records.json"
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    ASSIGNMENTS_FILE = "ivf_assignments.npy"
+
+    def __init__(self, embedding_dim: int, ivf_threshold: int = 100_000, nprobe: int = 8):
+        """
+        Initialize empty index.
+
+        Args:
+            embedding_dim: Vector dimension
+            ivf_threshold: Train the IVF quantizer once this many vectors exist
+                (0 disables automatic training)
+            nprobe: IVF lists scanned per query
+        """
+        self.embedding_dim = embedding_dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+
+        self._vectors = np.empty((0, embedding_dim), dtype=np.float32)
+        self._size = 0
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._row_of: Dict[str, int] = {}
+        self._metadata_index = MetadataIndex()
+
+        self.centroids: Optional[np.ndarray] = None  # (nlist, dim) when IVF is trained
+        self._assignments = np.empty(0, dtype=np.int32)
+
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_ivf(self) -> bool:
+        """True once the coarse quantizer is trained."""
+        return self.centroids is not None
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> int:
+        """
+        Insert or replace rows.
+
+        Args:
+            ids: Document ids (an existing id is overwritten)
+            embeddings: (n, dim) array-like
+            documents: Document texts
+            metadatas: Metadata dicts
+
+        Returns:
+            Number of rows written
+        """
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embedding_dim))
+        if not (len(ids) == len(vectors) == len(documents) == len(metadatas)):
+            raise ValueError("ids, embeddings, documents and metadatas must have equal length")
+
+        with self._lock:
+            new_count = len({doc_id for doc_id in ids if doc_id not in self._row_of})
+            self._ensure_capacity(self._size + new_count)
+
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, doc_id in enumerate(ids):
+                row = self._row_of.get(doc_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_of[doc_id] = row
+                    self.ids.append(doc_id)
+                    self.documents.append(documents[i])
+                    self.metadatas.append(metadatas[i])
+                    self._metadata_index.append(metadatas[i])
+                else:
+                    self.documents[row] = documents[i]
+                    self._metadata_index.replace(row, self.metadatas[row], metadatas[i])
+                    self.metadatas[row] = metadatas[i]
+                rows[i] = row
+
+            self._vectors[rows] = vectors
+            if self.is_ivf:
+                self._assignments[rows] = self._nearest_centroids(vectors, 1)[:, 0]
+
+            if not self.is_ivf and self.ivf_threshold and self._size >= self.ivf_threshold:
+                self.train_ivf()
+
+        return len(ids)
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """
+        Remove rows by id (the matrix is compacted; row numbers shift).
+
+        Args:
+            ids: Document ids (unknown ids are ignored)
+
+        Returns:
+            Number of rows deleted
+        """
+        with self._lock:
+            rows = [self._row_of[doc_id] for doc_id in set(ids) if doc_id in self._row_of]
+            if not rows:
+                return 0
+            keep = np.ones(self._size, dtype=bool)
+            keep[rows] = False
+
+            # Fresh arrays: searches holding the old snapshot stay consistent
+            self._vectors = self._vectors[:self._size][keep]
+            if self.is_ivf:
+                self._assignments = self._assignments[:self._size][keep]
+            kept = np.flatnonzero(keep).tolist()
+            self.ids = [self.ids[row] for row in kept]
+            self.documents = [self.documents[row] for row in kept]
+            self.metadatas = [self.metadatas[row] for row in kept]
+            self._metadata_index.delete_rows(rows)
+            self._row_of = {doc_id: row for row, doc_id in enumerate(self.ids)}
+            self._size = len(self.ids)
+        return len(rows)
+
+    def clear(self) -> None:
+        """Remove every row and the quantizer."""
+        with self._lock:
+            self._vectors = np.empty((0, self.embedding_dim), dtype=np.float32)
+            self._size = 0
+            self.ids, self.documents, self.metadatas = [], [], []
+            self._row_of = {}
+            self._metadata_index = MetadataIndex()
+            self.centroids = None
+            self._assignments = np.empty(0, dtype=np.int32)
+
+    def train_ivf(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: int = 65_536, seed: int = 0) -> None:
+        """
+        Train the IVF coarse quantizer with spherical k-means.
+
+        Args:
+            nlist: Number of inverted lists (default 4 * sqrt(n))
+            iterations: k-means iterations
+            sample_size: Rows sampled for training
+            seed: RNG seed (training is deterministic)
+        """
+        with self._lock:
+            if self._size == 0:
+                return
+            vectors = self._vectors[:self._size]
+            nlist = min(nlist or int(4 * np.sqrt(self._size)), self._size)
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(self._size, size=min(sample_size, self._size), replace=False)]
+
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                empty = ~np.any(sums, axis=1)
+                sums[empty] = centroids[empty]  # Keep empty lists where they were
+                centroids = self._normalize(sums)
+
+            self.centroids = centroids
+            self._assignments = np.empty(len(self._vectors), dtype=np.int32)
+            for start in range(0, self._size, 16_384):
+                block = vectors[start:start + 16_384]
+                self._assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Cosine top-k for each query.
+
+        Args:
+            query_embeddings: (q, dim) array-like
+            k: Results per query
+            metadata_filters: Filter expression (see services/metadata_index.py)
+
+        Returns:
+            Per query: [(row, cosine similarity)] best first
+        """
+        return self._search(query_embeddings, k, metadata_filters)[0]
+
+    def search_records(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        include_vectors: bool = False,
+    ) -> List[List[Tuple[Tuple[Any, ...], float]]]:
+        """
+        Like search(), with every hit resolved to (id, document, metadata).
+
+        Rows are resolved against the snapshot the search scored: a delete
+        running meanwhile renumbers rows, so resolving them later with
+        get() could return another document (or fail).
+
+        Args:
+            include_vectors: Append each hit's stored (unit-length) vector to its record
+
+        Returns:
+            Per query: [((id, document, metadata[, vector]), cosine similarity)] best first
+        """
+        results, (ids, documents, metadatas, vectors) = self._search(query_embeddings, k, metadata_filters)
+        if include_vectors:
+            return [
+                [((ids[row], documents[row], metadatas[row], vectors[row].copy()), score) for row, score in hits]
+                for hits in results
+            ]
+        return [
+            [((ids[row], documents[row], metadatas[row]), score) for row, score in hits]
+            for hits in results
+        ]
+
+    def _search(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]],
+    ) -> Tuple[List[List[Tuple[int, float]]], Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]]:
+        """Top-k rows per query, plus the (ids, documents, metadatas, vectors) they index."""
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.embedding_dim))
+        with self._lock:
+            size = self._size
+            vectors = self._vectors[:size]
+            centroids = self.centroids
+            assignments = self._assignments[:size]
+            allowed = self._metadata_index.candidates(metadata_filters, size)
+            records = (self.ids, self.documents, self.metadatas, vectors)  # delete() builds new ones
+
+        results = []
+        probes = self._nearest_centroids(queries, self.nprobe, centroids) if centroids is not None else None
+        for q, query in enumerate(queries):
+            rows = allowed
+            if probes is not None:
+                if rows is None:
+                    rows = np.flatnonzero(np.isin(assignments, probes[q]))
+                else:
+                    rows = rows[np.isin(assignments[rows], probes[q])]
+            results.append(self._top_k(vectors, query, k, rows))
+        return results, records
+
+    def get(self, row: int) -> Tuple[str, str, Dict[str, Any]]:
+        """(id, document, metadata) of a row (row numbers shift on delete: see search_records)."""
+        return self.ids[row], self.documents[row], self.metadatas[row]
+
+    def existing_ids(self, ids: Sequence[str]) -> set:
+        """Subset of ids already stored."""
+        with self._lock:
+            return {doc_id for doc_id in ids if doc_id in self._row_of}
+
+    def get_vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored (unit-length) vectors of the ids that exist."""
+        with self._lock:
+            return {doc_id: self._vectors[self._row_of[doc_id]].copy() for doc_id in ids if doc_id in self._row_of}
+
+    def iter_records(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]]:
+        """Every row as (ids, vectors, documents, metadatas) batches, from a snapshot taken up front."""
+        with self._lock:
+            ids, documents, metadatas = list(self.ids), list(self.documents), list(self.metadatas)
+            vectors = self._vectors[:self._size].copy()
+        for start in range(0, len(ids), batch_size):
+            stop = start + batch_size
+            yield ids[start:stop], vectors[start:stop], documents[start:stop], metadatas[start:stop]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, directory: str) -> None:
+        """
+        Write the index to a directory (files are replaced atomically).
+
+        Args:
+            directory: Target directory
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._atomic_save(directory, self.VECTORS_FILE, self._vectors[:self._size])
+            records = {
+                "embedding_dim": self.embedding_dim,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+            }
+            tmp_path = os.path.join(directory, self.RECORDS_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(records, handle)
+            os.replace(tmp_path, os.path.join(directory, self.RECORDS_FILE))
+
+            if self.is_ivf:
+                self._atomic_save(directory, self.CENTROIDS_FILE, self.centroids)
+                self._atomic_save(directory, self.ASSIGNMENTS_FILE, self._assignments[:self._size])
+            else:
+                for name in (self.CENTROIDS_FILE, self.ASSIGNMENTS_FILE):
+                    if os.path.exists(os.path.join(directory, name)):
+                        os.remove(os.path.join(directory, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, **kwargs) -> "NumpyVectorIndex":
+        """
+        Open a saved index.
+
+        Args:
+            directory: Directory written by save()
+            mmap: Memory-map the matrix instead of reading it eagerly
+            **kwargs: Constructor options (ivf_threshold, nprobe)
+
+        Returns:
+            NumpyVectorIndex
+        """
+        with open(os.path.join(directory, cls.RECORDS_FILE), encoding="utf-8") as handle:
+            records = json.load(handle)
+
+        index = cls(records["embedding_dim"], **kwargs)
+        mmap_mode = "c" if mmap else None  # Copy-on-write: the file stays untouched
+        index._vectors = np.load(os.path.join(directory, cls.VECTORS_FILE), mmap_mode=mmap_mode)
+        index._size = len(index._vectors)
+        index.ids = records["ids"]
+        index.documents = records["documents"]
+        index.metadatas = records["metadatas"]
+        index._row_of = {doc_id: row for row, doc_id in enumerate(index.ids)}
+        index._metadata_index = MetadataIndex.build(index.metadatas)
+
+        centroids_path = os.path.join(directory, cls.CENTROIDS_FILE)
+        if os.path.exists(centroids_path):
+            index.centroids = np.load(centroids_path)
+            index._assignments = np.load(os.path.join(directory, cls.ASSIGNMENTS_FILE))
+        return index
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """True if directory holds a saved index."""
+        return os.path.exists(os.path.join(directory, NumpyVectorIndex.RECORDS_FILE))
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _ensure_capacity(self, rows: int) -> None:
+        """Grow the matrix (and IVF assignments) geometrically."""
+        capacity = len(self._vectors)
+        if rows <= capacity:
+            return  # In place (a copy-on-write map accepts writes too)
+        new_capacity = max(rows, 2 * capacity, self.GROWTH_ROWS)
+        grown = np.empty((new_capacity, self.embedding_dim), dtype=np.float32)
+        grown[:self._size] = self._vectors[:self._size]
+        self._vectors = grown
+        if self.is_ivf:
+            assignments = np.empty(new_capacity, dtype=np.int32)
+            assignments[:self._size] = self._assignments[:self._size]
+            self._assignments = assignments
+
+    def _nearest_centroids(self, queries: np.ndarray, count: int, centroids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Indices of the count most similar centroids per query."""
+        centroids = self.centroids if centroids is None else centroids
+        scores = queries @ centroids.T
+        count = min(count, len(centroids))
+        if count == len(centroids):
+            return np.argsort(-scores, axis=1)
+        return np.argpartition(-scores, count - 1, axis=1)[:, :count]
+
+    @staticmethod
+    def _top_k(vectors: np.ndarray, query: np.ndarray, k: int, rows: Optional[np.ndarray]) -> List[Tuple[int, float]]:
+        """Exact top-k over all rows or the given candidate rows."""
+        candidates = rows
+        if candidates is None:
+            scores = vectors @ query
+        else:
+            scores = vectors[candidates] @ query
+        if len(scores) == 0:
+            return []
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        picked = top if candidates is None else candidates[top]
+        return [(int(row), float(score)) for row, score in zip(picked, scores[top])]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Unit-normalize rows (zero rows are left as zeros)."""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def _atomic_save(directory: str, name: str, array: np.ndarray) -> None:
+        """np.save to a temp file, then rename over the target."""
+        tmp_path = os.path.join(directory, name + ".tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(array))
+        os.replace(tmp_path, os.path.join(directory, name))
@@ -0,0 +1,445 @@
+"""
+PHASE 3+: Metadata-Partitioned Vector Index
+
+Routes every document into a child index keyed by the values of a few
+metadata fields (default: audience_level, subject_domain — the filters
+RetrievalAgent always sends). A query whose filters pin those fields
+searches only the matching partition, so its cost tracks the size of that
+partition instead of the whole corpus; the pinned fields need no
+post-filtering. A field is pinned by a top-level equality or $in term of
+the filter expression. Queries that leave a partition field open fan out
+over every matching partition and merge the per-partition top-k.
+
+Children are any index with the NumpyVectorIndex interface (add / delete /
+existing_ids / get_vectors / search / search_records / get / clear), so
+the same routing serves in-memory, segmented and Chroma-backed
+collections. Rows are addressed by (partition_id, child_row) handles.
+
+An optional legacy child (a collection written before partitioning) is
+searched with the full filters on every query and is never written to;
+migrate_legacy() moves its rows into the partitions and drops it.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import threading
+from typing import Any, Callable, Container, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from services.metadata_index import MetadataFilter, allowed_values, conjuncts
+
+PartitionValues = Dict[str, str]
+RowHandle = Tuple[str, Any]
+
+LEGACY_PARTITION = ""
+PARTITION_FILE = "partition.json"
+
+
+def partition_id(values: PartitionValues) -> str:
+    """Stable directory/collection-safe id of a partition."""
+    encoded = json.dumps(values, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+class PartitionedVectorIndex:
+    """
+    Index made of one child index per partition-key value combination.
+
+    Usage:
+        index = PartitionedVectorIndex(
+            ("audience_level", "subject_domain"),
+            factory=lambda pid, values: NumpyVectorIndex(384),
+        )
+        index.add(ids, embeddings, documents, metadatas)
+        hits = index.search(queries, k=5, metadata_filters={"audience_level": "beginner"})
+    """
+
+    def __init__(
+        self,
+        partition_keys: Sequence[str],
+        factory: Callable[[str, PartitionValues], Any],
+        partitions: Optional[Dict[str, Tuple[PartitionValues, Any]]] = None,
+        legacy: Optional[Any] = None,
+        discover: Optional[Callable[[Set[str]], Dict[str, PartitionValues]]] = None,
+    ):
+        """
+        Initialize index.
+
+        Args:
+            partition_keys: Metadata fields that select the partition
+            factory: Creates (or opens) the child of a partition from its id and values
+            partitions: Existing partitions, id -> (values, child)
+            legacy: Unpartitioned child searched with the full filters (read/delete only)
+            discover: Lists partitions on shared storage that are not in the
+                given set of known ids (id -> values), so partitions created
+                by other processes are picked up
+        """
+        if not partition_keys:
+            raise ValueError("partition_keys must not be empty")
+        self.partition_keys = tuple(partition_keys)
+        self.factory = factory
+        self.partitions: Dict[str, Tuple[PartitionValues, Any]] = dict(partitions or {})
+        self.legacy = legacy
+        self.discover = discover
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return sum(len(child) for _, child in self._children(include_legacy=True))
+
+    @property
+    def is_ivf(self) -> bool:
+        """True if any child uses an IVF quantizer."""
+        return any(getattr(child, "is_ivf", False) for _, child in self._children(include_legacy=True))
+
+    def partition_values(self, metadata: Dict[str, Any]) -> PartitionValues:
+        """Partition key values of a document's metadata."""
+        return {key: str(metadata.get(key, "")) for key in self.partition_keys}
+
+    def partition_sizes(self) -> Dict[str, int]:
+        """Rows per partition, keyed by "field=value|field=value"."""
+        self._refresh()
+        with self._lock:
+            items = list(self.partitions.values())
+        sizes = {
+            "|".join(f"{key}={values[key]}" for key in self.partition_keys): len(child)
+            for values, child in items
+        }
+        if self.legacy is not None:
+            sizes["(unpartitioned)"] = len(self.legacy)
+        return sizes
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> int:
+        """
+        Insert or replace rows, each in the partition of its metadata.
+
+        An id that moved to another partition (its metadata changed) is
+        removed from the old one.
+
+        Args:
+            ids: Document ids
+            embeddings: (n, dim) array-like
+            documents: Document texts
+            metadatas: Metadata dicts
+
+        Returns:
+            Number of rows written
+        """
+        if not (len(ids) == len(embeddings) == len(documents) == len(metadatas)):
+            raise ValueError("ids, embeddings, documents and metadatas must have equal length")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+
+        groups: Dict[str, List[int]] = {}
+        values_of: Dict[str, PartitionValues] = {}
+        for i, meta in enumerate(metadatas):
+            values = self.partition_values(meta)
+            pid = partition_id(values)
+            groups.setdefault(pid, []).append(i)
+            values_of[pid] = values
+
+        self._refresh()
+        with self._lock:
+            for pid, rows in groups.items():
+                group_ids = [ids[i] for i in rows]
+                for other_pid, (_, child) in list(self.partitions.items()):
+                    if other_pid != pid:
+                        moved = child.existing_ids(group_ids)
+                        if moved:
+                            child.delete(sorted(moved))
+                child = self._child(pid, values_of[pid])
+                child.add(
+                    group_ids,
+                    vectors[rows],
+                    [documents[i] for i in rows],
+                    [metadatas[i] for i in rows],
+                )
+        return len(ids)
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """
+        Remove rows by id from every partition.
+
+        Args:
+            ids: Document ids
+
+        Returns:
+            Number of rows deleted
+        """
+        return sum(child.delete(ids) for _, child in self._children(include_legacy=True))
+
+    def clear(self) -> None:
+        """Remove every partition (the legacy child is cleared too)."""
+        with self._lock:
+            for _, child in self._children(include_legacy=True):
+                child.clear()
+                directory = getattr(child, "directory", None)
+                if directory and os.path.isdir(directory):
+                    shutil.rmtree(directory)
+            self.partitions = {}
+            self.legacy = None
+
+    def migrate_legacy(
+        self,
+        rekey: Callable[[str, str, Dict[str, Any]], str],
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Move the legacy child's rows into their partitions, then drop it.
+
+        Rows are re-added under rekey(id, document, metadata), the id the
+        current writer would give them, so re-ingesting the same chunks
+        replaces the migrated rows instead of storing them a second time.
+        Rows are copied before the legacy child is cleared: an interrupted
+        migration leaves the legacy child in place and is simply repeated.
+
+        Args:
+            rekey: New id of a legacy row
+            batch_size: Rows copied per add()
+
+        Returns:
+            Number of legacy rows moved
+        """
+        with self._lock:
+            legacy = self.legacy
+            if legacy is None:
+                return 0
+            moved = 0
+            for ids, vectors, documents, metadatas in legacy.iter_records(batch_size):
+                # Legacy rows that differ only by a salted id collapse into one (the last wins)
+                last = {rekey(*record): i for i, record in enumerate(zip(ids, documents, metadatas))}
+                rows = list(last.values())
+                self.add(
+                    list(last),
+                    np.asarray(vectors)[rows],
+                    [documents[i] for i in rows],
+                    [metadatas[i] for i in rows],
+                )
+                moved += len(ids)
+            legacy.clear()
+            directory = getattr(legacy, "directory", None)
+            if directory and os.path.isdir(directory):
+                shutil.rmtree(directory)
+            self.legacy = None
+        return moved
+
+    def save(self, directory: str) -> None:
+        """
+        Save every partition under directory/<partition_id>/.
+
+        Args:
+            directory: Root directory
+        """
+        with self._lock:
+            items = list(self.partitions.items())
+        for pid, (values, child) in items:
+            child_directory = os.path.join(directory, pid)
+            child.save(child_directory)
+            write_partition_file(child_directory, values)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[RowHandle, float]]]:
+        """
+        Cosine top-k for each query over the partitions the filters allow.
+
+        Args:
+            query_embeddings: (q, dim) array-like
+            k: Results per query
+            metadata_filters: Filter expression (see services/metadata_index.py)
+
+        Returns:
+            Per query: [((partition_id, child_row), cosine similarity)] best first
+        """
+        return self._search(query_embeddings, k, metadata_filters, records=False)
+
+    def search_records(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        include_vectors: bool = False,
+    ) -> List[List[Tuple[Tuple[Any, ...], float]]]:
+        """
+        Like search(), with every hit resolved to (id, document, metadata)
+        by its child in the same step (see NumpyVectorIndex.search_records).
+
+        Args:
+            include_vectors: Append each hit's stored vector to its record
+
+        Returns:
+            Per query: [((id, document, metadata[, vector]), cosine similarity)] best first
+        """
+        return self._search(query_embeddings, k, metadata_filters, records=True, include_vectors=include_vectors)
+
+    def _search(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]],
+        records: bool,
+        include_vectors: bool = False,
+    ) -> List[List[Tuple[Any, float]]]:
+        """Fan a search out over the allowed partitions and merge the top-k."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        routed, residual = self._route(metadata_filters)
+
+        self._refresh()
+        with self._lock:
+            targets = [
+                (pid, child, residual)
+                for pid, (values, child) in self.partitions.items()
+                if all(values.get(key) in allowed for key, allowed in routed.items())
+            ]
+            if self.legacy is not None:
+                targets.append((LEGACY_PARTITION, self.legacy, metadata_filters or None))
+
+        merged: List[List[Tuple[Any, float]]] = [[] for _ in range(len(queries))]
+        for pid, child, child_filters in targets:
+            if len(child) == 0:
+                continue
+            if records:
+                for q, hits in enumerate(child.search_records(queries, k, child_filters, include_vectors)):
+                    merged[q].extend(hits)
+            else:
+                for q, hits in enumerate(child.search(queries, k, child_filters)):
+                    merged[q].extend(((pid, row), score) for row, score in hits)
+        if len(targets) == 1:
+            return merged
+        return [heapq.nlargest(k, hits, key=lambda hit: hit[1]) for hits in merged]
+
+    def get(self, handle: RowHandle) -> Tuple[str, str, Dict[str, Any]]:
+        """(id, document, metadata) of a row handle returned by search()."""
+        pid, row = handle
+        if pid == LEGACY_PARTITION:
+            return self.legacy.get(row)
+        with self._lock:
+            child = self.partitions[pid][1]
+        return child.get(row)
+
+    def existing_ids(self, ids: Sequence[str]) -> set:
+        """Subset of ids stored in any partition."""
+        found: set = set()
+        for _, child in self._children(include_legacy=True):
+            remaining = [doc_id for doc_id in ids if doc_id not in found]
+            if not remaining:
+                break
+            found |= child.existing_ids(remaining)
+        return found
+
+    def get_vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of the ids held in any partition."""
+        vectors: Dict[str, np.ndarray] = {}
+        for _, child in self._children(include_legacy=True):
+            remaining = [doc_id for doc_id in ids if doc_id not in vectors]
+            if not remaining:
+                break
+            vectors.update(child.get_vectors(remaining))
+        return vectors
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _route(self, metadata_filters: Optional[MetadataFilter]) -> Tuple[Dict[str, Set[str]], Optional[MetadataFilter]]:
+        """
+        Split a filter into partition routing and what children still evaluate.
+
+        Returns:
+            (partition key -> allowed values, residual filter or None)
+        """
+        routed: Dict[str, Set[str]] = {}
+        residual: List[MetadataFilter] = []
+        for key, condition in conjuncts(metadata_filters):
+            allowed = allowed_values(condition) if key in self.partition_keys else None
+            if allowed is None:
+                residual.append({key: condition})
+            else:
+                routed[key] = routed[key] & allowed if key in routed else allowed
+        if len(residual) > 1:
+            return routed, {"$and": residual}
+        return routed, residual[0] if residual else None
+
+    def _child(self, pid: str, values: PartitionValues) -> Any:
+        """Child of a partition, created on first use."""
+        with self._lock:
+            if pid not in self.partitions:
+                self.partitions[pid] = (values, self.factory(pid, values))
+            return self.partitions[pid][1]
+
+    def _children(self, include_legacy: bool = False) -> List[Tuple[str, Any]]:
+        """Snapshot of (partition_id, child) pairs."""
+        self._refresh()
+        with self._lock:
+            children = [(pid, child) for pid, (_, child) in self.partitions.items()]
+            if include_legacy and self.legacy is not None:
+                children.append((LEGACY_PARTITION, self.legacy))
+        return children
+
+    def _refresh(self) -> None:
+        """Open partitions that appeared on shared storage."""
+        if self.discover is None:
+            return
+        with self._lock:
+            known = set(self.partitions)
+        discovered = self.discover(known)
+        with self._lock:
+            for pid, values in discovered.items():
+                if pid not in self.partitions:
+                    self.partitions[pid] = (values, self.factory(pid, values))
+
+
+def write_partition_file(directory: str, values: PartitionValues) -> None:
+    """Record a partition's key values in its directory."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, PARTITION_FILE)
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(values, handle, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def discover_partition_directories(root: str, known: Container[str] = ()) -> Dict[str, PartitionValues]:
+    """
+    Partitions stored under root (one directory each, with a partition.json).
+
+    Args:
+        root: Root directory of a partitioned collection
+        known: Partition ids to skip
+
+    Returns:
+        partition_id -> key values
+    """
+    found: Dict[str, PartitionValues] = {}
+    if not os.path.isdir(root):
+        return found
+    for name in os.listdir(root):
+        if name in known:
+            continue
+        path = os.path.join(root, name, PARTITION_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                found[name] = json.load(handle)
+    return found
@@ -0,0 +1,657 @@
+"""
+PHASE 3+: Memory-Mapped Vector Segments
+
+On-disk storage format for the NumPy VectorStore backend
+(VECTOR_STORE_FORMAT=segments), built for fast cold start.
+
+Layout of a collection directory:
+    manifest.json             dim, segment names and row counts (source of truth)
+    seg-00000.vectors.f32     append-only float32 rows (unit vectors)
+    seg-00000.ids.bin/.end    columnar strings: utf-8 blob + int64 end offsets
+    seg-00000.documents.*     ...
+    seg-00000.metadata.*      one JSON object per row
+    seg-00000.deleted         one byte per row (tombstones for replaced rows)
+    seg-00000.ids.hash        uint64 hash of each row's id (id lookups)
+    seg-00000.terms.json      metadata (field, value) pairs; list index = term id
+    seg-00000.postings.i32    metadata postings: sorted local rows per term,
+    seg-00000.runs.i64        written as (term, start, end) runs per append
+
+Opening a collection reads only the manifest, so it is O(1) in corpus
+size; every column is np.memmap'ed on first use and the OS loads pages
+lazily as queries touch them. Worker processes opening the same directory
+share one page cache. Appends write data first and then atomically
+replace the manifest, so readers (and crashed writers) never see partial
+rows; readers pick up new rows when the manifest changes.
+
+The id hash column and the metadata postings are written with the rows
+they index, so no process ever decodes ids or metadata JSON to look up
+an id or resolve a filter: id lookups scan the memory-mapped hash column,
+and the metadata bitmap index (services/metadata_index.py) of a segment
+is assembled from its stored postings on the first filtered query.
+Segments written before these files existed are indexed by the next
+writer (until then, readers decode their rows as before).
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.metadata_index import MetadataIndex
+
+try:
+    import fcntl  # Inter-process writer lock (POSIX)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+_COLUMNS = ("ids", "documents", "metadata")
+_RUN_FIELDS = 3  # (term, start, end) per postings run
+
+
+def _id_hashes(ids: Sequence[str]) -> np.ndarray:
+    """Process-independent 64-bit hashes of ids."""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest(), "little") for doc_id in ids],
+        dtype=np.uint64,
+    )
+
+
+class _Segment:
+    """One append-only segment: memory-mapped columns, mapped lazily."""
+
+    def __init__(self, directory: str, name: str, embedding_dim: int, rows: int, indexed: int = 0, runs: int = 0):
+        self.directory = directory
+        self.name = name
+        self.embedding_dim = embedding_dim
+        self.rows = rows
+        self.indexed = indexed  # Leading rows covered by the id hash column and postings
+        self.runs = runs  # Published postings runs
+        self._maps: Dict[str, Tuple[Tuple[int, ...], Any]] = {}  # key -> (shape, array)
+        self._terms: List[Tuple[str, Any]] = []
+        self._metadata_index = MetadataIndex()
+        self._loaded_runs = 0
+        self._loaded_rows = 0
+        self._index_lock = threading.Lock()
+
+    def path(self, suffix: str) -> str:
+        return os.path.join(self.directory, f"{self.name}.{suffix}")
+
+    def _map(self, key: str, suffix: str, dtype, shape) -> np.ndarray:
+        """Memory-map a file read-only (re-mapped when the segment grew)."""
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == shape:
+            return cached[1]
+        if int(np.prod(shape)) == 0:
+            array = np.empty(shape, dtype=dtype)
+        else:
+            array = np.memmap(self.path(suffix), dtype=dtype, mode="r", shape=shape)
+        self._maps[key] = (shape, array)
+        return array
+
+    def vectors(self) -> np.ndarray:
+        return self._map("vectors", "vectors.f32", np.float32, (self.rows, self.embedding_dim))
+
+    def deleted(self) -> np.ndarray:
+        return self._map("deleted", "deleted", np.uint8, (self.rows,))
+
+    def ends(self, column: str) -> np.ndarray:
+        return self._map(f"{column}.end", f"{column}.end", np.int64, (self.rows,))
+
+    def string(self, column: str, row: int) -> str:
+        """Decode one value of a string column."""
+        ends = self.ends(column)
+        start = int(ends[row - 1]) if row else 0
+        end = int(ends[row])
+        if end == start:
+            return ""
+        blob = self._map(f"{column}.bin", f"{column}.bin", np.uint8, (int(ends[-1]),))
+        return bytes(blob[start:end]).decode("utf-8")
+
+    def id_hashes(self) -> np.ndarray:
+        """Id hash of every row (rows past the stored column are hashed on the fly)."""
+        stored = self._map("ids.hash", "ids.hash", np.uint64, (self.indexed,))
+        if self.indexed == self.rows:
+            return stored
+        legacy = _id_hashes([self.string("ids", row) for row in range(self.indexed, self.rows)])
+        return np.concatenate([stored, legacy])
+
+    def run_table(self) -> np.ndarray:
+        """Published postings runs, (runs, 3) int64."""
+        return self._map("runs", "runs.i64", np.int64, (self.runs, _RUN_FIELDS))
+
+    def terms(self, count: int = 0, reload: bool = False) -> List[Tuple[str, Any]]:
+        """Term dictionary, reloaded if it holds fewer than count terms (or on request)."""
+        if reload or len(self._terms) < count:
+            path = self.path("terms.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as handle:
+                    self._terms = [tuple(term) for term in json.load(handle)]
+        return self._terms
+
+    def write_terms(self, terms: List[Tuple[str, Any]]) -> None:
+        """Atomically replace the term dictionary (terms are only ever appended)."""
+        tmp_path = self.path("terms.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump([list(term) for term in terms], handle)
+        os.replace(tmp_path, self.path("terms.json"))
+        self._terms = list(terms)
+
+    def candidates(self, metadata_filters: Dict[str, Any], rows: int) -> np.ndarray:
+        """
+        Rows below rows matching a filter (tombstones not excluded).
+
+        Stored postings published since the last call are added to the
+        segment's bitmap index first (rows are never rewritten, so it only
+        ever grows); rows no postings cover yet are decoded from JSON.
+        """
+        with self._index_lock:
+            index = self._metadata_index
+            # Stored postings extend the index only while it holds nothing
+            # else (a legacy segment indexed by a writer later stays on JSON)
+            if self._loaded_runs < self.runs and len(index) == self._loaded_rows:
+                runs = self.run_table()[self._loaded_runs:self.runs]
+                index.append_postings(self._stored_postings(runs), self.indexed)
+                self._loaded_runs, self._loaded_rows = self.runs, self.indexed
+            index.extend(json.loads(self.string("metadata", row)) for row in range(len(index), rows))
+            return index.candidates(metadata_filters, rows)
+
+    def _stored_postings(self, runs: np.ndarray) -> Iterator[Tuple[str, Any, np.ndarray]]:
+        """(field, value, rows) per term of some runs, rows ascending."""
+        if len(runs) == 0:
+            return
+        terms = self.terms(int(runs[:, 0].max()) + 1)
+        postings = self._map("postings", "postings.i32", np.int32, (int(self.run_table()[-1, 2]),))
+        runs = runs[np.argsort(runs[:, 0], kind="stable")]  # Runs of one term stay in row order
+        for group in np.split(runs, np.flatnonzero(np.diff(runs[:, 0])) + 1):
+            field, value = terms[int(group[0, 0])]
+            if len(group) == 1:
+                rows = postings[group[0, 1]:group[0, 2]]
+            else:
+                rows = np.concatenate([postings[start:end] for _, start, end in group])
+            yield field, value, rows
+
+
+class SegmentedVectorIndex:
+    """
+    Exact cosine index over memory-mapped, append-only segments.
+
+    Same interface as NumpyVectorIndex (add / search / get / clear), but
+    every write is durable immediately and nothing is held in memory
+    beyond what queries touch. Replacing an id appends a new row and
+    tombstones the old one.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, directory: str, embedding_dim: int, max_segment_rows: int = 65_536):
+        """
+        Open (or create) a segmented collection.
+
+        Args:
+            directory: Collection directory
+            embedding_dim: Vector dimension (must match an existing collection)
+            max_segment_rows: Rows per segment before a new one is started
+        """
+        self.directory = directory
+        self.embedding_dim = embedding_dim
+        self.max_segment_rows = max_segment_rows
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._bases: List[int] = []  # Global row of each segment's first row
+        self._deleted_count = 0
+        self._manifest_stamp: Optional[Tuple[int, int, int]] = None
+
+        if not os.path.exists(self._manifest_path):
+            self._write_manifest()
+        self._refresh()
+        if self._manifest_dim != embedding_dim:
+            raise ValueError(
+                f"Collection dimension {self._manifest_dim} != expected {embedding_dim}"
+            )
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, self.MANIFEST_FILE)
+
+    @property
+    def is_ivf(self) -> bool:
+        """Segments are always searched exactly."""
+        return False
+
+    @property
+    def total_rows(self) -> int:
+        """Rows including tombstoned ones."""
+        return sum(segment.rows for segment in self._segments)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self.total_rows - self._deleted_count
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> int:
+        """
+        Append rows (an existing id is tombstoned and re-appended).
+
+        Args:
+            ids: Document ids
+            embeddings: (n, dim) array-like
+            documents: Document texts
+            metadatas: Metadata dicts
+
+        Returns:
+            Number of rows written
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embedding_dim)
+        if not (len(ids) == len(vectors) == len(documents) == len(metadatas)):
+            raise ValueError("ids, embeddings, documents and metadatas must have equal length")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        # Last occurrence of an id within the batch wins
+        latest = {doc_id: i for i, doc_id in enumerate(ids)}
+        keep = sorted(latest.values())
+
+        with self._lock, self._writer_lock():
+            self._refresh()
+            for segment in self._segments:
+                if segment.indexed < segment.rows:
+                    self._index_segment(segment)  # Written before ids/postings were stored
+            live = self._live_rows([ids[i] for i in keep])
+            replaced = [row for rows in live.values() for row in rows]
+
+            start = 0
+            while start < len(keep):
+                segment = self._writable_segment()
+                take = keep[start:start + self.max_segment_rows - segment.rows]
+                self._append(
+                    segment,
+                    [ids[i] for i in take],
+                    vectors[take],
+                    [documents[i] for i in take],
+                    [metadatas[i] for i in take],
+                )
+                start += len(take)
+
+            # Publish the new rows before hiding the old ones: a crash in
+            # between leaves a duplicate, never a lost document
+            self._write_manifest()
+            if replaced:
+                self._tombstone(replaced)
+                self._write_manifest()
+            self._refresh()
+
+        return len(ids)
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """
+        Tombstone rows by id.
+
+        Args:
+            ids: Document ids
+
+        Returns:
+            Number of rows deleted
+        """
+        with self._lock, self._writer_lock():
+            self._refresh()
+            live = self._live_rows(ids)
+            self._tombstone([row for rows in live.values() for row in rows])
+            self._write_manifest()
+            self._refresh()
+        return len(live)
+
+    def clear(self) -> None:
+        """Remove all segments."""
+        with self._lock, self._writer_lock():
+            for name in os.listdir(self.directory):
+                if name.startswith("seg-"):
+                    os.remove(os.path.join(self.directory, name))
+            self._segments, self._bases = [], []
+            self._deleted_count = 0
+            self._write_manifest()
+            self._refresh()
+
+    def save(self, directory: Optional[str] = None) -> None:
+        """No-op: segment writes are durable when add() returns."""
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Cosine top-k for each query, scanning segments one at a time.
+
+        Args:
+            query_embeddings: (q, dim) array-like
+            k: Results per query
+            metadata_filters: Filter expression (see services/metadata_index.py)
+
+        Returns:
+            Per query: [(global row, cosine similarity)] best first
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.embedding_dim)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        with self._lock:
+            self._refresh()
+            segments = list(zip(self._bases, self._segments))
+
+        best_rows = [np.empty(0, dtype=np.int64) for _ in queries]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in queries]
+        for base, segment in segments:
+            if segment.rows == 0:
+                continue
+            if metadata_filters:
+                candidates = segment.candidates(metadata_filters, segment.rows)
+                candidates = candidates[segment.deleted()[candidates] == 0]
+            else:
+                allowed = segment.deleted() == 0
+                candidates = None if allowed.all() else np.flatnonzero(allowed)
+            if candidates is None:
+                candidates = np.arange(segment.rows)
+                scores = queries @ segment.vectors().T
+            else:
+                if len(candidates) == 0:
+                    continue
+                scores = queries @ segment.vectors()[candidates].T
+            take = min(k, len(candidates))
+            for q in range(len(queries)):
+                top = np.argpartition(-scores[q], take - 1)[:take] if take < len(candidates) else np.arange(take)
+                best_rows[q] = np.concatenate([best_rows[q], base + candidates[top]])
+                best_scores[q] = np.concatenate([best_scores[q], scores[q, top]])
+
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            order = np.argsort(-scores, kind="stable")[:k]
+            results.append([(int(rows[i]), float(scores[i])) for i in order])
+        return results
+
+    def search_records(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        include_vectors: bool = False,
+    ) -> List[List[Tuple[Tuple[Any, ...], float]]]:
+        """
+        Like search(), with every hit resolved to (id, document, metadata)
+        and, with include_vectors, its stored vector appended.
+
+        Global rows never move (deletes only tombstone), so resolving them
+        after the search is safe.
+        """
+        hits_per_query = self.search(query_embeddings, k, metadata_filters)
+        if include_vectors:
+            return [[(self.get(row) + (self._vector(row),), score) for row, score in hits] for hits in hits_per_query]
+        return [[(self.get(row), score) for row, score in hits] for hits in hits_per_query]
+
+    def existing_ids(self, ids: Sequence[str]) -> set:
+        """Subset of ids stored in live (non-tombstoned) rows."""
+        with self._lock:
+            self._refresh()
+            return set(self._live_rows(ids))
+
+    def get_vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of the ids held in live rows."""
+        with self._lock:
+            self._refresh()
+            return {doc_id: self._vector(rows[-1]) for doc_id, rows in self._live_rows(ids).items()}
+
+    def iter_records(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]]:
+        """Every live row as (ids, vectors, documents, metadatas) batches, segment by segment."""
+        with self._lock:
+            self._refresh()
+            segments = list(self._segments)
+        for segment in segments:
+            live = np.flatnonzero(segment.deleted() == 0)
+            for start in range(0, len(live), batch_size):
+                rows = live[start:start + batch_size]
+                yield (
+                    [segment.string("ids", int(row)) for row in rows],
+                    np.array(segment.vectors()[rows]),
+                    [segment.string("documents", int(row)) for row in rows],
+                    [json.loads(segment.string("metadata", int(row))) for row in rows],
+                )
+
+    def get(self, row: int) -> Tuple[str, str, Dict[str, Any]]:
+        """(id, document, metadata) of a global row."""
+        with self._lock:
+            position = bisect.bisect_right(self._bases, row) - 1
+            segment, local = self._segments[position], row - self._bases[position]
+        return (
+            segment.string("ids", local),
+            segment.string("documents", local),
+            json.loads(segment.string("metadata", local)),
+        )
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _vector(self, row: int) -> np.ndarray:
+        """Copy of the stored vector of a global row."""
+        with self._lock:
+            position = bisect.bisect_right(self._bases, row) - 1
+            segment, local = self._segments[position], row - self._bases[position]
+        return np.array(segment.vectors()[local])
+
+    def _refresh(self) -> None:
+        """Reload the manifest if another writer (or process) changed it."""
+        stat = os.stat(self._manifest_path)
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._manifest_stamp:
+            return
+        with open(self._manifest_path, encoding="utf-8") as handle:
+            manifest = json.load(handle)
+        self._manifest_dim = manifest["embedding_dim"]
+        self._deleted_count = manifest["deleted"]
+
+        existing = {segment.name: segment for segment in self._segments}
+        segments, bases, base = [], [], 0
+        for entry in manifest["segments"]:
+            segment = existing.get(entry["name"]) or _Segment(
+                self.directory, entry["name"], self._manifest_dim, entry["rows"]
+            )
+            segment.rows = entry["rows"]
+            segment.indexed = entry.get("indexed", 0)
+            segment.runs = entry.get("runs", 0)
+            segments.append(segment)
+            bases.append(base)
+            base += entry["rows"]
+        self._segments, self._bases = segments, bases
+        self._manifest_stamp = stamp
+
+    def _write_manifest(self) -> None:
+        """Atomically publish segment row counts."""
+        manifest = {
+            "version": 1,
+            "embedding_dim": self.embedding_dim,
+            "deleted": self._deleted_count,
+            "segments": [
+                {"name": s.name, "rows": s.rows, "indexed": s.indexed, "runs": s.runs} for s in self._segments
+            ],
+        }
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _live_rows(self, ids: Sequence[str]) -> Dict[str, List[int]]:
+        """
+        Global live rows holding each stored id.
+
+        Scans the memory-mapped id hashes (vectorized), then confirms
+        hash matches against the stored ids. An id has more than one live
+        row only if a writer crashed between appending and tombstoning.
+        """
+        wanted = set(ids)
+        if not wanted:
+            return {}
+        query = np.unique(_id_hashes(sorted(wanted)))
+        found: Dict[str, List[int]] = {}
+        for base, segment in zip(self._bases, self._segments):
+            if segment.rows == 0:
+                continue
+            deleted = segment.deleted()
+            for local in np.flatnonzero(np.isin(segment.id_hashes(), query)).tolist():
+                if deleted[local]:
+                    continue
+                doc_id = segment.string("ids", local)
+                if doc_id in wanted:
+                    found.setdefault(doc_id, []).append(base + local)
+        return found
+
+    def _tombstone(self, rows: List[int]) -> None:
+        """Mark global rows deleted (visible to readers through the page cache)."""
+        for row in rows:
+            position = bisect.bisect_right(self._bases, row) - 1
+            segment, local = self._segments[position], row - self._bases[position]
+            if segment.deleted()[local]:
+                continue  # Already replaced by another writer
+            with open(segment.path("deleted"), "r+b") as handle:
+                handle.seek(local)
+                handle.write(b"\x01")
+            self._deleted_count += 1
+
+    def _writable_segment(self) -> _Segment:
+        """Last segment if it has room, else a new empty one."""
+        if self._segments and self._segments[-1].rows < self.max_segment_rows:
+            return self._segments[-1]
+        segment = _Segment(
+            self.directory, f"seg-{len(self._segments):05d}", self.embedding_dim, 0
+        )
+        self._segments.append(segment)
+        self._bases.append(self.total_rows - segment.rows)
+        return segment
+
+    def _append(
+        self,
+        segment: _Segment,
+        ids: List[str],
+        vectors: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+    ) -> None:
+        """Append rows to a segment's files (published by the next manifest)."""
+        rows = segment.rows
+        blob_sizes = {
+            column: int(segment.ends(column)[-1]) if rows else 0 for column in _COLUMNS
+        }
+        # Drop bytes a crashed writer left past the published rows
+        self._append_bytes(segment.path("vectors.f32"), vectors.tobytes(), rows * self.embedding_dim * 4)
+        self._append_bytes(segment.path("deleted"), bytes(len(ids)), rows)
+
+        values = {
+            "ids": ids,
+            "documents": documents,
+            "metadata": [json.dumps(meta, sort_keys=True, default=str) for meta in metadatas],
+        }
+        for column in _COLUMNS:
+            encoded = [value.encode("utf-8") for value in values[column]]
+            ends = blob_sizes[column] + np.cumsum([len(value) for value in encoded], dtype=np.int64)
+            self._append_bytes(segment.path(f"{column}.bin"), b"".join(encoded), blob_sizes[column])
+            self._append_bytes(segment.path(f"{column}.end"), ends.tobytes(), rows * 8)
+        self._append_index(segment, rows, ids, values["metadata"])
+
+        segment.rows = rows + len(ids)
+
+    def _append_index(self, segment: _Segment, start: int, ids: List[str], metadata_json: List[str]) -> None:
+        """
+        Append the id hashes and metadata postings of rows start.. (published
+        with them by the next manifest).
+
+        Args:
+            segment: Segment whose rows below start are already indexed
+            start: Local row of the first new row
+            ids: Ids of the new rows
+            metadata_json: Stored metadata JSON of the new rows
+        """
+        self._append_bytes(segment.path("ids.hash"), _id_hashes(ids).tobytes(), start * 8)
+
+        terms = list(segment.terms(reload=True))  # Other processes may have added terms
+        known = len(terms)
+        term_of = {term: i for i, term in enumerate(terms)}
+        rows_of: Dict[int, List[int]] = {}
+        for offset, text in enumerate(metadata_json):
+            for term in json.loads(text).items():
+                try:
+                    term_id = term_of.get(term)
+                except TypeError:
+                    continue  # Unhashable value: not indexed (as in MetadataIndex)
+                if term_id is None:
+                    term_id = term_of[term] = len(terms)
+                    terms.append(term)
+                rows_of.setdefault(term_id, []).append(start + offset)
+        if len(terms) > known:
+            segment.write_terms(terms)
+
+        postings_size = int(segment.run_table()[-1, 2]) if segment.runs else 0
+        lengths = np.array([len(rows) for rows in rows_of.values()], dtype=np.int64)
+        ends = postings_size + np.cumsum(lengths)
+        runs = np.column_stack([np.fromiter(rows_of, dtype=np.int64, count=len(rows_of)), ends - lengths, ends])
+        postings = np.array([row for rows in rows_of.values() for row in rows], dtype=np.int32)
+        self._append_bytes(segment.path("postings.i32"), postings.tobytes(), postings_size * 4)
+        self._append_bytes(segment.path("runs.i64"), runs.astype(np.int64).tobytes(), segment.runs * _RUN_FIELDS * 8)
+        segment.runs += len(runs)
+        segment.indexed = start + len(ids)
+
+    def _index_segment(self, segment: _Segment) -> None:
+        """Write the id hashes and postings of a segment stored without them."""
+        segment.indexed, segment.runs = 0, 0
+        segment.write_terms([])
+        self._append_index(
+            segment,
+            0,
+            [segment.string("ids", row) for row in range(segment.rows)],
+            [segment.string("metadata", row) for row in range(segment.rows)],
+        )
+
+    @staticmethod
+    def _append_bytes(path: str, data: bytes, valid_size: int) -> None:
+        """Truncate a file to its published size, then append."""
+        with open(path, "ab") as handle:
+            handle.truncate(valid_size)
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    @contextmanager
+    def _writer_lock(self) -> Iterator[None]:
+        """Serialize writers across processes (no-op without fcntl)."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, self.LOCK_FILE), "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
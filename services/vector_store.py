@@ -2,7 +2,23 @@
 PHASE 3 — Vector Store Service
 
 Vendor-agnostic vector database abstraction.
-Currently ChromaDB, but replaceable with FAISS / Pinecone / Weaviate later.
+Backends (VECTOR_STORE_BACKEND):
+- chroma: ChromaDB persistent client
+- numpy: in-process NumPy index (services/vector_index.py), exact cosine
+  top-k with an optional IVF quantizer; used automatically when chromadb
+  is not installed. With VECTOR_STORE_FORMAT=segments the collection lives
+  in memory-mapped append-only segments instead (services/vector_segments.py):
+  O(1) open, lazily paged, shared across worker processes
+
+Partitioning (VECTOR_STORE_PARTITION_KEYS, default audience_level and
+subject_domain): documents are routed into one child collection per value
+combination (services/vector_partitions.py), so filtered queries search
+only the matching partition; both backends use it.
+
+Metadata filters are expressions in the Chroma where dialect (equality,
+$eq/$ne/$in/$nin, nested $and/$or; services/metadata_index.py). Chroma
+evaluates them natively; the NumPy backends resolve them to candidate rows
+with a metadata bitmap index before scoring.
 
 Design rules:
 - No agent logic
@@ -11,12 +27,24 @@ Design rules:
 - Pure data operations
 """
 
+import json
 import os
-from typing import List, Dict, Any, Optional
+import shutil
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
+import numpy as np
+
 from schemas.vector_document import VectorDocument, SourceType, UploadedBy
 from services.embedding_service import get_embedding_service
+from services.metadata_index import to_chroma_where
+from services.vector_index import NumpyVectorIndex
+from services.vector_partitions import (
+    PartitionedVectorIndex,
+    discover_partition_directories,
+    write_partition_file,
+)
+from services.vector_segments import SegmentedVectorIndex
 
 
 class VectorStore:
@@ -37,20 +65,44 @@ class VectorStore:
         self.collection_name = collection_name
         self.collection = None
         self.client = None
+        self.index: Optional[Any] = None  # NumpyVectorIndex | SegmentedVectorIndex | PartitionedVectorIndex
         self._initialized = False
         
         # Embedding service for query encoding
         self.embedding_service = get_embedding_service()
         
+        # NumPy backend options: "npy" snapshots are saved under
+        # persist_directory only when VECTOR_STORE_PERSIST=true; "segments"
+        # are always on disk
+        self.index_format = os.getenv("VECTOR_STORE_FORMAT", "npy").lower()
+        self.persist_index = os.getenv("VECTOR_STORE_PERSIST", "false").lower() == "true"
+        self.index_directory = os.path.join(
+            persist_directory,
+            f"{collection_name}.segments" if self.index_format == "segments" else f"{collection_name}.npindex",
+        )
+        
+        # Metadata fields routing documents into partitions (empty = one collection)
+        self.partition_keys = tuple(
+            key.strip()
+            for key in os.getenv("VECTOR_STORE_PARTITION_KEYS", "audience_level,subject_domain").split(",")
+            if key.strip()
+        )
+        self.partition_directory = self.index_directory + ".partitions"
+        
         # Try to import ChromaDB; gracefully degrade if not available
-        try:
-            import chromadb
-            self.chroma = chromadb
-            self._has_chroma = True
-        except ImportError:
-            self._has_chroma = False
-            print("⚠️  ChromaDB not installed. Using mock in-memory storage.")
-            self._mock_storage = {}  # Simple dict-based fallback
+        self._has_chroma = False
+        if os.getenv("VECTOR_STORE_BACKEND", "auto").lower() != "numpy":
+            try:
+                import chromadb
+                self.chroma = chromadb
+                self._has_chroma = True
+            except ImportError:
+                print("⚠️  ChromaDB not installed. Using in-process NumPy index.")
+    
+    @property
+    def is_persistent(self) -> bool:
+        """True if the collection outlives the process (Chroma, segments or npy snapshots)."""
+        return self._has_chroma or self.index_format == "segments" or self.persist_index
     
     def initialize(self) -> bool:
         """
@@ -71,18 +123,31 @@ class VectorStore:
                     # Fallback to old API if new one doesn't work
                     self.client = self.chroma.Client()
                 
-                self.collection = self.client.get_or_create_collection(
-                    name=self.collection_name,
-                    metadata={"hnsw:space": "cosine"}
-                )
+                if self.partition_keys:
+                    self.index = self._open_chroma_partitions()
+                    self._migrate_legacy_collection()
+                else:
+                    self.collection = self.client.get_or_create_collection(
+                        name=self.collection_name,
+                        metadata={"hnsw:space": "cosine"}
+                    )
                 self._initialized = True
                 print(f"✅ VectorStore initialized with ChromaDB")
                 return True
             else:
-                # Mock initialization
-                self._mock_storage[self.collection_name] = {"documents": []}
+                if self.partition_keys:
+                    self.index = self._open_partitioned_index()
+                    self._migrate_legacy_collection()
+                elif self.index_format == "segments":
+                    self.index = SegmentedVectorIndex(
+                        self.index_directory, self.embedding_service.embedding_dim
+                    )
+                elif self.persist_index and NumpyVectorIndex.exists(self.index_directory):
+                    self.index = NumpyVectorIndex.load(self.index_directory, **self._index_options())
+                else:
+                    self.index = NumpyVectorIndex(self.embedding_service.embedding_dim, **self._index_options())
                 self._initialized = True
-                print(f"✅ VectorStore initialized (mock mode)")
+                print(f"✅ VectorStore initialized (NumPy index, {len(self.index)} documents)")
                 return True
         except Exception as e:
             print(f"❌ Failed to initialize VectorStore: {e}")
@@ -90,68 +155,165 @@ class VectorStore:
     
     def add_documents(self, documents: List[VectorDocument]) -> int:
         """
-        Add documents to the vector store.
+        Add documents to the vector store (upsert, see upsert_documents).
         
         Args:
             documents: List of VectorDocument instances
             
         Returns:
-            Number of documents successfully added
+            Number of documents now stored from this batch
+            (written + already present unchanged)
+        """
+        written, unchanged = self.upsert_documents(documents)
+        return written + unchanged
+    
+    def upsert_documents(
+        self,
+        documents: List[VectorDocument],
+        embeddings: Optional[Any] = None,
+    ) -> Tuple[int, int]:
+        """
+        Insert or replace documents by id, skipping unchanged ones.
+        
+        Default ids are content hashes (VectorDocument.stable_id), so such an
+        id that is already stored means the same chunk is already stored: it
+        is neither re-embedded nor rewritten. Re-ingesting an unchanged
+        corpus costs one id lookup per batch. Documents with an explicit
+        document_id are always written.
+        
+        Args:
+            documents: List of VectorDocument instances
+            embeddings: Precomputed (len(documents), dim) vectors, row-aligned
+                with documents; when given nothing is embedded or skipped
+                (the caller already filtered out stored chunks)
+            
+        Returns:
+            (written, unchanged) counts; (0, 0) on storage error
         """
         if not self._initialized:
             raise RuntimeError("VectorStore not initialized. Call initialize() first.")
         
         if not documents:
-            return 0
+            return 0, 0
         
         # Validate all documents
         for doc in documents:
             doc.validate()
         
-        # Generate embeddings
-        texts = [doc.content for doc in documents]
-        embeddings = self.embedding_service.embed_texts(texts)
-        
-        # Prepare for storage
-        ids = []
-        documents_list = []
-        metadatas = []
-        embeddings_list = []
-        
-        for doc, embedding in zip(documents, embeddings):
+        # Prepare for storage (last occurrence of an id wins)
+        records = {}
+        positions = {}
+        content_addressed = []  # Explicit document_ids may hold new content: always written
+        for position, doc in enumerate(documents):
             chroma_doc = doc.to_chroma_format()
-            ids.append(chroma_doc["id"])
-            documents_list.append(chroma_doc["document"])
-            metadatas.append(chroma_doc["metadatas"])
-            embeddings_list.append(embedding)
+            records[chroma_doc["id"]] = chroma_doc
+            positions[chroma_doc["id"]] = position
+            if doc.document_id is None and embeddings is None:
+                content_addressed.append(chroma_doc["id"])
         
         try:
+            existing = self.existing_ids(content_addressed) if content_addressed else set()
+            pending = [record for doc_id, record in records.items() if doc_id not in existing]
+            if not pending:
+                return 0, len(records)
+            
+            ids = [record["id"] for record in pending]
+            documents_list = [record["document"] for record in pending]
+            metadatas = [record["metadatas"] for record in pending]
+            
+            if embeddings is not None:
+                embeddings = np.asarray(embeddings, dtype=np.float32)[[positions[doc_id] for doc_id in ids]]
+            else:
+                # Generate embeddings as one (n, dim) float32 matrix (new chunks only)
+                embeddings = self.embedding_service.embed_batch(documents_list)
+            
             if self._has_chroma and self.collection:
-                self.collection.add(
+                self.collection.upsert(
                     ids=ids,
                     documents=documents_list,
-                    embeddings=embeddings_list,
+                    embeddings=embeddings,
                     metadatas=metadatas,
                 )
             else:
-                # Mock storage
-                for doc_id, content, meta, emb in zip(ids, documents_list, metadatas, embeddings_list):
-                    self._mock_storage[doc_id] = {
-                        "content": content,
-                        "metadata": meta,
-                        "embedding": emb,
-                    }
+                self.index.add(ids, embeddings, documents_list, metadatas)
+                self._save_snapshot()
             
-            return len(ids)
+            return len(ids), len(records) - len(ids)
         except Exception as e:
             print(f"❌ Error adding documents: {e}")
+            return 0, 0
+    
+    def existing_ids(self, ids: List[str]) -> set:
+        """
+        Subset of ids already stored in the collection.
+        
+        Args:
+            ids: Document ids
+            
+        Returns:
+            Set of the given ids that are stored
+        """
+        if not self._initialized:
+            raise RuntimeError("VectorStore not initialized. Call initialize() first.")
+        if not ids:
+            return set()
+        if self._has_chroma and self.collection:
+            found = self.collection.get(ids=list(ids), include=[])
+            return set(found.get("ids", [])) if found else set()
+        return self.index.existing_ids(ids)
+    
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Stored embeddings of documents by id.
+        
+        Args:
+            ids: Document ids
+            
+        Returns:
+            id -> float32 vector, for the ids that are stored
+        """
+        if not self._initialized:
+            raise RuntimeError("VectorStore not initialized. Call initialize() first.")
+        if not ids:
+            return {}
+        if self._has_chroma and self.collection:
+            return _chroma_vectors(self.collection, ids)
+        return self.index.get_vectors(ids)
+    
+    def delete_documents(self, ids: List[str]) -> int:
+        """
+        Delete documents by id (unknown ids are ignored).
+        
+        Args:
+            ids: Document ids
+            
+        Returns:
+            Number of documents deleted; 0 on storage error
+        """
+        if not self._initialized:
+            raise RuntimeError("VectorStore not initialized. Call initialize() first.")
+        if not ids:
+            return 0
+        
+        try:
+            if self._has_chroma and self.collection:
+                present = self.existing_ids(ids)
+                if present:
+                    self.collection.delete(ids=list(present))
+                return len(present)
+            deleted = self.index.delete(ids)
+            if deleted:
+                self._save_snapshot()
+            return deleted
+        except Exception as e:
+            print(f"❌ Error deleting documents: {e}")
             return 0
     
     def similarity_search(
         self,
         query: str,
         k: int = 5,
-        metadata_filters: Optional[Dict[str, str]] = None,
+        metadata_filters: Optional[Dict[str, Any]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Search for similar documents using vector similarity.
@@ -159,72 +321,140 @@ class VectorStore:
         Args:
             query: Search query text
             k: Number of results to return
-            metadata_filters: Optional metadata filters (AND logic)
-                e.g., {"audience_level": "beginner", "subject_domain": "cs"}
+            metadata_filters: Optional metadata filter expression (entries ANDed)
+                e.g., {"audience_level": "beginner", "subject_domain": "cs"} or
+                {"$or": [{"source_type": "syllabus"}, {"session_id": {"$in": ["s1", "s2"]}}]}
             
         Returns:
             List of results with content, score, metadata
         """
+        return self.similarity_search_batch([query], k=k, metadata_filters=metadata_filters)[0]
+    
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        include_embeddings: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries in one round trip.
+        
+        All queries are embedded in one batch and sent as a single
+        collection query, so concurrent requests contend less for the
+        persistent client.
+        
+        Args:
+            queries: Search query texts
+            k: Number of results per query
+            metadata_filters: Optional metadata filter expression (shared)
+            include_embeddings: Also return each hit's stored vector
+                ("embedding", float32), read in the same query
+            
+        Returns:
+            One result list per query (same order as queries)
+        """
         if not self._initialized:
             raise RuntimeError("VectorStore not initialized. Call initialize() first.")
         
         if k < 1:
             raise ValueError("k must be >= 1")
         
-        # Embed query
-        query_embedding = self.embedding_service.embed_query(query)
+        if not queries:
+            return []
+        
+        # Embed all queries at once (via the query micro-batcher when the
+        # backend has one, so concurrent requests share forward passes)
+        query_embeddings = self.embedding_service.embed_queries(queries)
+        return self.similarity_search_by_vectors(query_embeddings, k, metadata_filters, include_embeddings)
+    
+    def similarity_search_by_vectors(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 5,
+        metadata_filters: Optional[Dict[str, Any]] = None,
+        include_embeddings: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        similarity_search_batch for queries the caller already embedded.
+        
+        Args:
+            query_embeddings: (q, dim) query vectors (embedding_service.embed_queries)
+            k: Number of results per query
+            metadata_filters: Optional metadata filter expression (shared)
+            include_embeddings: Also return each hit's stored vector ("embedding")
+            
+        Returns:
+            One result list per query vector
+        """
+        if not self._initialized:
+            raise RuntimeError("VectorStore not initialized. Call initialize() first.")
+        
+        if k < 1:
+            raise ValueError("k must be >= 1")
+        
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.embedding_service.embedding_dim)
+        if len(queries) == 0:
+            return []
         
         try:
             if self._has_chroma and self.collection:
-                # Build where clause for metadata filters
-                where = None
-                if metadata_filters:
-                    where = self._build_where_clause(metadata_filters)
-                
                 # Query
+                options = {"include": ["documents", "metadatas", "distances", "embeddings"]} if include_embeddings else {}
                 results = self.collection.query(
-                    query_embeddings=[query_embedding],
+                    query_embeddings=queries,
                     n_results=k,
-                    where=where if where else None,
+                    where=to_chroma_where(metadata_filters),
+                    **options,
                 )
                 
-                # Format results
-                output = []
-                if results and results["documents"] and len(results["documents"]) > 0:
-                    docs = results["documents"][0]
-                    distances = results["distances"][0] if results["distances"] else []
-                    metas = results["metadatas"][0] if results["metadatas"] else []
-                    ids = results["ids"][0] if results["ids"] else []
-                    
-                    for doc, dist, meta, doc_id in zip(docs, distances, metas, ids):
-                        # Convert distance to similarity (cosine distance -> similarity)
-                        similarity = 1 - dist if dist is not None else 0
+                # Format results (one row per query)
+                outputs = []
+                for row in range(len(queries)):
+                    output = []
+                    if results and results["documents"] and len(results["documents"]) > row:
+                        docs = results["documents"][row]
+                        distances = results["distances"][row] if results["distances"] else []
+                        metas = results["metadatas"][row] if results["metadatas"] else []
+                        ids = results["ids"][row] if results["ids"] else []
+                        vectors = results["embeddings"][row] if include_embeddings else [None] * len(ids)
+                        
+                        for doc, dist, meta, doc_id, vector in zip(docs, distances, metas, ids, vectors):
+                            # Convert distance to similarity (cosine distance -> similarity)
+                            similarity = 1 - dist if dist is not None else 0
+                            output.append({
+                                "content": doc,
+                                "similarity_score": similarity,
+                                "metadata": meta,
+                                "document_id": doc_id,
+                                "distance": dist,
+                            })
+                            if include_embeddings:
+                                output[-1]["embedding"] = np.asarray(vector, dtype=np.float32)
+                    outputs.append(output)
+                
+                return outputs
+            else:
+                outputs = []
+                for hits in self.index.search_records(queries, k, metadata_filters, include_embeddings):
+                    output = []
+                    for (doc_id, content, meta, *vector), similarity in hits:
                         output.append({
-                            "content": doc,
+                            "content": content,
                             "similarity_score": similarity,
                             "metadata": meta,
                             "document_id": doc_id,
-                            "distance": dist,
+                            "distance": 1 - similarity,
                         })
+                        if vector:
+                            output[-1]["embedding"] = vector[0]
+                    outputs.append(output)
                 
-                return output
-            else:
-                # Mock search (simple substring matching for testing)
-                results = []
-                for doc_id, doc_data in self._mock_storage.items():
-                    if query.lower() in doc_data.get("content", "").lower():
-                        results.append({
-                            "content": doc_data["content"],
-                            "similarity_score": 0.8,  # Mock score
-                            "metadata": doc_data.get("metadata", {}),
-                            "document_id": doc_id,
-                        })
-                
-                return results[:k]
+                return outputs
         
         except Exception as e:
             print(f"❌ Error in similarity search: {e}")
-            return []
+            return [[] for _ in queries]
     
     def get_collection_stats(self) -> Dict[str, Any]:
         """
@@ -245,10 +475,20 @@ class VectorStore:
                     "embedding_model": self.embedding_service.get_config(),
                 }
             else:
-                return {
-                    "document_count": len(self._mock_storage),
-                    "storage_type": "mock",
+                stats = {
+                    "collection_name": self.collection_name,
+                    "document_count": len(self.index),
+                    "storage_type": (
+                        "chroma" if self._has_chroma
+                        else "segments" if self.index_format == "segments" else "numpy"
+                    ),
+                    "index_type": "hnsw" if self._has_chroma else "ivf" if self.index.is_ivf else "flat",
+                    "embedding_model": self.embedding_service.get_config(),
                 }
+                if self.partition_keys:
+                    stats["partition_keys"] = list(self.partition_keys)
+                    stats["partitions"] = self.index.partition_sizes()
+                return stats
         except Exception as e:
             return {"error": str(e)}
     
@@ -261,12 +501,21 @@ class VectorStore:
         """
         try:
             if self._has_chroma and self.client:
-                self.client.delete_collection(name=self.collection_name)
+                if self.index is not None:
+                    self.index.clear()  # Drops every partition collection
+                    self.index = None
+                else:
+                    self.client.delete_collection(name=self.collection_name)
                 self.collection = None
                 self._initialized = False
                 return True
             else:
-                self._mock_storage.clear()
+                if self.index is not None:
+                    self.index.clear()
+                if self.persist_index and self.index_format != "segments":
+                    for directory in (self.index_directory, self.partition_directory):
+                        if os.path.isdir(directory):
+                            shutil.rmtree(directory)
                 return True
         except Exception as e:
             print(f"❌ Error deleting collection: {e}")
@@ -279,30 +528,221 @@ class VectorStore:
             return self.initialize()
         return False
     
-    @staticmethod
-    def _build_where_clause(filters: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    def _open_partitioned_index(self) -> PartitionedVectorIndex:
         """
-        Build ChromaDB where clause from metadata filters.
+        Partitioned NumPy backend: one child index per partition directory.
         
-        Args:
-            filters: Filter dict like {"audience_level": "beginner"}
+        A collection written before partitioning is opened as the legacy
+        child; initialize() then moves it into the partitions.
+        """
+        dim = self.embedding_service.embedding_dim
+        options = self._index_options()
+        root = self.partition_directory
+        
+        if self.index_format == "segments":
+            def open_segments(pid: str, values: Dict[str, str]) -> SegmentedVectorIndex:
+                directory = os.path.join(root, pid)
+                write_partition_file(directory, values)
+                return SegmentedVectorIndex(directory, dim)
             
-        Returns:
-            ChromaDB where clause
+            legacy = None
+            if os.path.exists(os.path.join(self.index_directory, SegmentedVectorIndex.MANIFEST_FILE)):
+                legacy = SegmentedVectorIndex(self.index_directory, dim)
+            return PartitionedVectorIndex(
+                self.partition_keys,
+                open_segments,
+                legacy=legacy if legacy is not None and len(legacy) else None,
+                discover=lambda known: discover_partition_directories(root, known),
+            )
+        
+        partitions = {}
+        legacy = None
+        if self.persist_index:
+            for pid, values in discover_partition_directories(root).items():
+                if NumpyVectorIndex.exists(os.path.join(root, pid)):
+                    partitions[pid] = (values, NumpyVectorIndex.load(os.path.join(root, pid), **options))
+            if NumpyVectorIndex.exists(self.index_directory):
+                legacy = NumpyVectorIndex.load(self.index_directory, **options)
+        return PartitionedVectorIndex(
+            self.partition_keys,
+            lambda pid, values: NumpyVectorIndex(dim, **options),
+            partitions=partitions,
+            legacy=legacy,
+        )
+    
+    def _open_chroma_partitions(self) -> PartitionedVectorIndex:
         """
-        if not filters:
-            return None
-        
-        if len(filters) == 1:
-            key, value = list(filters.items())[0]
-            return {key: {"$eq": value}}
-        else:
-            # Multiple filters: AND logic
-            clauses = [
-                {key: {"$eq": value}}
-                for key, value in filters.items()
-            ]
-            return {"$and": clauses}
+        Partitioned Chroma backend: one collection per partition, named
+        "<collection>-p-<partition id>" with the key values in its metadata.
+        The unpartitioned collection, if it holds documents, is the legacy
+        child (moved into the partitions by initialize()).
+        """
+        prefix = f"{self.collection_name}-p-"
+        partitions = {}
+        legacy = None
+        for entry in self.client.list_collections():
+            name = getattr(entry, "name", entry)  # Collection objects or names, by Chroma version
+            if name.startswith(prefix):
+                collection = self.client.get_collection(name=name)
+                values = json.loads((collection.metadata or {}).get("partition", "{}"))
+                partitions[name[len(prefix):]] = (values, _ChromaCollectionIndex(self.client, collection))
+            elif name == self.collection_name:
+                collection = self.client.get_collection(name=name)
+                if collection.count():
+                    legacy = _ChromaCollectionIndex(self.client, collection)
+        
+        def create(pid: str, values: Dict[str, str]) -> "_ChromaCollectionIndex":
+            collection = self.client.get_or_create_collection(
+                name=prefix + pid,
+                metadata={"hnsw:space": "cosine", "partition": json.dumps(values, sort_keys=True)},
+            )
+            return _ChromaCollectionIndex(self.client, collection)
+        
+        return PartitionedVectorIndex(self.partition_keys, create, partitions=partitions, legacy=legacy)
+    
+    def _migrate_legacy_collection(self) -> None:
+        """
+        Move a collection written before partitioning into the partitions.
+        
+        Legacy rows are re-keyed to VectorDocument.stable_id(), so the next
+        ingestion of the same chunks overwrites them instead of adding a
+        second copy next to an older (salted) id.
+        """
+        if self.index.legacy is None:
+            return
+        moved = self.index.migrate_legacy(self._stable_record_id)
+        if self.persist_index and self.index_format != "segments" and not self._has_chroma:
+            self._save_snapshot()
+            if os.path.isdir(self.index_directory):
+                shutil.rmtree(self.index_directory)
+        print(f"✅ Moved {moved} unpartitioned documents into partitions")
+    
+    @staticmethod
+    def _stable_record_id(doc_id: str, document: str, metadata: Dict[str, Any]) -> str:
+        """stable_id() of a stored row (its own id if the metadata doesn't parse)."""
+        try:
+            return VectorDocument.from_chroma_format(
+                {"id": doc_id, "document": document, "metadatas": metadata}
+            ).stable_id()
+        except (TypeError, ValueError):
+            return doc_id
+    
+    def _save_snapshot(self) -> None:
+        """Save the NumPy index after a write when npy snapshots are enabled."""
+        if self._has_chroma or not self.persist_index or self.index_format == "segments":
+            return
+        self.index.save(self.partition_directory if self.partition_keys else self.index_directory)
+    
+    @staticmethod
+    def _index_options() -> Dict[str, int]:
+        """NumPy index tuning from environment."""
+        return {
+            "ivf_threshold": int(os.getenv("VECTOR_INDEX_IVF_THRESHOLD", "100000")),
+            "nprobe": int(os.getenv("VECTOR_INDEX_NPROBE", "8")),
+        }
+
+
+class _ChromaCollectionIndex:
+    """
+    A Chroma collection behind the NumpyVectorIndex interface (partition child).
+    
+    Row handles are the (id, document, metadata) tuples themselves.
+    """
+    
+    is_ivf = False
+    
+    def __init__(self, client: Any, collection: Any):
+        self.client = client
+        self.collection = collection
+    
+    def __len__(self) -> int:
+        return self.collection.count()
+    
+    def add(self, ids, embeddings, documents, metadatas) -> int:
+        self.collection.upsert(
+            ids=list(ids),
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            documents=list(documents),
+            metadatas=list(metadatas),
+        )
+        return len(ids)
+    
+    def delete(self, ids) -> int:
+        present = self.existing_ids(ids)
+        if present:
+            self.collection.delete(ids=list(present))
+        return len(present)
+    
+    def existing_ids(self, ids) -> set:
+        found = self.collection.get(ids=list(ids), include=[])
+        return set(found.get("ids", [])) if found else set()
+
+    def get_vectors(self, ids) -> Dict[str, np.ndarray]:
+        return _chroma_vectors(self.collection, ids)
+
+    def iter_records(self, batch_size: int = 1000):
+        offset = 0
+        while True:
+            found = self.collection.get(
+                offset=offset, limit=batch_size, include=["embeddings", "documents", "metadatas"]
+            )
+            ids = list(found["ids"]) if found else []
+            if not ids:
+                return
+            yield ids, np.asarray(found["embeddings"], dtype=np.float32), list(found["documents"]), list(found["metadatas"])
+            offset += len(ids)
+    
+    def search(self, query_embeddings, k: int, metadata_filters=None) -> List[List[Tuple[Any, float]]]:
+        return self.search_records(query_embeddings, k, metadata_filters)
+    
+    def search_records(
+        self, query_embeddings, k: int, metadata_filters=None, include_vectors: bool = False
+    ) -> List[List[Tuple[Any, float]]]:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        n_results = min(k, self.collection.count())
+        if n_results == 0:
+            return [[] for _ in queries]
+        options = {"include": ["documents", "metadatas", "distances", "embeddings"]} if include_vectors else {}
+        results = self.collection.query(
+            query_embeddings=queries.tolist(),
+            n_results=n_results,
+            where=to_chroma_where(metadata_filters),
+            **options,
+        )
+        hits = []
+        for row in range(len(queries)):
+            rows = zip(
+                results["ids"][row],
+                results["documents"][row],
+                results["metadatas"][row],
+                results["distances"][row],
+            )
+            if include_vectors:
+                vectors = [np.asarray(vector, dtype=np.float32) for vector in results["embeddings"][row]]
+                hits.append([((doc_id, doc, meta, vector), 1 - dist) for (doc_id, doc, meta, dist), vector in zip(rows, vectors)])
+            else:
+                hits.append([((doc_id, doc, meta), 1 - dist) for doc_id, doc, meta, dist in rows])
+        return hits
+    
+    def get(self, handle: Tuple[str, str, Dict[str, Any]]) -> Tuple[str, str, Dict[str, Any]]:
+        return handle
+    
+    def clear(self) -> None:
+        self.client.delete_collection(name=self.collection.name)
+    
+    def save(self, directory: Optional[str] = None) -> None:
+        """No-op: Chroma persists on write."""
+
+
+def _chroma_vectors(collection: Any, ids: List[str]) -> Dict[str, np.ndarray]:
+    """Stored embeddings of the ids a Chroma collection holds."""
+    found = collection.get(ids=list(ids), include=["embeddings"])
+    if not found or found.get("embeddings") is None:
+        return {}
+    return {
+        doc_id: np.asarray(vector, dtype=np.float32)
+        for doc_id, vector in zip(found["ids"], found["embeddings"])
+    }
 
 
 # Singleton instance
@@ -6,8 +6,26 @@ Validates:
 - Calls Module Creation Agent once (stubbed)
 - Returns valid CourseOutlineSchema
 - Handles missing optional fields
+- Runs Retrieval + WebSearch enrichment concurrently with deadlines
+- Stage graph: dependency ordering, cache skips, timings
 """
 
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from schemas.execution_context import ExecutionContext
+from schemas.user_input import UserInputSchema
+from schemas.course_outline import CourseOutlineSchema, Module, Lesson, LearningObjective, BloomLevel
+from services.db_service import MockDatabase, DatabaseConfig, DatabaseProvider
+from agents.orchestrator import CourseOrchestratorAgent
+from agents.pipeline import PipelineEngine, PipelineStage
+from services.llm_service import LLMRateLimiter
+from utils.single_flight import SingleFlight
+
+
 def test_orchestrator_accepts_valid_input():
     """PHASE 2: Orchestrator accepts valid UserInputSchema."""
     pass
@@ -41,3 +59,710 @@ def test_orchestrator_respects_audience_level():
 def test_orchestrator_calls_module_creation_agent():
     """PHASE 2: Orchestrator delegates to Module Creation Agent."""
     pass
+
+
+# ============================================================================
+# STAGE GRAPH TESTS (concurrent enrichment, deadlines, caching, timings)
+# ============================================================================
+
+class _FakeOutput:
+    """Minimal agent output exposing the fields the orchestrator logs."""
+    
+    returned_count = 1
+    retrieval_confidence = 0.9
+    result_count = 1
+    confidence_score = 0.7
+    execution_notes = ""
+    search_notes = None
+    tool_used = Mock(value="tavily")
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def to_dict(self):
+        return {"source": self.name}
+
+
+class _DelayedAgent:
+    """Agent stub that sleeps, then returns (or raises)."""
+    
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None, result=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.result = result
+        self.calls = 0
+    
+    async def run(self, context):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result if self.result is not None else _FakeOutput(self.name)
+
+
+def _make_user_input(**overrides):
+    fields = dict(
+        course_title="Intro to ML",
+        course_description="Learn machine learning from scratch",
+        audience_level="beginner",
+        audience_category="undergraduate",
+        learning_mode="hybrid",
+        depth_requirement="introductory",
+        duration_hours=30,
+    )
+    fields.update(overrides)
+    return UserInputSchema(**fields)
+
+
+def _make_outline():
+    modules = [
+        Module(
+            module_id=f"M_{i}",
+            title=f"Module {i}",
+            description=f"Module {i} overview",
+            estimated_hours=10.0,
+            learning_objectives=[
+                LearningObjective(
+                    objective_id=f"LO_{i}_{j}",
+                    statement=f"Objective {j}",
+                    bloom_level=BloomLevel.APPLY,
+                    assessment_method="quiz",
+                )
+                for j in range(1, 4)
+            ],
+            lessons=[Lesson(lesson_id=f"L_{i}_1", title="Lesson", duration_minutes=60)],
+            assessment_type="quiz",
+        )
+        for i in range(1, 4)
+    ]
+    return CourseOutlineSchema(
+        course_title="Intro to ML",
+        course_summary="A practical introduction to machine learning for beginners.",
+        audience_level="beginner",
+        audience_category="undergraduate",
+        learning_mode="hybrid",
+        depth_requirement="introductory",
+        total_duration_hours=30,
+        modules=modules,
+        confidence_score=0.8,
+        completeness_score=0.9,
+    )
+
+
+def _make_orchestrator(retrieval_agent, web_search_agent, module_agent=None, **kwargs):
+    module_agent = module_agent or _DelayedAgent("module", result=_make_outline())
+    with patch("agents.orchestrator.get_module_creation_agent", return_value=module_agent), \
+         patch("agents.orchestrator.RetrievalAgent", return_value=retrieval_agent), \
+         patch("agents.orchestrator.WebSearchAgent", return_value=web_search_agent):
+        return CourseOrchestratorAgent(**kwargs)
+
+
+def _make_context(**overrides):
+    return ExecutionContext(user_input=_make_user_input(), session_id="test_session", **overrides)
+
+
+@pytest.mark.asyncio
+async def test_enrichment_runs_retrieval_and_web_search_concurrently():
+    """PHASE 2: Enrichment latency is the slower agent, not the sum."""
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval", delay=0.2),
+        _DelayedAgent("web", delay=0.2),
+    )
+    context = _make_context()
+    
+    start = time.perf_counter()
+    await orchestrator.pipeline.run(context)
+    elapsed = time.perf_counter() - start
+    
+    assert elapsed < 0.35
+    assert context.retrieved_documents == {"source": "retrieval"}
+    assert context.web_search_results == {"source": "web"}
+
+
+@pytest.mark.asyncio
+async def test_enrichment_timeout_is_non_blocking():
+    """PHASE 2: An agent that misses its deadline leaves its field empty."""
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval", delay=1.0),
+        _DelayedAgent("web", delay=0.0),
+        retrieval_timeout=0.05,
+    )
+    context = _make_context()
+    
+    start = time.perf_counter()
+    await orchestrator.pipeline.run(context)
+    
+    assert time.perf_counter() - start < 0.5
+    assert context.retrieved_documents is None
+    assert context.web_search_results == {"source": "web"}
+    assert context.stage_status["retrieval"] == "timed_out"
+    assert isinstance(context.generated_outline, CourseOutlineSchema)
+
+
+@pytest.mark.asyncio
+async def test_enrichment_failure_is_non_blocking():
+    """PHASE 2: An agent failure does not cancel its sibling."""
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval"),
+        _DelayedAgent("web", error=RuntimeError("provider down")),
+    )
+    context = _make_context()
+    
+    await orchestrator.pipeline.run(context)
+    
+    assert context.retrieved_documents == {"source": "retrieval"}
+    assert context.web_search_results is None
+    assert context.stage_status["web_search"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_pipeline_records_stage_timings():
+    """PHASE 2: Every stage reports elapsed time in the context."""
+    orchestrator = _make_orchestrator(_DelayedAgent("retrieval"), _DelayedAgent("web"))
+    context = _make_context()
+    
+    await orchestrator.pipeline.run(context)
+    
+    for stage in ("retrieval", "web_search", "pdf_extraction", "module_creation", "validation"):
+        assert stage in context.stage_timings
+        assert context.stage_timings[stage] >= 0.0
+
+
+@pytest.mark.asyncio
+async def test_pipeline_skips_cached_stages():
+    """PHASE 2: Stages whose outputs are already on the context are skipped."""
+    retrieval_agent = _DelayedAgent("retrieval")
+    orchestrator = _make_orchestrator(retrieval_agent, _DelayedAgent("web"))
+    context = _make_context(retrieved_documents={"source": "cache"})
+    
+    await orchestrator.pipeline.run(context)
+    
+    assert retrieval_agent.calls == 0
+    assert context.retrieved_documents == {"source": "cache"}
+    assert context.stage_status["retrieval"] == "skipped"
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_run_returns_outline_dict():
+    """PHASE 2: run() returns the validated outline as a dict."""
+    orchestrator = _make_orchestrator(_DelayedAgent("retrieval"), _DelayedAgent("web"))
+    
+    outline = await orchestrator.run(_make_user_input())
+    
+    assert outline["course_title"] == "Intro to ML"
+    assert len(outline["modules"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_module_failure_propagates():
+    """PHASE 2: Module creation is blocking; its error reaches the caller."""
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval"),
+        _DelayedAgent("web"),
+        module_agent=_DelayedAgent("module", error=RuntimeError("LLM down")),
+    )
+    
+    with pytest.raises(RuntimeError, match="LLM down"):
+        await orchestrator.run(_make_user_input())
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_persists_outline_when_db_configured():
+    """PHASE 2: Persistence stage runs after validation when a DB is supplied."""
+    db = MockDatabase(DatabaseConfig(provider=DatabaseProvider.SQLITE))
+    orchestrator = _make_orchestrator(_DelayedAgent("retrieval"), _DelayedAgent("web"), db_service=db)
+    context = _make_context()
+    
+    await orchestrator.pipeline.run(context)
+    
+    assert context.persisted_course_id in db.courses
+    assert context.stage_status["persistence"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_pipeline_engine_orders_dependent_stages():
+    """PHASE 2: A stage starts only after the producers of its inputs finish."""
+    events = []
+    
+    async def produce(context):
+        await asyncio.sleep(0.05)
+        events.append("produce")
+        context.retrieved_documents = {"ok": True}
+    
+    async def consume(context):
+        events.append("consume")
+        assert context.retrieved_documents == {"ok": True}
+    
+    engine = PipelineEngine([
+        PipelineStage(name="consume", run=consume, inputs=("retrieved_documents",)),
+        PipelineStage(name="produce", run=produce, outputs=("retrieved_documents",)),
+    ])
+    await engine.run(_make_context())
+    
+    assert events == ["produce", "consume"]
+
+
+def test_pipeline_engine_rejects_cycles():
+    """PHASE 2: Cyclic stage graphs are rejected at construction."""
+    async def noop(context):
+        pass
+    
+    with pytest.raises(ValueError, match="cycle"):
+        PipelineEngine([
+            PipelineStage(name="a", run=noop, inputs=("web_search_results",), outputs=("retrieved_documents",)),
+            PipelineStage(name="b", run=noop, inputs=("retrieved_documents",), outputs=("web_search_results",)),
+        ])
+
+
+# ========== BATCH GENERATION TESTS ==========
+
+class _QueryAgent(_DelayedAgent):
+    """Agent stub exposing the query-planning hooks used for coalescing."""
+    
+    def _generate_search_queries(self, user_input):
+        return [user_input.course_title]
+    
+    def _build_metadata_filters(self, user_input):
+        return {"audience_level": user_input.audience_level}
+
+
+class _AsyncQueryAgent(_DelayedAgent):
+    """Web search stub (query planning is async on WebSearchAgent)."""
+    
+    async def _generate_search_queries(self, user_input):
+        return [user_input.course_title]
+
+
+class _ConcurrencyTrackingAgent(_DelayedAgent):
+    """Module agent stub that records peak concurrency."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.peak = 0
+    
+    async def run(self, context):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().run(context)
+        finally:
+            self.active -= 1
+
+
+async def _collect(aiter):
+    return [item async for item in aiter]
+
+
+@pytest.mark.asyncio
+async def test_run_many_yields_result_per_input():
+    """PHASE 2: Every batch input produces exactly one BatchResult."""
+    orchestrator = _make_orchestrator(_QueryAgent("retrieval"), _AsyncQueryAgent("web"))
+    inputs = [_make_user_input(course_title=f"Course {i}") for i in range(5)]
+    
+    results = await _collect(orchestrator.run_many(inputs, max_concurrency=2))
+    
+    assert sorted(r.index for r in results) == [0, 1, 2, 3, 4]
+    assert all(r.ok and r.outline["course_title"] == "Intro to ML" for r in results)
+
+
+@pytest.mark.asyncio
+async def test_run_many_bounds_concurrency():
+    """PHASE 2: No more than max_concurrency outlines are generated at once."""
+    module_agent = _ConcurrencyTrackingAgent("module", delay=0.05, result=_make_outline())
+    orchestrator = _make_orchestrator(
+        _QueryAgent("retrieval"), _AsyncQueryAgent("web"), module_agent=module_agent
+    )
+    inputs = [_make_user_input(course_title=f"Course {i}") for i in range(6)]
+    
+    await _collect(orchestrator.run_many(inputs, max_concurrency=2))
+    
+    assert module_agent.calls == 6
+    assert module_agent.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_run_many_coalesces_identical_queries():
+    """PHASE 2: Identical retrieval / web queries run once per batch."""
+    retrieval = _QueryAgent("retrieval", delay=0.05)
+    web = _AsyncQueryAgent("web", delay=0.05)
+    orchestrator = _make_orchestrator(retrieval, web)
+    inputs = [_make_user_input() for _ in range(4)] + [_make_user_input(course_title="Other")]
+    
+    results = await _collect(orchestrator.run_many(inputs, max_concurrency=5))
+    
+    assert len(results) == 5
+    assert retrieval.calls == 2
+    assert web.calls == 2
+    assert orchestrator.query_coalescer is None  # Batch state never leaks
+
+
+@pytest.mark.asyncio
+async def test_run_many_web_search_key_covers_synthesis_inputs():
+    """PHASE 2: Web search is shared only by inputs whose synthesis would match."""
+    web = _AsyncQueryAgent("web")
+    orchestrator = _make_orchestrator(_QueryAgent("retrieval"), web)
+    inputs = [_make_user_input(), _make_user_input(course_description="Deep learning for vision researchers")]
+    
+    await _collect(orchestrator.run_many(inputs, max_concurrency=1))
+    
+    assert web.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_run_many_does_not_memoize_degraded_outputs():
+    """PHASE 2: A failed (zero-confidence) agent output is not served to later batch items."""
+    failed = _FakeOutput("retrieval")
+    failed.retrieval_confidence = 0.0
+    partial = _FakeOutput("web")
+    partial.search_notes = "Partial results: 1/3 queries finished before the deadline."
+    retrieval = _QueryAgent("retrieval", result=failed)
+    web = _AsyncQueryAgent("web", result=partial)
+    orchestrator = _make_orchestrator(retrieval, web)
+    
+    results = await _collect(orchestrator.run_many([_make_user_input() for _ in range(3)], max_concurrency=1))
+    
+    assert all(r.ok for r in results)
+    assert retrieval.calls == 3
+    assert web.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_run_many_isolates_failures():
+    """PHASE 2: A failing item is reported without stopping the batch."""
+    class _FlakyModuleAgent(_DelayedAgent):
+        async def run(self, context):
+            if context.user_input.course_title == "Broken":
+                raise RuntimeError("LLM down")
+            return await super().run(context)
+    
+    orchestrator = _make_orchestrator(
+        _QueryAgent("retrieval"), _AsyncQueryAgent("web"),
+        module_agent=_FlakyModuleAgent("module", result=_make_outline()),
+    )
+    inputs = [_make_user_input(), _make_user_input(course_title="Broken"), _make_user_input()]
+    
+    results = {r.index: r for r in await _collect(orchestrator.run_many(inputs))}
+    
+    assert results[0].ok and results[2].ok
+    assert isinstance(results[1].error, RuntimeError)
+
+
+@pytest.mark.asyncio
+async def test_run_many_stops_when_consumer_closes_early():
+    """PHASE 2: Breaking out of the batch with a full results queue cancels workers cleanly."""
+    orchestrator = _make_orchestrator(
+        _QueryAgent("retrieval"), _AsyncQueryAgent("web"),
+        module_agent=_DelayedAgent("module", delay=0.01, result=_make_outline()),
+    )
+    inputs = [_make_user_input(course_title=f"Course {i}") for i in range(10)]
+    
+    batch = orchestrator.run_many(inputs, max_concurrency=1)
+    first = await asyncio.wait_for(batch.__anext__(), timeout=5)
+    await asyncio.sleep(0.1)  # Slow consumer: the worker fills the results queue
+    await asyncio.wait_for(batch.aclose(), timeout=5)
+    
+    assert first.ok
+    
+    async def consume_one():
+        async for result in orchestrator.run_many(inputs, max_concurrency=1):
+            return result
+    assert (await asyncio.wait_for(consume_one(), timeout=5)).ok
+
+
+@pytest.mark.asyncio
+async def test_run_many_raises_when_input_iterable_fails():
+    """PHASE 2: An input iterable that raises part-way ends the batch with its error."""
+    orchestrator = _make_orchestrator(_QueryAgent("retrieval"), _AsyncQueryAgent("web"))
+    
+    def inputs():
+        yield _make_user_input()
+        raise OSError("catalogue unreadable")
+    
+    results = []
+    with pytest.raises(OSError, match="catalogue unreadable"):
+        async def consume():
+            async for result in orchestrator.run_many(inputs(), max_concurrency=2):
+                results.append(result)
+        await asyncio.wait_for(consume(), timeout=5)
+    
+    assert all(result.ok for result in results)
+
+
+@pytest.mark.asyncio
+async def test_llm_rate_limiter_caps_concurrency():
+    """PHASE 2: Shared LLM budget limits in-flight calls across callers."""
+    limiter = LLMRateLimiter(max_concurrent=2)
+    active = 0
+    peak = 0
+    
+    async def call():
+        nonlocal active, peak
+        async with limiter:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+    
+    await asyncio.gather(*(call() for _ in range(6)))
+    
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_llm_rate_limiter_releases_slot_when_cancelled_while_pacing():
+    """PHASE 2: A call cancelled during its pacing wait gives its concurrency slot back."""
+    limiter = LLMRateLimiter(requests_per_minute=60, max_concurrent=1)
+    async with limiter:
+        pass  # Next pacing slot is a second away
+    
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(limiter.acquire(), timeout=0.05)
+    
+    await asyncio.wait_for(limiter._semaphore.acquire(), timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_inflight_work():
+    """PHASE 2: Concurrent callers with the same key share one execution."""
+    flight = SingleFlight()
+    executions = 0
+    
+    async def work():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.02)
+        return "result"
+    
+    results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+    
+    assert results == ["result"] * 3
+    assert executions == 1
+    assert flight.stats()["coalesced"] == 2
+
+
+# ========== REQUEST COALESCING TESTS ==========
+
+def test_user_input_fingerprint_normalizes_free_text():
+    """PHASE 2: Case / whitespace differences map to the same fingerprint."""
+    a = _make_user_input(course_title="Intro to ML", course_description="Learn  machine learning")
+    b = _make_user_input(course_title="  intro TO ml ", course_description="learn machine\nlearning")
+    c = _make_user_input(course_title="Intro to ML", duration_hours=40)
+    
+    assert a.fingerprint() == b.fingerprint()
+    assert a.fingerprint() != c.fingerprint()
+
+
+@pytest.mark.asyncio
+async def test_identical_inflight_requests_share_one_generation():
+    """PHASE 2: Concurrent identical requests trigger one generation, separate copies."""
+    module_agent = _DelayedAgent("module", delay=0.05, result=_make_outline())
+    retrieval = _DelayedAgent("retrieval")
+    orchestrator = _make_orchestrator(retrieval, _DelayedAgent("web"), module_agent=module_agent)
+    
+    first, second, third = await asyncio.gather(
+        orchestrator.run(_make_user_input()),
+        orchestrator.run(_make_user_input(course_title="intro to ML ")),
+        orchestrator.run(_make_user_input().model_dump()),
+    )
+    
+    assert module_agent.calls == 1
+    assert retrieval.calls == 1
+    assert first == second == third
+    first["course_title"] = "Changed"
+    assert second["course_title"] == "Intro to ML"
+
+
+@pytest.mark.asyncio
+async def test_different_requests_are_not_coalesced():
+    """PHASE 2: Distinct requests each run their own generation."""
+    module_agent = _DelayedAgent("module", delay=0.02, result=_make_outline())
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval"), _DelayedAgent("web"), module_agent=module_agent
+    )
+    
+    await asyncio.gather(
+        orchestrator.run(_make_user_input()),
+        orchestrator.run(_make_user_input(course_title="Deep Learning")),
+    )
+    
+    assert module_agent.calls == 2
+
+
+# ========== REQUEST DEADLINE TESTS ==========
+
+def test_execution_context_with_deadline_only_tightens():
+    """PHASE 2: Agent-scoped deadlines never extend the request deadline."""
+    context = _make_context(deadline=time.monotonic() + 1.0)
+    
+    assert context.with_deadline(10.0).remaining_time() <= 1.0
+    assert context.with_deadline(0.1).remaining_time() <= 0.1
+    assert not context.is_expired()
+    assert _make_context().remaining_time() is None
+
+
+@pytest.mark.asyncio
+async def test_pipeline_clamps_stage_timeouts_to_request_deadline():
+    """PHASE 2: Stages are cut off when the request budget is spent."""
+    async def slow(context):
+        await asyncio.sleep(1.0)
+        context.retrieved_documents = {"late": True}
+    
+    async def consume(context):
+        pass
+    
+    engine = PipelineEngine([
+        PipelineStage(name="slow", run=slow, outputs=("retrieved_documents",), timeout=5.0, blocking=False),
+        PipelineStage(name="consume", run=consume, inputs=("retrieved_documents",)),
+    ])
+    context = _make_context(deadline=time.monotonic() + 0.1)
+    
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError, match="request deadline"):
+        await engine.run(context)
+    
+    assert time.perf_counter() - start < 0.5
+    assert context.stage_status["slow"] == "timed_out"
+    assert context.stage_status["consume"] == "timed_out"  # Never started
+    assert context.retrieved_documents is None
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_request_timeout_cancels_generation():
+    """PHASE 2: run() fails fast once the request budget is spent."""
+    module_agent = _DelayedAgent("module", delay=2.0, result=_make_outline())
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval", delay=2.0),
+        _DelayedAgent("web"),
+        module_agent=module_agent,
+    )
+    
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        await orchestrator.run(_make_user_input(), timeout=0.3)
+    
+    assert time.perf_counter() - start < 0.6
+
+
+
+# ========== STREAMING TESTS ==========
+
+class _StreamingModuleAgent(_DelayedAgent):
+    """Module agent stub that emits each module while 'generating'."""
+    
+    async def run(self, context):
+        self.calls += 1
+        outline = _make_outline()
+        for module in outline.modules:
+            await asyncio.sleep(self.delay)
+            context.emit("module", module)
+        return outline
+
+
+@pytest.mark.asyncio
+async def test_stream_emits_stage_and_module_events_in_order():
+    """PHASE 2: stream() yields stages, then modules as they arrive, then the outline."""
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval"),
+        _DelayedAgent("web"),
+        module_agent=_StreamingModuleAgent("module", delay=0.1),
+    )
+    
+    start = time.perf_counter()
+    events = []
+    async for event in orchestrator.stream(_make_user_input()):
+        events.append((event, time.perf_counter() - start))
+    
+    types = [event.type for event, _ in events]
+    stages = [event.data["stage"] for event, _ in events if event.type == "stage"]
+    first_module_at = next(t for event, t in events if event.type == "module")
+    
+    assert types.count("module") == 3
+    assert types[-1] == "outline"
+    assert set(stages[:3]) == {"retrieval", "web_search", "pdf_extraction"}
+    assert stages[-2:] == ["module_creation", "validation"]
+    assert types.index("module") < types.index("outline")
+    assert first_module_at < events[-1][1] / 2  # Well before the full outline
+    assert events[-1][0].data["course_title"] == "Intro to ML"
+
+
+@pytest.mark.asyncio
+async def test_stream_propagates_pipeline_errors():
+    """PHASE 2: A failing generation surfaces as an exception from stream()."""
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval"),
+        _DelayedAgent("web"),
+        module_agent=_DelayedAgent("module", error=RuntimeError("LLM down")),
+    )
+    
+    with pytest.raises(RuntimeError, match="LLM down"):
+        async for _ in orchestrator.stream(_make_user_input()):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_stream_joins_inflight_identical_request():
+    """PHASE 2: A stream joining a running generation replays its events and shares the outline."""
+    module_agent = _StreamingModuleAgent("module", delay=0.05)
+    orchestrator = _make_orchestrator(_DelayedAgent("retrieval"), _DelayedAgent("web"), module_agent=module_agent)
+    
+    async def stream_types(delay):
+        await asyncio.sleep(delay)
+        return [event.type async for event in orchestrator.stream(_make_user_input(course_title="intro to ML "))]
+    
+    outline, early, late = await asyncio.gather(
+        orchestrator.run(_make_user_input()), stream_types(0), stream_types(0.08),
+    )
+    
+    assert module_agent.calls == 1
+    assert early == late  # The late stream got the modules emitted before it joined
+    assert early.count("module") == 3 and early[-1] == "outline"
+    assert outline["course_title"] == "Intro to ML"
+    
+    # Leaving a shared stream early does not cancel the generation others wait for
+    async def first_event():
+        async for event in orchestrator.stream(_make_user_input()):
+            return event
+    outline, event = await asyncio.gather(orchestrator.run(_make_user_input()), first_event())
+    assert event.type == "stage" and outline["course_title"] == "Intro to ML"
+    assert module_agent.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_keep_their_own_timeouts():
+    """PHASE 2: Each caller of a shared generation waits for its own budget, not the first caller's."""
+    module_agent = _DelayedAgent("module", delay=0.1, result=_make_outline())
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval", delay=0.1), _DelayedAgent("web"), module_agent=module_agent,
+    )
+    
+    # A short-budget caller times out; the joined long-budget caller still gets the outline
+    short, long = await asyncio.gather(
+        orchestrator.run(_make_user_input(), timeout=0.15),
+        orchestrator.run(_make_user_input(), timeout=2.0),
+        return_exceptions=True,
+    )
+    assert isinstance(short, TimeoutError)
+    assert long["course_title"] == "Intro to ML"
+    assert module_agent.calls == 1
+    
+    # A short-budget caller joining a long-budget generation stops waiting at its own deadline
+    async def stream_all(timeout):
+        return [event async for event in orchestrator.stream(_make_user_input(), timeout=timeout)]
+    long, short = await asyncio.gather(
+        orchestrator.run(_make_user_input(), timeout=2.0), stream_all(0.05), return_exceptions=True,
+    )
+    assert isinstance(short, TimeoutError)
+    assert long["course_title"] == "Intro to ML"
+    assert module_agent.calls == 2
+
+
+def test_explicit_zero_timeouts_are_kept():
+    """PHASE 2: A timeout of 0 is a budget, not a request for the default."""
+    orchestrator = _make_orchestrator(
+        _DelayedAgent("retrieval"), _DelayedAgent("web"),
+        retrieval_timeout=0, web_search_timeout=0, request_timeout=0,
+    )
+    
+    assert (orchestrator.retrieval_timeout, orchestrator.web_search_timeout, orchestrator.request_timeout) == (0, 0, 0)
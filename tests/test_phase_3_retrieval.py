@@ -5,8 +5,11 @@ Comprehensive tests for vector store, retrieval, and ingestion.
 Mandatory gate before Phase 4.
 """
 
+import os
 import pytest
 import asyncio
+import time
+import numpy as np
 from datetime import datetime
 
 from schemas.vector_document import VectorDocument, VectorDocumentMetadata, SourceType, UploadedBy
@@ -15,10 +18,11 @@ from schemas.user_input import UserInputSchema, AudienceLevel, AudienceCategory,
 from schemas.execution_context import ExecutionContext
 
 from services.vector_store import get_vector_store, reset_vector_store
-from services.embedding_service import get_embedding_service, reset_embedding_service
+from services.embedding_service import EmbeddingService, get_embedding_service, reset_embedding_service
 
 from agents.retrieval_agent import RetrievalAgent
 from tools.curriculum_ingestion import IngestionPipeline
+from utils.diversity import mmr_select
 
 
 # ============================================================================
@@ -87,6 +91,284 @@ class TestEmbeddingService:
         
         assert len(embeddings) == 3
         assert all(len(e) == service.embedding_dim for e in embeddings)
+    
+    def test_embed_batch_matrix_matches_single(self):
+        """Batch matrix is float32 (n, dim) and row-equal to embed_text."""
+        service = get_embedding_service()
+        texts = ["Text 1", "Text 2", "Text 3"]
+        
+        matrix = service.embed_batch(texts)
+        
+        assert matrix.shape == (3, service.embedding_dim)
+        assert matrix.dtype == np.float32
+        for row, text in zip(matrix, texts):
+            assert np.array_equal(row, np.asarray(service.embed_text(text), dtype=np.float32))
+        assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0, atol=1e-5)
+    
+    def test_embed_batch_matches_reference_formula(self):
+        """Vectorized engine reproduces the per-element LCG definition."""
+        import hashlib
+        service = get_embedding_service()
+        text = "Reference formula check"
+        
+        hash_int = int(hashlib.sha256(text.encode()).hexdigest(), 16)
+        reference = [
+            ((((hash_int + i) % (2**32)) * 1103515245 + 12345) % (2**31)) / (2**30) - 1.0
+            for i in range(service.embedding_dim)
+        ]
+        magnitude = sum(x * x for x in reference) ** 0.5
+        reference = [x / magnitude for x in reference]
+        
+        assert np.allclose(service.embed_text(text), reference, rtol=0, atol=1e-15)
+    
+    def test_embed_batch_error_on_empty(self):
+        """Any empty text in a batch is rejected."""
+        service = get_embedding_service()
+        
+        with pytest.raises(ValueError):
+            service.embed_batch(["ok", "  "])
+    
+    def test_backend_selection_from_env(self, monkeypatch, tmp_path):
+        """EMBEDDING_BACKEND picks the backend; local model dir is required."""
+        from services.embedding_service import create_embedding_service, EmbeddingService
+        
+        monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+        assert type(create_embedding_service()) is EmbeddingService
+        
+        monkeypatch.setenv("EMBEDDING_BACKEND", "sentence_transformers")
+        monkeypatch.setenv("EMBEDDING_MODEL_PATH", str(tmp_path / "missing-model"))
+        with pytest.raises(ValueError):
+            create_embedding_service()
+        
+        monkeypatch.setenv("EMBEDDING_BACKEND", "nope")
+        with pytest.raises(ValueError):
+            create_embedding_service()
+    
+    async def test_aembed_query_matches_sync(self):
+        """Async query embedding gives the same vector."""
+        service = get_embedding_service()
+        
+        assert await service.aembed_query("async query") == service.embed_query("async query")
+    
+    def test_langchain_embeddings_wrapper(self):
+        """LangChainEmbeddings delegates to the configured service."""
+        from vectorstore.embeddings import LangChainEmbeddings
+        service = get_embedding_service()
+        embeddings = LangChainEmbeddings(service)
+        
+        assert embeddings.embed_documents(["a doc"]) == service.embed_texts(["a doc"])
+        assert embeddings.embed_query("a query") == service.embed_query("a query")
+
+
+class _CountingEmbeddingService(EmbeddingService):
+    """Deterministic embeddings that record every text actually embedded."""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.embedded = []
+    
+    def _embed_matrix(self, texts):
+        self.embedded.extend(texts)
+        return super()._embed_matrix(texts)
+
+
+class TestEmbeddingCache:
+    """Test the content-addressed embedding cache."""
+    
+    def test_hits_skip_the_model(self):
+        """Repeated texts are served from memory and match the model output."""
+        from services.embedding_cache import CachedEmbeddingService
+        inner = _CountingEmbeddingService()
+        cache = CachedEmbeddingService(inner)
+        
+        first = cache.embed_batch(["chunk a", "chunk b", "chunk a"])
+        second = cache.embed_batch(["chunk b", "chunk a"])
+        
+        assert inner.embedded == ["chunk a", "chunk b"]
+        assert np.array_equal(first[0], first[2])
+        assert np.array_equal(second, first[[1, 0]])
+        assert np.array_equal(first, inner.embed_batch(["chunk a", "chunk b", "chunk a"]))
+        assert cache.embed_query("chunk a") == first[0].tolist()
+        
+        stats = cache.stats()
+        assert stats["misses"] == 2
+        assert stats["memory_hits"] == 3
+        assert cache.get_config()["cache"]["hit_rate"] == pytest.approx(0.6)
+        
+        inner.embedded.clear()
+        queries = cache.embed_queries(["chunk b", "a query"])
+        assert inner.embedded == ["a query"]
+        assert np.array_equal(queries, inner.embed_batch(["chunk b", "a query"]))
+    
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """A new cache instance reads vectors back from the memory-mapped store."""
+        from services.embedding_cache import CachedEmbeddingService
+        texts = [f"syllabus chunk {i}" for i in range(1500)]  # Forces the file to grow
+        
+        writer = CachedEmbeddingService(_CountingEmbeddingService(), cache_dir=str(tmp_path))
+        expected = writer.embed_batch(texts)
+        writer.close()
+        
+        inner = _CountingEmbeddingService()
+        reader = CachedEmbeddingService(inner, max_memory_entries=10, cache_dir=str(tmp_path))
+        
+        assert np.array_equal(reader.embed_batch(texts), expected)
+        assert inner.embedded == []
+        assert reader.stats()["disk_hits"] == len(texts)
+        assert reader.stats()["disk_entries"] == len(texts)
+        assert reader.stats()["memory_entries"] == 10
+    
+    def test_model_change_invalidates(self, tmp_path):
+        """Keys include the model config, so another model never hits."""
+        from services.embedding_cache import CachedEmbeddingService
+        CachedEmbeddingService(_CountingEmbeddingService(), cache_dir=str(tmp_path)).embed_text("title")
+        
+        inner = _CountingEmbeddingService(model_name="other-model")
+        cache = CachedEmbeddingService(inner, cache_dir=str(tmp_path))
+        cache.embed_text("title")
+        
+        assert inner.embedded == ["title"]
+        assert cache.stats()["disk_hits"] == 0
+    
+    def test_enabled_from_env(self, monkeypatch, tmp_path):
+        """EMBEDDING_CACHE_ENABLED=true wraps the configured backend."""
+        from services.embedding_cache import CachedEmbeddingService
+        from services.embedding_service import create_embedding_service
+        monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "true")
+        monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path))
+        
+        service = create_embedding_service()
+        
+        assert isinstance(service, CachedEmbeddingService)
+        assert service.embed_texts(["x y z"]) == service.embed_texts(["x y z"])
+        service.close()
+
+
+class TestMicroBatcher:
+    """Test coalescing of concurrent single-item embedding calls."""
+    
+    def test_waiting_items_form_one_batch(self):
+        """Items submitted while a batch runs are embedded together next."""
+        import threading
+        from utils.micro_batcher import MicroBatcher
+        
+        release = threading.Event()
+        batch_sizes = []
+        
+        def batch_fn(texts):
+            batch_sizes.append(len(texts))
+            release.wait(timeout=5)
+            return [text.upper() for text in texts]
+        
+        batcher = MicroBatcher(batch_fn, max_batch_size=16)
+        first = batcher.submit("first")
+        while not batch_sizes:
+            pass  # First batch is now blocked inside batch_fn
+        rest = [batcher.submit(f"q{i}") for i in range(10)]
+        release.set()
+        
+        assert first.result(timeout=5) == "FIRST"
+        assert [f.result(timeout=5) for f in rest] == [f"Q{i}" for i in range(10)]
+        assert batch_sizes == [1, 10]
+        assert batcher.stats()["largest_batch"] == 10
+        batcher.close()
+    
+    def test_batch_limits(self):
+        """Batches are capped by item count and total characters."""
+        import threading
+        from utils.micro_batcher import MicroBatcher
+        
+        release = threading.Event()
+        batch_sizes = []
+        
+        def batch_fn(texts):
+            batch_sizes.append(len(texts))
+            release.wait(timeout=5)
+            return texts
+        
+        batcher = MicroBatcher(batch_fn, max_batch_size=4, max_batch_chars=30)
+        blocker = batcher.submit("x")
+        while not batch_sizes:
+            pass
+        futures = [batcher.submit("s") for _ in range(6)] + [batcher.submit("L" * 20) for _ in range(2)]
+        release.set()
+        
+        blocker.result(timeout=5)
+        assert [f.result(timeout=5) for f in futures][-1] == "L" * 20
+        assert batch_sizes == [1, 4, 3, 1]
+        batcher.close()
+    
+    def test_submit_many_shares_batches_with_single_items(self):
+        """A request's queries join the items already waiting; sentence-transformers queries use it."""
+        import threading
+        from services.embedding_service import SentenceTransformerEmbeddingService
+        from utils.micro_batcher import MicroBatcher
+        
+        release = threading.Event()
+        batch_sizes = []
+        
+        def batch_fn(texts):
+            batch_sizes.append(len(texts))
+            release.wait(timeout=5)
+            return [text.upper() for text in texts]
+        
+        batcher = MicroBatcher(batch_fn, max_batch_size=16)
+        blocker = batcher.submit("x")
+        while not batch_sizes:
+            pass
+        single = batcher.submit("single")
+        many = batcher.submit_many(["q1", "q2", "q3"])
+        release.set()
+        
+        blocker.result(timeout=5)
+        assert single.result(timeout=5) == "SINGLE"
+        assert [f.result(timeout=5) for f in many] == ["Q1", "Q2", "Q3"]
+        assert batch_sizes == [1, 4]
+        batcher.close()
+        
+        # The model-backed service, minus the model: its batch function is the deterministic one
+        reference = get_embedding_service()
+        service = SentenceTransformerEmbeddingService.__new__(SentenceTransformerEmbeddingService)
+        service.embedding_dim = reference.embedding_dim
+        service.batcher = MicroBatcher(reference.embed_batch)
+        queries = ["course title", "first sentence"]
+        assert np.array_equal(service.embed_queries(queries), reference.embed_batch(queries))
+        assert service.batcher.stats()["items"] == 2
+        service.close()
+    
+    async def test_async_callers_share_batches(self):
+        """Concurrent coroutines are served by fewer, larger batches."""
+        import time
+        from utils.micro_batcher import MicroBatcher
+        service = get_embedding_service()
+        
+        def batch_fn(texts):
+            time.sleep(0.02)  # Simulated forward pass
+            return service.embed_batch(texts)
+        
+        batcher = MicroBatcher(batch_fn, max_batch_size=64, max_wait_ms=5)
+        queries = [f"query {i}" for i in range(20)]
+        vectors = await asyncio.gather(*(batcher.asubmit(q) for q in queries))
+        
+        for query, vector in zip(queries, vectors):
+            assert np.array_equal(vector, service.embed_batch([query])[0])
+        assert batcher.stats()["batches"] < len(queries)
+        batcher.close()
+    
+    def test_errors_propagate_to_every_caller(self):
+        """A failing batch fails each of its futures."""
+        from utils.micro_batcher import MicroBatcher
+        
+        def batch_fn(texts):
+            raise RuntimeError("model crashed")
+        
+        batcher = MicroBatcher(batch_fn)
+        future = batcher.submit("a")
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+        batcher.close()
+        with pytest.raises(RuntimeError):
+            batcher.submit("b")
 
 
 # ============================================================================
@@ -167,6 +449,49 @@ class TestVectorDocument:
         assert "document" in chroma_format
         assert "metadatas" in chroma_format
         assert chroma_format["metadatas"]["institution_name"] == "Test University"
+    
+    def test_vector_document_stable_id(self):
+        """Default ids are sha256 of source, chunk index and content, stable across processes."""
+        import subprocess
+        import sys
+        metadata = VectorDocumentMetadata(
+            institution_name="Test University",
+            degree_level="undergraduate",
+            subject_domain="computer_science",
+            audience_level="beginner",
+            depth_level="foundational",
+            source_type=SourceType.EXAMPLE,
+            uploaded_by=UploadedBy.SYSTEM,
+            source_name="algorithms.txt",
+        )
+        doc = VectorDocument(content="Sorting and searching. " * 20, metadata=metadata, chunk_index=2)
+        
+        assert doc.to_chroma_format()["id"] == doc.stable_id()
+        assert doc.stable_id() != VectorDocument(content=doc.content, metadata=metadata, chunk_index=3).stable_id()
+        
+        script = (
+            "from schemas.vector_document import *\n"
+            "m = VectorDocumentMetadata('Test University', 'undergraduate', 'computer_science', 'beginner',"
+            " 'foundational', SourceType.EXAMPLE, UploadedBy.SYSTEM, source_name='algorithms.txt')\n"
+            "print(VectorDocument(content='Sorting and searching. ' * 20, metadata=m, chunk_index=2).stable_id())"
+        )
+        other_process = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": "12345"},
+        ).stdout.strip()
+        assert other_process == doc.stable_id()
+        
+        # Same-named files in different folders: the path tells them apart
+        from dataclasses import replace
+        copies = [
+            VectorDocument(
+                content=doc.content,
+                metadata=replace(metadata, original_url=f"/courses/{folder}/algorithms.txt"),
+                chunk_index=2,
+            )
+            for folder in ("2023", "2024")
+        ]
+        assert copies[0].stable_id() != copies[1].stable_id()
 
 
 # ============================================================================
@@ -233,6 +558,105 @@ class TestVectorStore:
         results = self.store.similarity_search("test query")
         assert results == []
     
+    def test_upsert_skips_unchanged_chunks(self):
+        """Re-adding identical chunks neither re-embeds nor duplicates them."""
+        from services.vector_store import VectorStore
+        store = VectorStore(collection_name="upsert_test")
+        store.embedding_service = _CountingEmbeddingService()
+        store.initialize()
+        metadata = VectorDocumentMetadata(
+            institution_name="Test University",
+            degree_level="undergraduate",
+            subject_domain="computer_science",
+            audience_level="beginner",
+            depth_level="foundational",
+            source_type=SourceType.EXAMPLE,
+            uploaded_by=UploadedBy.SYSTEM,
+            source_name="networks.txt",
+        )
+        docs = [
+            VectorDocument(content=f"Network layer {i} routing and switching. " * 15, metadata=metadata, chunk_index=i)
+            for i in range(3)
+        ]
+        
+        assert store.upsert_documents(docs) == (3, 0)
+        embedded = len(store.embedding_service.embedded)
+        
+        changed = VectorDocument(content="Transport layer congestion control. " * 15, metadata=metadata, chunk_index=1)
+        assert store.upsert_documents(docs + [changed]) == (1, 3)
+        assert len(store.embedding_service.embedded) == embedded + 1
+        assert store.add_documents(docs) == 3
+        assert store.get_collection_stats()["document_count"] == 4
+        
+        explicit = VectorDocument(content=docs[0].content, metadata=metadata, document_id=docs[0].stable_id())
+        assert store.upsert_documents([explicit]) == (1, 0)
+    
+    def test_similarity_search_batch_matches_single(self, monkeypatch):
+        """Batched search returns one list per query, equal to single searches, embedded as queries."""
+        metadata = VectorDocumentMetadata(
+            institution_name="Test University",
+            degree_level="undergraduate",
+            subject_domain="computer_science",
+            audience_level="beginner",
+            depth_level="foundational",
+            source_type=SourceType.EXAMPLE,
+            uploaded_by=UploadedBy.SYSTEM,
+        )
+        self.store.add_documents([
+            VectorDocument(content="Neural networks and deep learning basics. " * 20, metadata=metadata),
+            VectorDocument(content="Relational databases and SQL queries. " * 20, metadata=metadata),
+        ])
+        queries = ["neural networks", "sql queries", "quantum chemistry"]
+        embedded = []
+        embed_queries = self.store.embedding_service.embed_queries
+        monkeypatch.setattr(
+            self.store.embedding_service, "embed_queries", lambda texts: embedded.append(list(texts)) or embed_queries(texts)
+        )
+        
+        batched = self.store.similarity_search_batch(queries, k=3)
+        
+        assert embedded == [queries]
+        assert len(batched) == len(queries)
+        assert batched == [self.store.similarity_search(q, k=3) for q in queries]
+        assert self.store.similarity_search_batch([]) == []
+    
+    def test_similarity_search_batch_single_collection_query(self):
+        """Chroma path embeds once and issues one query for all queries."""
+        class _FakeCollection:
+            def __init__(self):
+                self.calls = []
+            
+            def query(self, query_embeddings, n_results, where=None, include=None):
+                self.calls.append((query_embeddings, n_results, where))
+                rows = len(query_embeddings)
+                return {
+                    "documents": [[f"doc-{row}"] for row in range(rows)],
+                    "distances": [[0.25] for _ in range(rows)],
+                    "metadatas": [[{"row": row}] for row in range(rows)],
+                    "ids": [[f"id-{row}"] for row in range(rows)],
+                    "embeddings": [[[float(row), 1.0]] for row in range(rows)] if include and "embeddings" in include else None,
+                }
+        
+        collection = _FakeCollection()
+        self.store._has_chroma = True
+        self.store.collection = collection
+        
+        results = self.store.similarity_search_batch(
+            ["q1", "q2"], k=1, metadata_filters={"audience_level": "beginner"}
+        )
+        
+        assert len(collection.calls) == 1
+        embeddings, n_results, where = collection.calls[0]
+        assert embeddings.shape == (2, self.store.embedding_service.embedding_dim)
+        assert where == {"audience_level": {"$eq": "beginner"}}
+        assert [r[0]["document_id"] for r in results] == ["id-0", "id-1"]
+        assert results[1][0]["similarity_score"] == pytest.approx(0.75)
+        assert "embedding" not in results[0][0]
+        
+        results = self.store.similarity_search_batch(["q1", "q2"], k=1, include_embeddings=True)
+        assert len(collection.calls) == 2
+        assert results[1][0]["embedding"].tolist() == [1.0, 1.0]
+    
     def test_similarity_search_with_results(self):
         """Search returns relevant documents."""
         # Add test documents
@@ -348,6 +772,732 @@ class TestVectorStore:
         assert stats_after["document_count"] == 0
 
 
+class TestPartitionedVectorStore:
+    """Test metadata-partitioned collections."""
+    
+    LEVELS = ("beginner", "advanced")
+    DOMAINS = ("computer_science", "business", "healthcare")
+    
+    @classmethod
+    def _docs(cls, per_partition=4):
+        docs = []
+        for level in cls.LEVELS:
+            for domain in cls.DOMAINS:
+                metadata = VectorDocumentMetadata(
+                    institution_name="Test University",
+                    degree_level="undergraduate",
+                    subject_domain=domain,
+                    audience_level=level,
+                    depth_level="foundational",
+                    source_type=SourceType.EXAMPLE,
+                    uploaded_by=UploadedBy.SYSTEM,
+                    source_name=f"{level}-{domain}",
+                )
+                docs.extend(
+                    VectorDocument(
+                        content=f"{domain} lesson {i} for {level} learners covers topic {i}. " * 8,
+                        metadata=metadata,
+                        chunk_index=i,
+                    )
+                    for i in range(per_partition)
+                )
+        return docs
+    
+    @staticmethod
+    def _store(monkeypatch, tmp_path, partition_keys, name, **env):
+        from services.vector_store import VectorStore
+        monkeypatch.setenv("VECTOR_STORE_BACKEND", "numpy")
+        monkeypatch.setenv("VECTOR_STORE_PARTITION_KEYS", partition_keys)
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        store = VectorStore(persist_directory=str(tmp_path), collection_name=name)
+        assert store.initialize()
+        return store
+    
+    def test_filtered_search_scans_one_partition(self, monkeypatch, tmp_path):
+        """Pinned filters search only the matching partition, with flat-store results."""
+        partitioned = self._store(monkeypatch, tmp_path, "audience_level,subject_domain", "partitioned")
+        flat = self._store(monkeypatch, tmp_path, "", "flat")
+        docs = self._docs()
+        partitioned.add_documents(docs)
+        flat.add_documents(docs)
+        
+        stats = partitioned.get_collection_stats()
+        assert stats["document_count"] == len(docs)
+        assert len(stats["partitions"]) == len(self.LEVELS) * len(self.DOMAINS)
+        
+        scanned = []
+        for values, child in partitioned.index.partitions.values():
+            original = child.search_records
+            child.search_records = lambda *args, _values=values, _search=original: scanned.append(_values) or _search(*args)
+        
+        filters = {"audience_level": "beginner", "subject_domain": "business"}
+        queries = ["business lesson 2", "topic 3 for beginner learners"]
+        results = partitioned.similarity_search_batch(queries, k=3, metadata_filters=filters)
+        expected = flat.similarity_search_batch(queries, k=3, metadata_filters=filters)
+        
+        assert scanned == [filters]
+        assert [[r["document_id"] for r in rows] for rows in results] == [[r["document_id"] for r in rows] for rows in expected]
+        assert all(r["metadata"]["subject_domain"] == "business" for rows in results for r in rows)
+    
+    def test_open_filters_merge_across_partitions(self, monkeypatch, tmp_path):
+        """Filters that leave a partition key open merge the matching partitions' top-k."""
+        partitioned = self._store(monkeypatch, tmp_path, "audience_level,subject_domain", "partitioned")
+        flat = self._store(monkeypatch, tmp_path, "", "flat")
+        docs = self._docs()
+        partitioned.add_documents(docs)
+        flat.add_documents(docs)
+        
+        for filters in ({"audience_level": "advanced"}, {"depth_level": "foundational"}, None):
+            got = partitioned.similarity_search("healthcare lesson 1 for advanced learners", k=5, metadata_filters=filters)
+            want = flat.similarity_search("healthcare lesson 1 for advanced learners", k=5, metadata_filters=filters)
+            assert [r["document_id"] for r in got] == [r["document_id"] for r in want]
+            assert [r["similarity_score"] for r in got] == pytest.approx([r["similarity_score"] for r in want])
+    
+    def test_changed_metadata_moves_document(self, monkeypatch, tmp_path):
+        """Re-writing an id with new partition values leaves no copy behind."""
+        store = self._store(monkeypatch, tmp_path, "audience_level,subject_domain", "partitioned")
+        doc = self._docs(per_partition=1)[0]
+        store.upsert_documents([doc])
+        
+        doc.document_id = doc.stable_id()
+        doc.metadata.audience_level = "advanced"
+        store.upsert_documents([doc])
+        
+        assert store.get_collection_stats()["document_count"] == 1
+        assert store.similarity_search(doc.content, k=5, metadata_filters={"audience_level": "beginner"}) == []
+        assert store.delete_documents([doc.document_id]) == 1
+    
+    def test_segment_partitions_are_shared(self, monkeypatch, tmp_path):
+        """A second store over the same segments sees partitions created by the first."""
+        writer = self._store(monkeypatch, tmp_path, "audience_level,subject_domain", "shared", VECTOR_STORE_FORMAT="segments")
+        reader = self._store(monkeypatch, tmp_path, "audience_level,subject_domain", "shared", VECTOR_STORE_FORMAT="segments")
+        docs = self._docs(per_partition=2)
+        
+        writer.add_documents(docs)
+        
+        assert reader.get_collection_stats()["document_count"] == len(docs)
+        hits = reader.similarity_search(docs[0].content, k=1, metadata_filters={"audience_level": "beginner", "subject_domain": "computer_science"})
+        assert hits[0]["document_id"] == docs[0].stable_id()
+
+    @pytest.mark.parametrize("index_format", ["npy", "segments"])
+    def test_unpartitioned_collection_migrates_on_open(self, monkeypatch, tmp_path, index_format):
+        """A store written before partitioning moves into the partitions; re-ingesting adds no copies."""
+        env = {"VECTOR_STORE_FORMAT": index_format, "VECTOR_STORE_PERSIST": "true"}
+        flat = self._store(monkeypatch, tmp_path, "", "existing", **env)
+        docs = self._docs(per_partition=2)
+        for i, doc in enumerate(docs):
+            doc.document_id = f"doc_{i}_salted"  # Ids from before content hashing
+        flat.add_documents(docs)
+
+        store = self._store(monkeypatch, tmp_path, "audience_level,subject_domain", "existing", **env)
+        assert store.index.legacy is None
+        assert not os.path.exists(store.index_directory)
+        assert store.get_collection_stats()["document_count"] == len(docs)
+
+        for doc in docs:
+            doc.document_id = None
+        assert store.upsert_documents(docs) == (0, len(docs))
+
+        reopened = self._store(monkeypatch, tmp_path, "audience_level,subject_domain", "existing", **env)
+        assert reopened.get_collection_stats()["document_count"] == len(docs)
+        hits = reopened.similarity_search(docs[0].content, k=3)
+        assert hits[0]["document_id"] == docs[0].stable_id()
+        assert len({hit["content"] for hit in hits}) == len(hits)
+
+    
+    @pytest.mark.parametrize("partition_keys,index_format", [
+        ("", "npy"), ("", "segments"), ("audience_level,subject_domain", "npy"),
+        ("audience_level,subject_domain", "segments"),
+    ])
+    def test_get_embeddings(self, monkeypatch, tmp_path, partition_keys, index_format):
+        """Stored vectors come back by id from every index layout; unknown ids are skipped."""
+        store = self._store(monkeypatch, tmp_path, partition_keys, "vectors", VECTOR_STORE_FORMAT=index_format)
+        docs = self._docs(per_partition=2)
+        store.add_documents(docs)
+        ids = [doc.stable_id() for doc in docs[:5]]
+        
+        vectors = store.get_embeddings(ids + ["missing"])
+        assert set(vectors) == set(ids)
+        expected = store.embedding_service.embed_batch([doc.content for doc in docs[:5]])
+        for doc_id, vector in zip(ids, np.asarray(expected, dtype=np.float32)):
+            assert np.allclose(vectors[doc_id], vector / np.linalg.norm(vector), atol=1e-5)
+        
+        hits = store.similarity_search_batch([docs[0].content], k=4, include_embeddings=True)[0]
+        assert all(np.allclose(hit["embedding"], store.get_embeddings([hit["document_id"]])[hit["document_id"]]) for hit in hits)
+        assert "embedding" not in store.similarity_search(docs[0].content, k=1)[0]
+
+
+class TestMetadataIndex:
+    """Test the metadata bitmap index and filter expressions."""
+    
+    EXPRESSIONS = [
+        {"source_type": "syllabus"},
+        {"source_type": "syllabus", "degree_level": "graduate"},
+        {"session_id": {"$in": ["s1", "s3"]}},
+        {"session_id": {"$ne": "s1"}},
+        {"degree_level": {"$nin": ["graduate", "phd"]}, "source_type": {"$eq": "example"}},
+        {"$or": [{"institution_name": "MIT"}, {"session_id": "s2"}]},
+        {"$and": [{"$or": [{"degree_level": "phd"}, {"source_type": "syllabus"}]}, {"institution_name": {"$ne": "MIT"}}]},
+        {"institution_name": "nowhere"},
+    ]
+    
+    @staticmethod
+    def _metadatas(n, seed=3):
+        rng = np.random.default_rng(seed)
+        metadatas = []
+        for i in range(n):
+            meta = {
+                "institution_name": ["MIT", "Stanford", "ETH"][rng.integers(3)],
+                "degree_level": ["undergraduate", "graduate", "phd"][rng.integers(3)],
+                "source_type": ["syllabus", "example", "guideline"][rng.integers(3)],
+            }
+            if i % 3:
+                meta["session_id"] = f"s{rng.integers(4)}"
+            metadatas.append(meta)
+        return metadatas
+    
+    @classmethod
+    def _matches(cls, meta, expression):
+        """Reference evaluator: one metadata dict against an expression."""
+        for key, condition in expression.items():
+            if key == "$and":
+                ok = all(cls._matches(meta, e) for e in condition)
+            elif key == "$or":
+                ok = any(cls._matches(meta, e) for e in condition)
+            elif isinstance(condition, dict):
+                value = meta.get(key)
+                ok = key in meta and all(
+                    {"$eq": value == operand, "$ne": value != operand,
+                     "$in": value in operand, "$nin": value not in operand}[op]
+                    for op, operand in condition.items()
+                )
+            else:
+                ok = meta.get(key) == condition
+            if not ok:
+                return False
+        return True
+    
+    def _expected(self, metadatas, expression):
+        return [row for row, meta in enumerate(metadatas) if self._matches(meta, expression)]
+    
+    def test_expressions_match_reference(self):
+        """Candidates equal a row-by-row evaluation for every operator."""
+        from services.metadata_index import MetadataIndex
+        metadatas = self._metadatas(500)
+        index = MetadataIndex.build(metadatas)
+        
+        assert index.candidates(None) is None
+        for expression in self.EXPRESSIONS:
+            assert index.candidates(expression).tolist() == self._expected(metadatas, expression)
+        assert index.candidates({"source_type": "syllabus"}, size=100).tolist() == self._expected(metadatas[:100], {"source_type": "syllabus"})
+        with pytest.raises(ValueError):
+            index.candidates({"chunk_index": {"$gt": 3}})
+    
+    def test_replace_and_delete_keep_index_consistent(self):
+        """Incremental maintenance gives the same postings as a rebuild."""
+        from services.metadata_index import MetadataIndex
+        metadatas = self._metadatas(300)
+        index = MetadataIndex.build(metadatas)
+        
+        for row in (5, 17, 250):
+            replacement = dict(metadatas[row], source_type="syllabus", session_id="s9")
+            index.replace(row, metadatas[row], replacement)
+            metadatas[row] = replacement
+        dropped = [0, 17, 18, 299]
+        index.delete_rows(dropped)
+        metadatas = [meta for row, meta in enumerate(metadatas) if row not in dropped]
+        
+        assert len(index) == len(metadatas)
+        for expression in self.EXPRESSIONS + [{"session_id": "s9"}]:
+            assert index.candidates(expression).tolist() == self._expected(metadatas, expression)
+    
+    def test_vector_indexes_prefilter_with_expressions(self, tmp_path):
+        """Flat, IVF and segmented search score only rows matching the expression."""
+        from services.vector_index import NumpyVectorIndex
+        from services.vector_segments import SegmentedVectorIndex
+        n, dim = 1200, 16
+        metadatas = self._metadatas(n)
+        vectors = np.random.default_rng(5).standard_normal((n, dim)).astype(np.float32)
+        ids = [f"doc-{i}" for i in range(n)]
+        texts = [f"text {i}" for i in range(n)]
+        flat = NumpyVectorIndex(dim, ivf_threshold=0)
+        ivf = NumpyVectorIndex(dim, ivf_threshold=n, nprobe=10_000)  # Probe every list: exact
+        segmented = SegmentedVectorIndex(str(tmp_path), dim, max_segment_rows=500)
+        for index in (flat, ivf, segmented):
+            index.add(ids, vectors, texts, metadatas)
+        segmented.add(ids[:1], vectors[:1], texts[:1], [dict(metadatas[0], institution_name="MIT", session_id="s2")])
+        metadatas[0] = dict(metadatas[0], institution_name="MIT", session_id="s2")
+        flat.add(ids[:1], vectors[:1], texts[:1], metadatas[:1])
+        ivf.add(ids[:1], vectors[:1], texts[:1], metadatas[:1])
+        assert ivf.is_ivf
+        
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = vectors[:3] + 0.3
+        for expression in self.EXPRESSIONS:
+            allowed = np.array(self._expected(metadatas, expression), dtype=np.int64)
+            for index in (flat, ivf, segmented):
+                for query, hits in zip(queries, index.search(queries, k=5, metadata_filters=expression)):
+                    scores = unit[allowed] @ (query / np.linalg.norm(query))
+                    expected = [ids[row] for row in allowed[np.argsort(-scores)[:5]]]
+                    assert [index.get(row)[0] for row, _ in hits] == expected
+    
+    def test_chroma_where_translation(self):
+        """Shorthand expressions expand to Chroma's one-field-per-clause form."""
+        from services.metadata_index import to_chroma_where
+        assert to_chroma_where(None) is None
+        assert to_chroma_where({"audience_level": "beginner"}) == {"audience_level": {"$eq": "beginner"}}
+        assert to_chroma_where({"a": "x", "b": {"$in": ["y", "z"]}}) == {
+            "$and": [{"a": {"$eq": "x"}}, {"b": {"$in": ["y", "z"]}}]
+        }
+        assert to_chroma_where({"$or": [{"a": "x"}, {"b": "y", "c": {"$ne": "z"}}]}) == {
+            "$or": [{"a": {"$eq": "x"}}, {"$and": [{"b": {"$eq": "y"}}, {"c": {"$ne": "z"}}]}]
+        }
+        assert to_chroma_where({"$and": [{"a": "x"}]}) == {"a": {"$eq": "x"}}
+    
+    def test_partitions_route_in_filters(self, monkeypatch, tmp_path):
+        """An $in on a partition key searches just those partitions."""
+        from services.vector_store import VectorStore
+        monkeypatch.setenv("VECTOR_STORE_BACKEND", "numpy")
+        store = VectorStore(persist_directory=str(tmp_path), collection_name="routed")
+        store.initialize()
+        store.add_documents(TestPartitionedVectorStore._docs(per_partition=2))
+        
+        scanned = []
+        for values, child in store.index.partitions.values():
+            original = child.search_records
+            child.search_records = lambda *args, _values=values, _search=original: scanned.append((_values, args[2])) or _search(*args)
+        filters = {"subject_domain": {"$in": ["business", "healthcare"]}, "audience_level": "advanced", "depth_level": "foundational"}
+        results = store.similarity_search("business lesson 1", k=10, metadata_filters=filters)
+        
+        assert sorted(values["subject_domain"] for values, _ in scanned) == ["business", "healthcare"]
+        assert all(residual == {"depth_level": "foundational"} for _, residual in scanned)
+        assert len(results) == 4
+        assert {r["metadata"]["subject_domain"] for r in results} == {"business", "healthcare"}
+
+
+class TestNumpyVectorIndex:
+    """Test the in-process NumPy vector index."""
+    
+    @staticmethod
+    def _random_index(n=2000, dim=32, **kwargs):
+        from services.vector_index import NumpyVectorIndex
+        rng = np.random.default_rng(7)
+        vectors = rng.standard_normal((n, dim)).astype(np.float32)
+        index = NumpyVectorIndex(dim, **kwargs)
+        index.add(
+            [f"doc-{i}" for i in range(n)],
+            vectors,
+            [f"text {i}" for i in range(n)],
+            [{"level": ["beginner", "advanced"][i % 2]} for i in range(n)],
+        )
+        return index, vectors
+    
+    def test_exact_top_k_matches_brute_force(self):
+        """Flat search returns the true cosine top-k, best first."""
+        index, vectors = self._random_index(ivf_threshold=0)
+        queries = vectors[:4] + 0.1
+        
+        results = index.search(queries, k=5)
+        
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        for query, hits in zip(queries, results):
+            scores = unit @ (query / np.linalg.norm(query))
+            assert [row for row, _ in hits] == list(np.argsort(-scores)[:5])
+            assert [score for _, score in hits] == sorted((s for _, s in hits), reverse=True)
+    
+    def test_metadata_filter_and_upsert(self):
+        """Filters restrict candidates; re-adding an id replaces its row."""
+        index, vectors = self._random_index(n=100, ivf_threshold=0)
+        
+        hits = index.search(vectors[1:2], k=10, metadata_filters={"level": "advanced"})[0]
+        assert hits[0][0] == 1
+        assert all(index.metadatas[row]["level"] == "advanced" for row, _ in hits)
+        
+        index.add(["doc-1"], vectors[2:3], ["replaced"], [{"level": "beginner"}])
+        assert len(index) == 100
+        assert index.get(1) == ("doc-1", "replaced", {"level": "beginner"})
+    
+    def test_delete_compacts_rows(self):
+        """Deleted ids disappear from search; remaining rows stay addressable."""
+        index, vectors = self._random_index(n=100, ivf_threshold=0)
+        
+        assert index.delete(["doc-3", "doc-50", "missing"]) == 2
+        assert len(index) == 98
+        assert index.existing_ids(["doc-3", "doc-4"]) == {"doc-4"}
+        
+        row, _ = index.search(vectors[4:5], k=1)[0][0]
+        assert index.get(row)[0] == "doc-4"
+        assert all(index.get(r)[0] != "doc-50" for r, _ in index.search(vectors[50:51], k=5)[0])
+    
+    def test_ivf_recall(self):
+        """IVF search finds near-duplicate vectors after automatic training."""
+        index, vectors = self._random_index(n=3000, ivf_threshold=3000, nprobe=16)
+        assert index.is_ivf
+        
+        queries = vectors[:50] * 1.01
+        top1 = [hits[0][0] for hits in index.search(queries, k=1)]
+        
+        assert sum(row == i for i, row in enumerate(top1)) >= 48
+    
+    def test_save_load_mmap_and_append(self, tmp_path):
+        """Saved index reloads memory-mapped and accepts further appends."""
+        from services.vector_index import NumpyVectorIndex
+        index, vectors = self._random_index(n=500, ivf_threshold=0)
+        index.save(str(tmp_path))
+        
+        loaded = NumpyVectorIndex.load(str(tmp_path))
+        assert isinstance(loaded._vectors, np.memmap)
+        assert loaded.search(vectors[:3], k=3) == index.search(vectors[:3], k=3)
+        
+        loaded.add(["extra"], vectors[:1] * -1, ["extra text"], [{}])
+        assert len(loaded) == 501
+        assert loaded.get(loaded.search(-vectors[:1], k=1)[0][0][0])[0] == "extra"
+        assert len(NumpyVectorIndex.load(str(tmp_path))) == 500  # File untouched
+    
+    def test_vector_store_persists_numpy_backend(self, monkeypatch, tmp_path):
+        """VECTOR_STORE_PERSIST=true reloads documents in a new store."""
+        from services.vector_store import VectorStore
+        monkeypatch.setenv("VECTOR_STORE_BACKEND", "numpy")
+        monkeypatch.setenv("VECTOR_STORE_PERSIST", "true")
+        metadata = VectorDocumentMetadata(
+            institution_name="Test University",
+            degree_level="undergraduate",
+            subject_domain="computer_science",
+            audience_level="beginner",
+            depth_level="foundational",
+            source_type=SourceType.EXAMPLE,
+            uploaded_by=UploadedBy.SYSTEM,
+        )
+        
+        store = VectorStore(persist_directory=str(tmp_path), collection_name="persisted")
+        store.initialize()
+        store.add_documents([VectorDocument(content="Graph algorithms and search. " * 20, metadata=metadata)])
+        
+        reopened = VectorStore(persist_directory=str(tmp_path), collection_name="persisted")
+        reopened.initialize()
+        
+        assert reopened.get_collection_stats()["document_count"] == 1
+        hit = reopened.similarity_search("Graph algorithms and search. " * 20, k=1)[0]
+        assert hit["similarity_score"] == pytest.approx(1.0, abs=1e-5)
+        
+        reopened.delete_collection()
+        assert not (tmp_path / "persisted.npindex").exists()
+
+    
+    def test_search_records_consistent_under_concurrent_deletes(self):
+        """Hits resolve to the documents that were scored while deletes renumber rows."""
+        import threading
+        index, vectors = self._random_index(n=400)
+        stop = threading.Event()
+        
+        def churn():
+            while not stop.is_set():
+                index.delete([f"doc-{i}" for i in range(0, 400, 7)])
+                index.add(
+                    [f"doc-{i}" for i in range(0, 400, 7)],
+                    vectors[0:400:7],
+                    [f"text {i}" for i in range(0, 400, 7)],
+                    [{"level": "beginner"} for _ in range(0, 400, 7)],
+                )
+        
+        writer = threading.Thread(target=churn)
+        writer.start()
+        try:
+            for i in range(300):
+                for (doc_id, document, _), _ in index.search_records(vectors[i % 400:i % 400 + 1], k=5)[0]:
+                    assert document == "text " + doc_id.split("-")[1]
+        finally:
+            stop.set()
+            writer.join()
+
+
+class TestSegmentedVectorIndex:
+    """Test memory-mapped, append-only vector segments."""
+    
+    @staticmethod
+    def _rows(start, stop, dim=16):
+        rng = np.random.default_rng(start)
+        vectors = rng.standard_normal((stop - start, dim)).astype(np.float32)
+        ids = [f"doc-{i}" for i in range(start, stop)]
+        documents = [f"text {i}" for i in range(start, stop)]
+        metadatas = [{"level": ["beginner", "advanced"][i % 2]} for i in range(start, stop)]
+        return ids, vectors, documents, metadatas
+    
+    def test_search_matches_flat_index_across_segments(self, tmp_path):
+        """Results equal the in-memory flat index, spanning several segments."""
+        from services.vector_index import NumpyVectorIndex
+        from services.vector_segments import SegmentedVectorIndex
+        segmented = SegmentedVectorIndex(str(tmp_path), 16, max_segment_rows=300)
+        flat = NumpyVectorIndex(16, ivf_threshold=0)
+        for batch in (self._rows(0, 500), self._rows(500, 1000)):
+            segmented.add(*batch)
+            flat.add(*batch)
+        queries = self._rows(0, 3)[1] + 0.2
+        
+        assert len(segmented._segments) == 4
+        for filters in (None, {"level": "advanced"}):
+            expected = flat.search(queries, k=5, metadata_filters=filters)
+            actual = segmented.search(queries, k=5, metadata_filters=filters)
+            assert [[row for row, _ in hits] for hits in actual] == [[row for row, _ in hits] for hits in expected]
+        assert segmented.get(777) == ("doc-777", "text 777", {"level": "advanced"})
+    
+    def test_open_reads_manifest_only_and_sees_new_rows(self, tmp_path):
+        """Reopening maps nothing up front; readers pick up later appends."""
+        from services.vector_segments import SegmentedVectorIndex
+        writer = SegmentedVectorIndex(str(tmp_path), 16)
+        writer.add(*self._rows(0, 200))
+        
+        reader = SegmentedVectorIndex(str(tmp_path), 16)
+        assert len(reader) == 200
+        assert all(not segment._maps for segment in reader._segments)
+        
+        ids, vectors, documents, metadatas = self._rows(200, 201)
+        writer.add(ids, vectors, documents, metadatas)
+        assert reader.search(vectors, k=1)[0][0][0] == 200
+        assert isinstance(reader._segments[0].vectors(), np.memmap)
+    
+    def test_replace_and_delete_tombstone_rows(self, tmp_path):
+        """Re-adding an id hides the old row; delete hides it entirely."""
+        from services.vector_segments import SegmentedVectorIndex
+        index = SegmentedVectorIndex(str(tmp_path), 16)
+        ids, vectors, documents, metadatas = self._rows(0, 10)
+        index.add(ids, vectors, documents, metadatas)
+        
+        index.add(["doc-3"], -vectors[3:4], ["new text"], [{}])
+        hits = index.search(vectors[3:4], k=10)[0]
+        assert len(index) == 10
+        assert 3 not in [row for row, _ in hits]
+        assert index.get(index.search(-vectors[3:4], k=1)[0][0][0])[1] == "new text"
+        
+        assert index.delete(["doc-3", "missing"]) == 1
+        assert len(SegmentedVectorIndex(str(tmp_path), 16)) == 9
+    
+    def test_lookups_and_filters_use_stored_indexes(self, tmp_path, monkeypatch):
+        """A fresh reader resolves ids and filters without decoding every row's id or metadata."""
+        from services.vector_segments import SegmentedVectorIndex, _Segment
+        writer = SegmentedVectorIndex(str(tmp_path), 16, max_segment_rows=300)
+        writer.add(*self._rows(0, 400))
+        writer.add(*self._rows(400, 1000))
+        writer.delete(["doc-5"])
+        
+        decoded = []
+        original = _Segment.string
+        monkeypatch.setattr(_Segment, "string", lambda segment, column, row: decoded.append(column) or original(segment, column, row))
+        reader = SegmentedVectorIndex(str(tmp_path), 16)
+        
+        assert reader.existing_ids(["doc-4", "doc-5", "doc-999", "missing"]) == {"doc-4", "doc-999"}
+        assert set(reader.get_vectors(["doc-700"])) == {"doc-700"}
+        hits = reader.search(self._rows(0, 1)[1], k=1000, metadata_filters={"level": {"$in": ["beginner"]}})[0]
+        assert decoded.count("metadata") == 0 and decoded.count("ids") <= 4
+        assert sorted(row for row, _ in hits) == list(range(0, 1000, 2))
+    
+    def test_segments_without_stored_indexes_are_indexed_by_next_writer(self, tmp_path):
+        """Collections written before ids/postings were stored still work and get indexed on write."""
+        import json
+        from services.vector_segments import SegmentedVectorIndex
+        index = SegmentedVectorIndex(str(tmp_path), 16, max_segment_rows=300)
+        index.add(*self._rows(0, 500))
+        manifest_path = tmp_path / "manifest.json"
+        manifest = json.loads(manifest_path.read_text())
+        for entry in manifest["segments"]:  # As written before this format change
+            del entry["indexed"], entry["runs"]
+        manifest_path.write_text(json.dumps(manifest))
+        for suffix in ("ids.hash", "terms.json", "postings.i32", "runs.i64"):
+            for path in tmp_path.glob(f"seg-*.{suffix}"):
+                path.unlink()
+        queries = self._rows(0, 3)[1] + 0.2
+        
+        legacy = SegmentedVectorIndex(str(tmp_path), 16)
+        expected = legacy.search(queries, k=5, metadata_filters={"level": "advanced"})
+        assert legacy.existing_ids(["doc-1", "doc-499"]) == {"doc-1", "doc-499"}
+        
+        legacy.add(*self._rows(500, 510))
+        assert all(entry["indexed"] == entry["rows"] for entry in json.loads(manifest_path.read_text())["segments"])
+        reopened = SegmentedVectorIndex(str(tmp_path), 16)
+        assert reopened.search(queries, k=5, metadata_filters={"level": "advanced"}) == expected
+        assert legacy.search(queries, k=5, metadata_filters={"level": "advanced"}) == expected
+        assert reopened.existing_ids(["doc-1", "doc-505"]) == {"doc-1", "doc-505"}
+    
+    def test_unpublished_bytes_are_ignored(self, tmp_path):
+        """Bytes a crashed writer appended past the manifest are discarded."""
+        from services.vector_segments import SegmentedVectorIndex
+        index = SegmentedVectorIndex(str(tmp_path), 16)
+        index.add(*self._rows(0, 5))
+        with open(tmp_path / "seg-00000.vectors.f32", "ab") as handle:
+            handle.write(b"\x00" * 100)  # Partial row, never published
+        
+        reopened = SegmentedVectorIndex(str(tmp_path), 16)
+        ids, vectors, documents, metadatas = self._rows(5, 6)
+        reopened.add(ids, vectors, documents, metadatas)
+        
+        assert reopened.search(vectors, k=1)[0][0][0] == 5
+        assert reopened.get(5)[0] == "doc-5"
+    
+    def test_vector_store_segments_format(self, monkeypatch, tmp_path):
+        """VECTOR_STORE_FORMAT=segments persists without explicit saves."""
+        from services.vector_store import VectorStore
+        monkeypatch.setenv("VECTOR_STORE_BACKEND", "numpy")
+        monkeypatch.setenv("VECTOR_STORE_FORMAT", "segments")
+        metadata = VectorDocumentMetadata(
+            institution_name="Test University",
+            degree_level="undergraduate",
+            subject_domain="computer_science",
+            audience_level="beginner",
+            depth_level="foundational",
+            source_type=SourceType.EXAMPLE,
+            uploaded_by=UploadedBy.SYSTEM,
+        )
+        store = VectorStore(persist_directory=str(tmp_path), collection_name="segmented")
+        store.initialize()
+        store.add_documents([VectorDocument(content="Operating systems and processes. " * 20, metadata=metadata)])
+        
+        reopened = VectorStore(persist_directory=str(tmp_path), collection_name="segmented")
+        reopened.initialize()
+        
+        stats = reopened.get_collection_stats()
+        assert stats["document_count"] == 1
+        assert stats["storage_type"] == "segments"
+        assert reopened.similarity_search("Operating systems and processes. " * 20, k=1)[0]["metadata"]["audience_level"] == "beginner"
+
+
+class TestKeywordIndex:
+    """Test the BM25 keyword index."""
+    
+    @staticmethod
+    def _doc(text, source_name, **metadata):
+        fields = dict(
+            institution_name="Test University",
+            degree_level="undergraduate",
+            subject_domain="computer_science",
+            audience_level="beginner",
+            depth_level="foundational",
+            source_type=SourceType.SYLLABUS,
+            uploaded_by=UploadedBy.SYSTEM,
+            source_name=source_name,
+        )
+        fields.update(metadata)
+        return VectorDocument(content=text, metadata=VectorDocumentMetadata(**fields))
+    
+    def test_bm25_ranking_upsert_and_delete(self, tmp_path):
+        """Rare query terms rank first; upserts replace and deletes remove chunks."""
+        from services.keyword_index import KeywordIndex
+        index = KeywordIndex(str(tmp_path / "bm25.sqlite3"))
+        filler = "Students practise problem solving through weekly exercises and projects. " * 6
+        docs = [
+            self._doc(filler + "Containers are orchestrated with Kubernetes clusters.", "devops"),
+            self._doc(filler + "Recursion and dynamic programming in Python.", "algorithms"),
+            self._doc(filler + "Relational databases and SQL joins.", "databases"),
+        ]
+        assert index.upsert_documents(docs) == 3
+        assert index.upsert_documents(docs) == 3  # Idempotent
+        
+        assert len(index) == 3
+        hits = index.search("Introduction to Kubernetes", k=3)
+        assert [hit["document_id"] for hit in hits] == [docs[0].stable_id()]
+        assert hits[0]["keyword_score"] > 0 and hits[0]["metadata"]["source_name"] == "devops"
+        assert index.search("quantum chemistry", k=3) == []
+        assert len(index.search("and the", k=3)) == 3  # Stopword-only query: searched as is
+        assert index.search("", k=3) == []
+        assert index.search('"; DROP TABLE chunks; -- python*', k=3)[0]["document_id"] == docs[1].stable_id()
+        
+        replaced = docs[2]
+        replaced.document_id = replaced.stable_id()
+        replaced.content = filler + "Graph databases and Cypher queries."
+        index.upsert_documents([replaced])
+        assert index.search("SQL joins", k=3) == []
+        assert index.search("Cypher", k=3)[0]["document_id"] == replaced.document_id
+        
+        assert index.delete_documents([docs[0].stable_id(), "missing"]) == 1
+        assert index.existing_ids([docs[0].stable_id(), docs[1].stable_id()]) == {docs[1].stable_id()}
+        assert KeywordIndex(str(tmp_path / "bm25.sqlite3")).search("python", k=1)  # Persisted
+    
+    def test_filters_page_through_ranked_hits(self, tmp_path):
+        """Filters keep k matching hits even when most top-ranked hits fail them."""
+        from services.keyword_index import KeywordIndex
+        index = KeywordIndex(str(tmp_path / "bm25.sqlite3"))
+        filler = "Course notes for weekly lectures, labs and assessed coursework. " * 6
+        docs = [
+            self._doc(filler + "Python " * (10 - i % 10), f"course-{i}", audience_level="advanced" if i % 40 else "beginner")
+            for i in range(200)
+        ]
+        index.upsert_documents(docs)
+        
+        hits = index.search("python", k=5, metadata_filters={"audience_level": "beginner"})
+        assert len(hits) == 5
+        assert all(hit["metadata"]["audience_level"] == "beginner" for hit in hits)
+        either = index.search("python", k=10, metadata_filters={"$or": [{"source_name": "course-1"}, {"source_name": {"$in": ["course-2", "course-3"]}}]})
+        assert sorted(hit["metadata"]["source_name"] for hit in either) == ["course-1", "course-2", "course-3"]
+        
+        docs[1].metadata.audience_level = "beginner"  # Metadata-only change re-indexes the filter fields
+        index.upsert_documents([docs[1]])
+        assert docs[1].stable_id() in {hit["document_id"] for hit in index.search("python", k=10, metadata_filters={"audience_level": "beginner"})}
+    
+    def test_selective_filters_on_large_corpus(self, tmp_path):
+        """Selective filters run inside the ranked query: fast, and equal to filtering the full ranking."""
+        from services.keyword_index import KeywordIndex
+        from services.metadata_index import MetadataIndex
+        path = str(tmp_path / "bm25.sqlite3")
+        index = KeywordIndex(path)
+        rng = np.random.default_rng(0)
+        vocabulary = "introduction python programming data structures course module lesson learners design".split()
+        docs = [
+            self._doc(
+                f"Lesson {i} covers " + " ".join(rng.choice(vocabulary, 60)),
+                f"course-{i % 50}",
+                subject_domain="cs" if i % 1000 == 0 else "other",
+                audience_level="beginner" if i % 3 else "advanced",
+            )
+            for i in range(10_000)
+        ]
+        index.upsert_documents(docs)
+        
+        query = "Introduction to Python"
+        full_ranking = KeywordIndex(path, max_candidates=10**6).search(query, k=len(docs))
+        filters = [
+            {"subject_domain": "cs"},
+            {"subject_domain": "unknown"},
+            {"$or": [{"subject_domain": "cs"}, {"source_name": {"$in": ["course-7"]}}], "audience_level": {"$ne": "advanced"}},
+            {"source_name": {"$nin": [f"course-{i}" for i in range(1, 50)]}, "subject_domain": {"$eq": "other"}},
+        ]
+        for metadata_filters in filters:
+            start = time.perf_counter()
+            hits = index.search(query, k=10, metadata_filters=metadata_filters)
+            assert time.perf_counter() - start < 1.0
+            expected = [
+                hit for hit in full_ranking
+                if len(MetadataIndex.build([hit["metadata"]]).candidates(metadata_filters))
+            ][:10]
+            assert [hit["keyword_score"] for hit in hits] == pytest.approx([hit["keyword_score"] for hit in expected])
+            assert all(len(MetadataIndex.build([hit["metadata"]]).candidates(metadata_filters)) for hit in hits)
+        
+        capped = KeywordIndex(path, max_candidates=500)
+        assert len(capped.search(query, k=10)) == 10  # Scores the newest 500 matches only
+        assert [hit["document_id"] for hit in capped.search(query, k=10, metadata_filters=filters[0])] == [
+            hit["document_id"] for hit in index.search(query, k=10, metadata_filters=filters[0])
+        ]  # Filter leaves fewer chunks than the cap: nothing dropped
+        with pytest.raises(ValueError):
+            index.search(query, k=10, metadata_filters={"subject_domain": {"$gt": 1}})
+    
+    def test_index_pairs_with_vector_store(self, monkeypatch, tmp_path):
+        """A persistent store gets an index next to it; an in-memory one a temporary index."""
+        from services.keyword_index import get_keyword_index, reset_keyword_index
+        from services.vector_store import VectorStore
+        monkeypatch.setenv("VECTOR_STORE_BACKEND", "numpy")
+        monkeypatch.delenv("KEYWORD_INDEX_PATH", raising=False)
+        
+        persistent = VectorStore(persist_directory=str(tmp_path), collection_name="kept")
+        persistent.persist_index = True
+        assert get_keyword_index(persistent).path == str(tmp_path / "kept.bm25.sqlite3")
+        
+        in_memory = VectorStore(persist_directory=str(tmp_path), collection_name="temp")
+        index = get_keyword_index(in_memory)
+        assert get_keyword_index(in_memory) is index
+        assert not index.path.startswith(str(tmp_path))
+        reset_keyword_index()
+        assert not os.path.exists(index.path)
+
+
 # ============================================================================
 # RETRIEVAL AGENT TESTS
 # ============================================================================
@@ -469,6 +1619,137 @@ class TestRetrievalAgent:
         assert 0.0 <= output.retrieval_confidence <= 1.0
 
 
+    @pytest.mark.asyncio
+    async def test_hybrid_retrieval_finds_keyword_match(self, monkeypatch):
+        """A title query's exact term surfaces its chunk; chunks deleted by ingestion stay gone."""
+        pipeline = IngestionPipeline()
+        metadata = VectorDocumentMetadata(
+            institution_name="Test University",
+            degree_level="undergraduate",
+            subject_domain="other",
+            audience_level="beginner",
+            depth_level="foundational",
+            source_type=SourceType.SYLLABUS,
+            uploaded_by=UploadedBy.SYSTEM,
+        )
+        filler = "Learners complete guided labs, weekly quizzes and a capstone project. " * 8
+        _, kube_docs = pipeline.ingest_text(filler + "Deploying services on Kubernetes clusters with Helm charts.", metadata)
+        _, stale_docs = pipeline.ingest_text(filler + "Kubernetes operators and custom resources.", metadata)
+        for i in range(8):
+            pipeline.ingest_text(filler + f"Unit {i} reviews shell scripting and networking basics.", metadata)
+        pipeline._delete_documents([doc.stable_id() for doc in stale_docs])
+        store_lookups = []
+        monkeypatch.setattr(self.agent.vector_store, "existing_ids", lambda ids: store_lookups.append(ids) or set(ids))
+        
+        user_input = UserInputSchema(
+            course_title="Kubernetes Helm Fundamentals",
+            course_description="Hands-on container orchestration",
+            audience_level=AudienceLevel.BEGINNER,
+            audience_category=AudienceCategory.UNDERGRADUATE,
+            learning_mode=LearningMode.PRACTICAL_HANDS_ON,
+            depth_requirement=DepthRequirement.INTRODUCTORY,
+            duration_hours=40,
+        )
+        output = await self.agent.run(ExecutionContext(user_input=user_input, session_id="hybrid"))
+        
+        ids = [chunk.document_id for chunk in output.retrieved_chunks]
+        assert ids[0] == kube_docs[0].stable_id()
+        assert stale_docs[0].stable_id() not in ids
+        assert len(ids) == len(set(ids)) == 5
+        assert store_lookups == []
+    
+    def test_reciprocal_rank_fusion(self):
+        """Chunks ranked by both lists beat chunks ranked first by only one."""
+        dense = [
+            {"document_id": "a", "similarity_score": 0.9, "content": "a"},
+            {"document_id": "b", "similarity_score": 0.8, "content": "b"},
+        ]
+        keyword = [
+            {"document_id": "c", "keyword_score": 7.0, "content": "c"},
+            {"document_id": "b", "keyword_score": 5.0, "content": "b"},
+        ]
+        fused = RetrievalAgent._reciprocal_rank_fusion([dense, keyword], rrf_k=60)
+        
+        assert [r["document_id"] for r in fused] == ["b", "a", "c"]
+        assert fused[0]["fusion_score"] == pytest.approx(1 / 62 + 1 / 62)
+        assert fused[0]["similarity_score"] == 0.8 and fused[0]["keyword_score"] == 5.0
+        assert fused[2]["similarity_score"] == 0.0  # Keyword-only
+    
+    def test_mmr_select(self):
+        """Near-copies of the top pick lose to distinct, less relevant candidates."""
+        embeddings = np.array([
+            [1.0, 0.0, 0.0],
+            [1.0, 0.05, 0.0],   # Near-copy of 0
+            [1.0, 0.0, 0.05],   # Near-copy of 0
+            [0.0, 1.0, 0.0],
+            [0.0, 0.0, 1.0],
+        ])
+        relevance = [1.0, 0.98, 0.96, 0.7, 0.6]
+        
+        assert mmr_select(relevance, embeddings, 3, lambda_mult=0.5) == [0, 3, 4]
+        assert mmr_select(relevance, embeddings, 3, lambda_mult=1.0) == [0, 1, 2]
+        assert mmr_select(relevance, embeddings, 10, lambda_mult=0.5) == [0, 3, 4, 1, 2]
+        assert mmr_select([], np.empty((0, 3)), 5) == []
+        
+        rng = np.random.default_rng(0)
+        relevance, embeddings = rng.random(100), rng.standard_normal((100, 384))
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            mmr_select(relevance, embeddings, 5)
+            timings.append(time.perf_counter() - start)
+        assert min(timings) < 1e-3
+    
+    def test_diversify_uses_stored_embeddings(self, monkeypatch):
+        """The agent diversifies over the hits' vectors, scoring keyword-only hits from the store."""
+        ranked = [
+            {"document_id": doc_id, "similarity_score": score, "content": doc_id, "distance": 1 - score}
+            for doc_id, score in [("a", 0.9), ("a2", 0.89), ("a3", 0.88), ("b", 0.6)]
+        ] + [
+            {"document_id": doc_id, "similarity_score": 0.0, "content": doc_id, "keyword_score": 3.0}
+            for doc_id in ("c", "d")  # Keyword-only
+        ]
+        for result, score in zip(ranked, [0.9, 0.89, 0.88, 0.6, 0.5, 0.4]):
+            result["fusion_score"] = score
+        vectors = {
+            "a": np.array([1.0, 0.0, 0.0]), "a2": np.array([1.0, 0.02, 0.0]), "a3": np.array([1.0, 0.0, 0.02]),
+            "b": np.array([0.0, 1.0, 0.0]), "c": np.array([0.0, 0.0, 2.0]),
+        }  # "d" has no stored vector
+        for result in ranked[:4]:  # Dense hits come with their vectors
+            result["embedding"] = vectors[result["document_id"]]
+        requested = []
+        monkeypatch.setattr(
+            self.agent.vector_store, "get_embeddings",
+            lambda ids: requested.append(ids) or {i: vectors[i] for i in ids if i in vectors},
+        )
+        self.agent.mmr_lambda = 0.5
+        
+        self.agent._score_keyword_hits(ranked, np.array([[0.0, 0.6, 0.8], [1.0, 0.0, 0.0]]))
+        assert requested == [["c", "d"]]
+        assert ranked[4]["similarity_score"] == pytest.approx(0.8)  # Best cosine over the queries
+        assert ranked[5]["similarity_score"] == 0.0 and "embedding" not in ranked[5]
+        
+        picked = [r["document_id"] for r in self.agent._diversify(ranked, 3)]
+        assert picked == ["a", "b", "c"]
+        for result in ranked:
+            result.pop("embedding", None)
+        assert [r["document_id"] for r in self.agent._diversify(ranked, 3)] == ["a", "a2", "a3"]
+    
+    def test_keyword_only_hits_count_toward_confidence(self, monkeypatch):
+        """A keyword-only top hit is scored by its cosine, not the 0.0 fusion placeholder."""
+        dense = [{"document_id": "a", "similarity_score": 0.8, "content": "a", "distance": 0.2}]
+        keyword = [{"document_id": "k", "keyword_score": 9.0, "content": "k"}]
+        fused = RetrievalAgent._reciprocal_rank_fusion([dense, keyword])
+        unscored = RetrievalAgent._calculate_confidence(fused)
+        
+        monkeypatch.setattr(self.agent.vector_store, "get_embeddings", lambda ids: {"k": np.array([0.6, 0.8])})
+        self.agent._score_keyword_hits(fused, np.array([[0.0, 1.0]]))
+        
+        assert fused[1]["similarity_score"] == pytest.approx(0.8)
+        assert RetrievalAgent._calculate_confidence(fused) == pytest.approx(0.9)  # 0.8 average + high-score boost
+        assert RetrievalAgent._calculate_confidence(fused) > unscored
+
+
 # ============================================================================
 # INGESTION PIPELINE TESTS
 # ============================================================================
@@ -500,6 +1781,231 @@ class TestIngestionPipeline:
         assert count > 0
         assert len(docs) > 0
     
+    def test_ingest_from_folder_incremental(self, tmp_path):
+        """Re-runs only touch changed files; removed files lose their chunks."""
+        from services.vector_store import VectorStore
+        store = VectorStore(collection_name="folder_ingest_test")
+        store.embedding_service = _CountingEmbeddingService()
+        store.initialize()
+        self.pipeline.vector_store = store
+        folder = tmp_path / "curricula"
+        folder.mkdir()
+        manifest_path = str(tmp_path / "manifest.json")
+        (folder / "java.txt").write_text("Classes objects and interfaces in Java. " * 40)
+        (folder / "python.txt").write_text("Functions modules and packages in Python. " * 40)
+        
+        count, first_docs = self.pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)
+        stored = store.get_collection_stats()["document_count"]
+        embedded = len(store.embedding_service.embedded)
+        assert count == stored > 0
+        
+        # Unchanged: nothing is read or embedded
+        assert self.pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path) == (0, [])
+        assert len(store.embedding_service.embedded) == embedded
+        
+        # Touched but identical: still unchanged
+        os.utime(folder / "java.txt", ns=(1, 1))
+        assert self.pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)[0] == 0
+        
+        # Modified and removed files
+        (folder / "java.txt").write_text("Generics streams and collections in Java. " * 40)
+        (folder / "python.txt").unlink()
+        count, docs = self.pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)
+        assert count == len(docs) > 0
+        assert store.get_collection_stats()["document_count"] == len(docs)
+        assert all("Generics" in doc.content for doc in docs)
+        assert store.existing_ids([doc.stable_id() for doc in first_docs]) == set()
+        
+        # A store that lost the chunks is repopulated
+        store.delete_collection()
+        count, _ = self.pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)
+        assert count == store.get_collection_stats()["document_count"] == len(docs)
+    
+    def test_unchanged_file_check_is_batched_and_survives_errors(self, tmp_path):
+        """Recorded chunks are checked in bounded batches; a failed check re-ingests instead of aborting."""
+        from services.vector_store import VectorStore
+        store = VectorStore(collection_name="chunk_check_test")
+        store.initialize()
+        pipeline = IngestionPipeline(chunk_size_words=100, chunk_overlap_words=10)
+        pipeline.vector_store = store
+        pipeline.CHUNK_CHECK_BATCH = 3
+        folder = tmp_path / "curricula"
+        folder.mkdir()
+        for i in range(3):
+            (folder / f"course_{i}.txt").write_text(f"Course {i} teaches topic{i} through worked examples. " * 60)
+        manifest_path = str(tmp_path / "manifest.json")
+        count, _ = pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)
+        assert count > 3
+
+        checked = []
+        existing_ids = store.existing_ids
+        store.existing_ids = lambda ids: checked.append(len(ids)) or existing_ids(ids)
+        assert pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path) == (0, [])
+        assert sum(checked) == count and max(checked) <= 3
+
+        def failing(ids):
+            raise RuntimeError("too many SQL variables")
+        store.existing_ids = failing
+        assert pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)[0] == count
+        assert store.get_collection_stats()["document_count"] == count
+
+    def test_same_named_files_in_two_folders_keep_their_chunks(self, tmp_path):
+        """Identical files with the same name in two folders are stored, and removed, separately."""
+        from services.vector_store import VectorStore
+        store = VectorStore(collection_name="same_name_test")
+        store.initialize()
+        self.pipeline.vector_store = store
+        folders = [tmp_path / "2023", tmp_path / "2024"]
+        ingested = []
+        for folder in folders:
+            folder.mkdir()
+            (folder / "java.txt").write_text("Classes objects and interfaces in Java. " * 40)
+            ingested.append(self.pipeline.ingest_from_folder(str(folder), manifest_path=str(folder / "manifest.json"))[1])
+        
+        first_ids, second_ids = ({doc.stable_id() for doc in docs} for docs in ingested)
+        assert first_ids and second_ids and not first_ids & second_ids
+        
+        (folders[0] / "java.txt").unlink()
+        self.pipeline.ingest_from_folder(str(folders[0]), manifest_path=str(folders[0] / "manifest.json"))
+        assert store.existing_ids(list(first_ids)) == set()
+        assert store.existing_ids(list(second_ids)) == second_ids
+    
+    def test_folder_ingestion_maintains_keyword_index(self, tmp_path):
+        """Keyword index follows adds and removals, and is backfilled when it lags."""
+        from services.keyword_index import KeywordIndex
+        from services.vector_store import VectorStore
+        folder = tmp_path / "curricula"
+        folder.mkdir()
+        for i in range(3):
+            (folder / f"course_{i}.txt").write_text(f"Course {i} teaches topic{i} through worked examples. " * 60)
+        store = VectorStore(collection_name="keyword_ingest")
+        store.initialize()
+        
+        for workers in (1, 2):
+            pipeline = IngestionPipeline(chunk_size_words=100, chunk_overlap_words=10, workers=workers)
+            pipeline.vector_store = store
+            pipeline.keyword_index = KeywordIndex(str(tmp_path / f"bm25_{workers}.sqlite3"))
+            manifest_path = str(tmp_path / f"manifest_{workers}.json")
+            
+            # The store already holds the chunks from the first round: the index is backfilled
+            _, docs = pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)
+            ids = [doc.stable_id() for doc in docs]
+            assert pipeline.keyword_index.existing_ids(ids) == set(ids)
+            assert pipeline.keyword_index.search("topic1", k=1)[0]["metadata"]["source_name"] == "Course 1"
+            
+            (folder / "course_1.txt").unlink()
+            pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)
+            assert pipeline.keyword_index.search("topic1", k=1) == []
+            assert len(pipeline.keyword_index) == store.get_collection_stats()["document_count"]
+            
+            pipeline.keyword_index.clear()
+            pipeline.ingest_from_folder(str(folder), manifest_path=manifest_path)
+            assert len(pipeline.keyword_index) == store.get_collection_stats()["document_count"]
+            (folder / "course_1.txt").write_text("Course 1 teaches topic1 through worked examples. " * 60)
+    
+    def test_staged_folder_ingestion_matches_sequential(self, tmp_path):
+        """The multi-process pipeline stores the same chunks as the sequential path."""
+        from services.vector_store import VectorStore
+        folder = tmp_path / "curricula"
+        folder.mkdir()
+        for i in range(6):
+            (folder / f"course_{i}.txt").write_text(f"Lecture {i} covers topic {i} in depth. " * (60 + 40 * i))
+        (folder / "broken.txt").write_bytes(b"\xff\xfe not utf-8")
+        
+        stored_ids = {}
+        for workers in (1, 2):
+            store = VectorStore(collection_name=f"staged_ingest_{workers}")
+            store.initialize()
+            pipeline = IngestionPipeline(chunk_size_words=100, chunk_overlap_words=10, workers=workers, embed_batch_size=8)
+            pipeline.vector_store = store
+            count, docs = pipeline.ingest_from_folder(str(folder), manifest_path=str(tmp_path / f"manifest_{workers}.json"))
+            
+            assert count == len(docs) == store.get_collection_stats()["document_count"]
+            stored_ids[workers] = {doc.stable_id() for doc in docs}
+            assert store.existing_ids(list(stored_ids[workers])) == stored_ids[workers]
+            
+            # Second run: nothing changed, nothing ingested (the broken file is retried)
+            assert pipeline.ingest_from_folder(str(folder), manifest_path=str(tmp_path / f"manifest_{workers}.json")) == (0, [])
+        
+        assert stored_ids[1] == stored_ids[2]
+    
+    def test_sentence_chunker_respects_boundaries_and_budget(self):
+        """Chunks are whole sentences within the token budget, overlapping by sentences."""
+        import types
+        from utils.text_chunker import SentenceChunker, estimate_tokens
+        sentences = [f"Sentence {i} explains concept number {i} in some detail." for i in range(60)]
+        text = "  ".join(sentences[:30]) + "\n\n" + "\n".join(sentences[30:])
+        chunker = SentenceChunker(max_tokens=100, overlap_tokens=20)
+        
+        chunks = chunker.chunks(text)
+        assert isinstance(chunks, types.GeneratorType)
+        chunks = list(chunks)
+        
+        assert len(chunks) > 3
+        for chunk in chunks:
+            assert chunk.startswith("Sentence ") and chunk.endswith("detail.")
+            assert sum(estimate_tokens(s) for s in chunk.split("  ")) <= 100 + chunker.min_tokens
+        for previous, current in zip(chunks, chunks[1:]):
+            last_sentence = previous[previous.rindex("Sentence "):]
+            assert current.startswith(last_sentence)
+        assert chunks[-1].endswith(sentences[-1])
+        
+        # A sentence over budget is cut at word boundaries
+        long_chunks = list(SentenceChunker(max_tokens=20, overlap_tokens=0).chunks("word " * 500))
+        assert all(set(chunk.split()) == {"word"} for chunk in long_chunks)
+        assert sum(len(chunk.split()) for chunk in long_chunks) == 500
+    
+    def test_chunk_text_uses_token_budget(self):
+        """Pipeline chunks follow the configured token budget and end on sentences."""
+        pipeline = IngestionPipeline(chunk_max_tokens=200, chunk_overlap_tokens=30)
+        text = " ".join(f"Topic {i} covers   recursion,\t iteration and proofs." for i in range(200))
+        
+        chunks = list(pipeline._chunk_text(text))
+        
+        assert len(chunks) > 5
+        assert all(chunk.endswith("proofs.") and "  " not in chunk for chunk in chunks)
+        assert max(len(chunk) for chunk in chunks) <= (200 + pipeline.chunk_max_tokens // 4) * 4
+    
+    def test_pdf_chunks_stream_with_page_ranges(self):
+        """Paged text is chunked incrementally; chunks know their pages."""
+        from tools.pdf_loader import PDFProcessor
+        pages = ((n, " ".join(f"p{n}w{i}" for i in range(120))) for n in range(1, 6))
+        
+        chunks = list(PDFProcessor.iter_chunks(pages, chunk_size=200, overlap=20))
+        
+        assert [(first, last) for _, first, last in chunks] == [(1, 2), (2, 4), (4, 5), (5, 5)]
+        assert all(len(chunk.split()) == 200 for chunk, _, _ in chunks[:-1])
+        assert chunks[1][0].split()[:20] == chunks[0][0].split()[-20:]
+        assert chunks[-1][0].split()[-1] == "p5w119"
+        assert PDFProcessor.chunk_pdf_content("word " * 450, chunk_size=200, overlap=20) == [
+            chunk for chunk, _, _ in PDFProcessor.iter_chunks([(1, "word " * 450)], 200, 20)
+        ]
+    
+    def test_ingest_pdf_stores_page_metadata(self, monkeypatch):
+        """ingest_pdf stores streamed chunks in batches with page numbers."""
+        from tools.pdf_loader import PDFProcessor
+        from services.vector_store import VectorStore
+        store = VectorStore(collection_name="pdf_ingest_test")
+        store.initialize()
+        self.pipeline.vector_store = store
+        self.pipeline.embed_batch_size = 2
+        monkeypatch.setattr(
+            PDFProcessor, "iter_pages",
+            staticmethod(lambda path: ((n, f"Page {n} syllabus text. " * 80) for n in range(1, 11))),
+        )
+        
+        count, docs = self.pipeline.ingest_pdf(
+            "syllabus.pdf", "Test University", "undergraduate", "computer_science", "beginner", "foundational",
+        )
+        
+        assert count == len(docs) == store.get_collection_stats()["document_count"] > 2
+        assert docs[0].page_start == 1 and docs[-1].page_end == 10
+        stored = store.similarity_search(docs[0].content, k=1)[0]["metadata"]
+        assert stored["page_start"] == "1"
+        assert VectorDocument.from_chroma_format(
+            {"id": docs[0].stable_id(), "document": docs[0].content, "metadatas": stored}
+        ).page_end == docs[0].page_end
+    
     def test_ingest_example_curriculum(self):
         """Example curriculum ingestion works."""
         count, docs = self.pipeline.ingest_example_curriculum()
@@ -14,6 +14,7 @@ Total: 30 tests across 6 test classes
 
 import pytest
 import asyncio
+import time
 from datetime import datetime
 from unittest.mock import Mock, patch, AsyncMock
 
@@ -294,6 +295,44 @@ class TestWebSearchAgent:
         assert output.confidence_score >= 0.0
 
 
+    async def test_agent_returns_partial_results_at_deadline(self):
+        """Test slow queries are abandoned at the deadline, fast ones kept."""
+        class _SlowToolchain(WebSearchToolchain):
+            def search(self, query, max_results=5):
+                if "curriculum" not in query:
+                    time.sleep(1.0)  # Provider brownout
+                return [
+                    SearchResult(
+                        title=f"{query} guide",
+                        url=f"https://example.com/{query.replace(' ', '-')}",
+                        snippet="Structured curriculum overview for learners",
+                        source="tavily",
+                        relevance_score=0.8,
+                    )
+                ], "tavily"
+        
+        self.agent.toolchain = _SlowToolchain()
+        context = ExecutionContext(
+            user_input=UserInputSchema(
+                course_title="Python Fundamentals",
+                course_description="Learn Python basics",
+                audience_level=AudienceLevel.BEGINNER,
+                audience_category=AudienceCategory.COLLEGE_STUDENTS,
+                learning_mode=LearningMode.HYBRID,
+                depth_requirement=DepthRequirement.INTRODUCTORY,
+                duration_hours=40,
+            ),
+            session_id="test",
+        ).with_deadline(0.3)
+        
+        start = time.perf_counter()
+        output = await self.agent.run(context)
+        
+        assert time.perf_counter() - start < 0.8
+        assert output.result_count == 1
+        assert "Partial results: 1/2" in output.search_notes
+
+
 class TestFailureResilience:
     """Test system robustness under failure conditions."""
     
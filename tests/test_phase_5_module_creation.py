@@ -15,6 +15,10 @@ Tests STEP 5.1-5.9:
 
 import pytest
 import asyncio
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
 from datetime import datetime
 from typing import Dict, Any
 
@@ -27,7 +31,9 @@ from schemas.execution_context import ExecutionContext
 from agents.module_creation_agent import (
     ModuleCreationAgent, get_module_creation_agent, reset_module_creation_agent
 )
+from services.outline_cache import OutlineCache, context_fingerprint
 from utils.duration_allocator import DurationAllocator
+from utils.streaming_json import IncrementalJSONParser, parse_json_document
 from utils.learning_mode_templates import LearningModeTemplates
 
 
@@ -726,3 +732,430 @@ def test_module_duration_consistency():
     
     # Lessons should roughly align with module duration (within 20% margin)
     assert total_lesson_minutes <= expected_minutes * 1.2
+
+
+# ========== Outline Cache Tests ==========
+
+def _cache_user_input(**overrides):
+    fields = dict(
+        course_title="Advanced Python for Data Science",
+        course_description="Master advanced Python techniques for data analysis",
+        audience_level="intermediate",
+        audience_category="undergraduate",
+        learning_mode="project_based",
+        depth_requirement="implementation_level",
+        duration_hours=30,
+    )
+    fields.update(overrides)
+    return UserInputSchema(**fields)
+
+
+def _cache_context(**overrides):
+    return ExecutionContext(user_input=_cache_user_input(), session_id="cache_session", **overrides)
+
+
+def _cache_outline(title="Advanced Python for Data Science"):
+    modules = [
+        Module(
+            module_id=f"M_{i}",
+            title=f"Module {i}",
+            description="Module overview",
+            estimated_hours=10.0,
+            learning_objectives=[
+                LearningObjective(
+                    objective_id=f"LO_{i}_{j}",
+                    statement="Apply the concept",
+                    bloom_level=BloomLevel.APPLY,
+                    assessment_method="project",
+                )
+                for j in range(1, 4)
+            ],
+            lessons=[Lesson(lesson_id=f"L_{i}_1", title="Lesson", duration_minutes=60)],
+            assessment_type="project",
+        )
+        for i in range(1, 4)
+    ]
+    return CourseOutlineSchema(
+        course_title=title,
+        course_summary="A practical, project-based course on advanced Python for data science.",
+        audience_level="intermediate",
+        audience_category="undergraduate",
+        learning_mode="project_based",
+        depth_requirement="implementation_level",
+        total_duration_hours=30.0,
+        modules=modules,
+        confidence_score=0.8,
+        completeness_score=0.9,
+    )
+
+
+def test_outline_cache_memory_hit_returns_fresh_copy():
+    """Memory tier serves hits; each hit is an independent object."""
+    cache = OutlineCache()
+    cache.put("key", _cache_outline())
+    
+    first = cache.get("key")
+    first.course_title = "Mutated"
+    second = cache.get("key")
+    
+    assert second.course_title == "Advanced Python for Data Science"
+    assert cache.get("missing") is None
+    assert cache.stats()["memory_hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_outline_cache_disk_tier_survives_restart(tmp_path):
+    """SQLite tier serves entries to a new cache instance."""
+    db_path = str(tmp_path / "outlines.sqlite3")
+    OutlineCache(db_path=db_path).put("key", _cache_outline())
+    
+    cache = OutlineCache(db_path=db_path)
+    
+    assert cache.get("key").course_title == "Advanced Python for Data Science"
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get("key") is not None
+    assert cache.stats()["memory_hits"] == 1  # Promoted into memory
+
+
+def test_outline_cache_ttl_and_lru_eviction(tmp_path):
+    """Expired entries are misses; the memory tier is bounded."""
+    cache = OutlineCache(max_memory_entries=2, ttl_seconds=60, db_path=str(tmp_path / "c.sqlite3"))
+    for key in ("a", "b", "c"):
+        cache.put(key, _cache_outline())
+    
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.stats()["evictions"] == 1
+    
+    with patch("services.outline_cache.time.time", return_value=time.time() + 120):
+        assert cache.get("a") is None
+        assert cache.purge_expired() == 4  # b, c in memory + b, c on disk
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_context_fingerprint_ignores_volatile_fields():
+    """Same sources with different timestamps share a fingerprint."""
+    def web(timestamp):
+        return {
+            "search_query": "python data science",
+            "source_links": [{"url": "https://example.com/a", "accessed_at": timestamp}],
+            "execution_timestamp": timestamp,
+            "execution_time_ms": 12.5,
+        }
+    
+    a = _cache_context(web_search_results=web("2026-01-01T00:00:00"))
+    b = _cache_context(web_search_results=web("2026-01-02T00:00:00"))
+    c = _cache_context(web_search_results=web("2026-01-01T00:00:00"), uploaded_pdf_text="notes")
+    
+    assert context_fingerprint(a) == context_fingerprint(b)
+    assert context_fingerprint(a) != context_fingerprint(c)
+
+
+@pytest.mark.asyncio
+async def test_module_agent_serves_repeated_request_from_cache():
+    """A repeated request (same input + sources) skips the LLM call."""
+    class _FakeLLM:
+        calls = 0
+        
+        async def generate_streaming(self, prompt, **kwargs):
+            _FakeLLM.calls += 1
+            yield "{}"
+    
+    with patch("agents.module_creation_agent.get_llm_service", return_value=_FakeLLM()):
+        agent = ModuleCreationAgent(outline_cache=OutlineCache())
+    agent._structure_outline = lambda *args, **kwargs: _cache_outline()
+    
+    first = await agent.run(_cache_context())
+    second = await agent.run(_cache_context())
+    third = await agent.run(_cache_context(uploaded_pdf_text="different sources"))
+    
+    assert _FakeLLM.calls == 2
+    assert second.model_dump() == first.model_dump()
+    assert third is not None
+
+
+
+# ========== Streaming Tests ==========
+
+def _llm_outline_json(num_modules=3, hours=10.0):
+    """Outline JSON as the LLM would write it (see _build_prompt schema)."""
+    return json.dumps({
+        "course_title": "Advanced Python for Data Science",
+        "course_summary": "A practical, project-based course on advanced Python for data science.",
+        "modules": [
+            {
+                "module_id": f"M_{i}",
+                "title": f"Module {i} {{braces}} and \"quotes\"",
+                "description": "Module overview",
+                "estimated_hours": hours,
+                "learning_objectives": [
+                    {"statement": f"Objective {j}", "bloom_level": "apply", "assessment_method": "project"}
+                    for j in range(1, 4)
+                ],
+                "lessons": [{"title": "Lesson", "duration_minutes": 60, "key_concepts": ["concept"]}],
+                "assessment_type": "project",
+            }
+            for i in range(1, num_modules + 1)
+        ],
+        "course_level_objectives": [{"statement": "Course goal", "bloom_level": "create"}],
+    }, indent=2)
+
+
+class _StreamingLLM:
+    """LLM stub that streams a fixed response in small chunks."""
+    
+    def __init__(self, text, chunk_size=40, delay=0.0):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.finished = False
+    
+    async def generate(self, prompt, **kwargs):
+        return SimpleNamespace(content=self.text)
+    
+    async def generate_streaming(self, prompt, **kwargs):
+        for i in range(0, len(self.text), self.chunk_size):
+            await asyncio.sleep(self.delay)
+            yield self.text[i:i + self.chunk_size]
+        self.finished = True
+
+
+def test_incremental_parser_yields_modules_as_they_close():
+    """Modules are extracted chunk by chunk; other arrays are ignored."""
+    text = "```json\n" + _llm_outline_json() + "\n```"
+    parser = IncrementalJSONParser(stream_arrays=("modules",))
+    modules = []
+    for i in range(0, len(text), 7):
+        modules.extend(item for key, item in parser.feed(text[i:i + 7]) if key == "modules")
+    
+    assert [m["module_id"] for m in modules] == ["M_1", "M_2", "M_3"]
+    assert modules[0]["title"] == 'Module 1 {braces} and "quotes"'
+    assert parser.close()["course_level_objectives"][0]["bloom_level"] == "create"
+
+
+def test_incremental_parser_recovers_from_prose_and_fences():
+    """Brace-delimited prose is dropped without rescanning; truncation is reported."""
+    text = 'Sure! Here is the outline {as requested}:\n```json\n{"modules": [], "ok": true}\n```\nDone {}'
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    
+    assert parser.close() == {"modules": [], "ok": True}
+    assert parser.discarded_candidates == 1
+    assert parse_json_document('```\n{"a": "}"}\n```') == {"a": "}"}
+    
+    # An unbalanced brace in prose is dropped when the fence opens
+    assert parse_json_document('Tip: open brace { here.\n```json\n{"modules": [1]}\n```') == {"modules": [1]}
+    # A stray quote in that prose swallows the fence, so the fenced block is parsed alone
+    assert parse_json_document('Use {"like this.\n```json\n{"modules": [{"module_id": "M_1"}]}\n```') == {
+        "modules": [{"module_id": "M_1"}]
+    }
+    
+    truncated = IncrementalJSONParser()
+    truncated.feed('{"modules": [{"module_id": "M_1"}')
+    with pytest.raises(ValueError, match="Truncated"):
+        truncated.close()
+
+
+def test_fenced_json_block_beats_object_in_prose():
+    """A complete object in the prose before a ```json fence does not win over the fence."""
+    text = 'The `extras` field returns `{}` when empty.\n```json\n{"modules": [{"module_id": "M_1"}]}\n```'
+
+    assert parse_json_document(text) == {"modules": [{"module_id": "M_1"}]}
+    # The scan's candidate is still used when the fence doesn't parse
+    assert parse_json_document('Result: {"ok": true}\n```json\n{"modules": [\n```') == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_module_agent_stream_prefers_fenced_outline():
+    """A streamed response with "{}" in its preamble still yields the fenced outline."""
+    llm = _StreamingLLM("Unknown keys map to `{}`.\n```json\n" + _llm_outline_json() + "\n```")
+    with patch("agents.module_creation_agent.get_llm_service", return_value=llm):
+        agent = ModuleCreationAgent(outline_cache=OutlineCache())
+
+    outline = await agent.run(_cache_context(event_listener=lambda event_type, data: None))
+
+    assert [module.module_id for module in outline.modules] == ["M_1", "M_2", "M_3"]
+
+
+def test_module_agent_parse_llm_response_handles_fenced_json():
+    """_parse_llm_response accepts fenced JSON and rejects non-JSON."""
+    with patch("agents.module_creation_agent.get_llm_service", return_value=_StreamingLLM("")):
+        agent = ModuleCreationAgent(outline_cache=OutlineCache())
+    
+    assert agent._parse_llm_response('```json\n{"modules": []}\n```') == {"modules": []}
+    with pytest.raises(ValueError, match="Unable to extract valid JSON"):
+        agent._parse_llm_response("no json here")
+
+
+@pytest.mark.asyncio
+async def test_module_agent_streams_modules_before_generation_finishes():
+    """With a listener attached, each Module is emitted mid-stream."""
+    llm = _StreamingLLM(_llm_outline_json(), delay=0.001)
+    with patch("agents.module_creation_agent.get_llm_service", return_value=llm):
+        agent = ModuleCreationAgent(outline_cache=OutlineCache())
+    
+    events = []
+    context = _cache_context(
+        event_listener=lambda event_type, data: events.append((event_type, data, llm.finished))
+    )
+    outline = await agent.run(context)
+    
+    assert [data.module_id for _, data, _ in events] == ["M_1", "M_2", "M_3"]
+    assert all(isinstance(data, Module) for _, data, _ in events)
+    assert events[0][2] is False  # First module arrived before the stream ended
+    assert len(outline.modules) == 3
+
+
+# ========== Parallel Module Generation Tests ==========
+
+class _ParallelLLM:
+    """LLM stub answering skeleton and per-module prompts separately."""
+    
+    def __init__(self, num_modules=6, hours=5.0, delay=0.1):
+        self.num_modules = num_modules
+        self.hours = hours
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+    
+    async def generate(self, prompt, **kwargs):
+        self.prompts.append((prompt, kwargs.get("max_tokens")))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        
+        if "Plan the module structure" in prompt:
+            content = {
+                "course_summary": "A practical, project-based course on advanced Python for data science.",
+                "modules": [
+                    {"module_id": f"M_{i}", "title": f"Skeleton {i}", "description": "Overview",
+                     "estimated_hours": self.hours}
+                    for i in range(1, self.num_modules + 1)
+                ],
+            }
+        else:
+            content = {
+                "title": "Detail title (ignored)",
+                "learning_objectives": [
+                    {"statement": f"Objective {j}", "bloom_level": "apply", "assessment_method": "project"}
+                    for j in range(1, 4)
+                ],
+                "lessons": [{"title": "Lesson", "duration_minutes": 90}],
+                "assessment_type": "project",
+            }
+        return SimpleNamespace(content="```json\n" + json.dumps(content) + "\n```")
+
+
+@pytest.mark.asyncio
+async def test_parallel_mode_generates_modules_concurrently():
+    """Skeleton call, then every module at once; merged into one outline."""
+    llm = _ParallelLLM(num_modules=6, hours=5.0, delay=0.1)
+    with patch("agents.module_creation_agent.get_llm_service", return_value=llm):
+        agent = ModuleCreationAgent(outline_cache=OutlineCache())
+    
+    emitted = []
+    context = _cache_context(
+        execution_mode=ModuleCreationAgent.PARALLEL_MODULES_MODE,
+        event_listener=lambda event_type, data: emitted.append(data),
+    )
+    
+    start = time.perf_counter()
+    outline = await agent.run(context)
+    elapsed = time.perf_counter() - start
+    
+    assert elapsed < 0.4  # ~skeleton + slowest module, not 7 sequential calls
+    assert len(llm.prompts) == 7
+    assert llm.peak == 6
+    assert all(tokens == ModuleCreationAgent.MODULE_MAX_TOKENS for _, tokens in llm.prompts[1:])
+    assert [m.title for m in outline.modules] == [f"Skeleton {i}" for i in range(1, 7)]
+    assert all(len(m.learning_objectives) == 3 for m in outline.modules)
+    assert outline.total_duration_hours == 30
+    assert len(emitted) == 6
+
+
+@pytest.mark.asyncio
+async def test_parallel_mode_rejects_empty_skeleton():
+    """A skeleton without modules fails fast instead of producing an empty outline."""
+    llm = _ParallelLLM(num_modules=0, delay=0.0)
+    with patch("agents.module_creation_agent.get_llm_service", return_value=llm):
+        agent = ModuleCreationAgent(outline_cache=OutlineCache())
+    
+    with pytest.raises(ValueError, match="no modules"):
+        await agent.run(_cache_context(execution_mode=ModuleCreationAgent.PARALLEL_MODULES_MODE))
+
+
+# ========== Targeted Regeneration Tests ==========
+
+class _RegenerationLLM:
+    """LLM stub returning a revised module with its own hour estimate."""
+    
+    def __init__(self, hours=20.0):
+        self.hours = hours
+        self.prompts = []
+    
+    async def generate(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=json.dumps({
+            "title": "Revised module",
+            "description": "Deeper treatment",
+            "estimated_hours": self.hours,
+            "learning_objectives": [
+                {"statement": f"Revised objective {j}", "bloom_level": "analyze", "assessment_method": "project"}
+                for j in range(1, 5)
+            ],
+            "lessons": [{"title": "Revised lesson", "duration_minutes": 120}],
+            "assessment_type": "project",
+        }))
+
+
+@pytest.mark.asyncio
+async def test_regenerate_modules_splices_and_rebalances_hours():
+    """Only listed modules are rewritten; the course total is preserved."""
+    llm = _RegenerationLLM(hours=20.0)
+    with patch("agents.module_creation_agent.get_llm_service", return_value=llm):
+        agent = ModuleCreationAgent(outline_cache=OutlineCache())
+    outline = _cache_outline()
+    context = _cache_context(web_search_results={"results": [{"title": "Pandas deep dive"}]})
+    
+    revised = await agent.regenerate_modules(
+        outline, ["M_2"], feedback=["Add more hands-on work"], context=context
+    )
+    
+    assert len(llm.prompts) == 1
+    assert "Add more hands-on work" in llm.prompts[0]
+    assert "Pandas deep dive" in llm.prompts[0]  # Original context reused
+    assert revised.modules[1].title == "Revised module"
+    assert revised.modules[1].module_id == "M_2"
+    assert revised.modules[0] == outline.modules[0]
+    assert revised.modules[1].estimated_hours == 10.0  # 30h total - 2 x 10h untouched
+    assert sum(m.estimated_hours for m in revised.modules) == pytest.approx(30.0)
+    assert outline.modules[1].title == "Module 2"  # Input not modified
+
+
+@pytest.mark.asyncio
+async def test_regenerate_modules_uses_validator_feedback_and_remembered_context():
+    """Module IDs come from ValidatorFeedbackSchema; context is remembered from run()."""
+    from schemas.course_outline import ValidatorFeedbackSchema
+    
+    llm = _RegenerationLLM(hours=5.0)
+    with patch("agents.module_creation_agent.get_llm_service", return_value=llm):
+        agent = ModuleCreationAgent(outline_cache=OutlineCache())
+    agent._structure_outline = lambda *args, **kwargs: _cache_outline()
+    agent.stream_responses = False
+    outline = await agent.run(_cache_context())
+    
+    feedback = ValidatorFeedbackSchema(
+        score=60, accept=False, feedback=["Objectives too shallow"], regenerate_modules=["M_1", "M_3"]
+    )
+    revised = await agent.regenerate_modules(outline.model_dump(), feedback=feedback)
+    
+    assert [m.title for m in revised.modules] == ["Revised module", "Module 2", "Revised module"]
+    assert revised.modules[0].estimated_hours == revised.modules[2].estimated_hours == 10.0
+    
+    with pytest.raises(ValueError, match="Unknown module IDs"):
+        await agent.regenerate_modules(outline, ["M_9"])
+    with pytest.raises(ValueError, match="not available"):
+        await agent.regenerate_modules(_cache_outline(title="Unseen"), ["M_1"])
@@ -6,12 +6,18 @@ Takes PDFs, syllabi, outlines and chunks/embeds them for retrieval.
 """
 
 import logging
-from typing import List, Optional, Tuple
+import os
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from pathlib import Path
 from datetime import datetime
 
 from schemas.vector_document import VectorDocument, VectorDocumentMetadata, SourceType, UploadedBy
+from services.keyword_index import get_keyword_index
 from services.vector_store import get_vector_store
+from tools.ingestion_manifest import IngestionManifest
+from tools.parallel_ingestion import FileResult, StagedIngestion
+from tools.pdf_loader import PDFProcessor
+from utils.text_chunker import SentenceChunker
 
 
 logger = logging.getLogger(__name__)
@@ -26,20 +32,65 @@ class IngestionPipeline:
     2. Clean & normalize text
     3. Chunk content
     4. Attach metadata
-    5. Store in vector DB
+    5. Store in vector DB (and the BM25 keyword index next to it)
+    
+    Folder ingestion runs the stages concurrently over many files
+    (tools/parallel_ingestion.py).
     """
     
-    def __init__(self, chunk_size_words: int = 500, chunk_overlap_words: int = 50):
+    # English text averages ~0.75 words per token
+    TOKENS_PER_WORD = 4 / 3
+    
+    # Recorded chunk ids looked up per store call (below SQLite's variable limit)
+    CHUNK_CHECK_BATCH = 500
+    
+    def __init__(
+        self,
+        chunk_size_words: int = 500,
+        chunk_overlap_words: int = 50,
+        workers: Optional[int] = None,
+        embed_batch_size: Optional[int] = None,
+        chunk_max_tokens: Optional[int] = None,
+        chunk_overlap_tokens: Optional[int] = None,
+    ):
         """
         Initialize ingestion pipeline.
         
+        Chunks are whole sentences packed into a token budget (see
+        utils/text_chunker.py). The budget is chunk_max_tokens, else
+        INGESTION_CHUNK_MAX_TOKENS, else chunk_size_words converted at
+        TOKENS_PER_WORD (500 words -> ~667 tokens, inside the 500-800 token
+        chunk contract of VectorDocument); overlap likewise.
+        
         Args:
             chunk_size_words: Target chunk size in words
             chunk_overlap_words: Overlap between chunks
+            workers: Clean/chunk processes for folder ingestion
+                (default: INGESTION_WORKERS or the CPU count; 1 = sequential)
+            embed_batch_size: Chunks per embedding call in the staged pipeline
+                (default: INGESTION_EMBED_BATCH_SIZE or 256)
+            chunk_max_tokens: Token budget per chunk
+            chunk_overlap_tokens: Tokens shared by consecutive chunks
         """
         self.chunk_size_words = chunk_size_words
         self.chunk_overlap_words = chunk_overlap_words
+        self.chunk_max_tokens = (
+            chunk_max_tokens
+            or int(os.getenv("INGESTION_CHUNK_MAX_TOKENS", "0"))
+            or round(chunk_size_words * self.TOKENS_PER_WORD)
+        )
+        self.chunk_overlap_tokens = (
+            chunk_overlap_tokens
+            or int(os.getenv("INGESTION_CHUNK_OVERLAP_TOKENS", "0"))
+            or round(chunk_overlap_words * self.TOKENS_PER_WORD)
+        )
+        self.workers = workers or int(os.getenv("INGESTION_WORKERS", "0")) or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size or int(os.getenv("INGESTION_EMBED_BATCH_SIZE", "256"))
         self.vector_store = get_vector_store()
+        self.keyword_index = (
+            get_keyword_index(self.vector_store)
+            if os.getenv("KEYWORD_INDEX_ENABLED", "true").lower() == "true" else None
+        )
     
     def ingest_text(
         self,
@@ -58,28 +109,20 @@ class IngestionPipeline:
         """
         logger.info(f"Ingesting content from {metadata.source_type.value}: {metadata.source_name}")
         
-        # Clean & normalize text
-        cleaned_content = self._clean_text(content)
-        
-        # Chunk content
-        chunks = self._chunk_text(cleaned_content)
-        
-        logger.info(f"Created {len(chunks)} chunks from source")
+        # Chunk content (single pass; each chunk is cleaned & normalized)
+        # and convert to VectorDocuments with metadata
+        vector_docs = [
+            VectorDocument(content=chunk, metadata=metadata, chunk_index=i)
+            for i, chunk in enumerate(self._chunk_text(content))
+        ]
         
-        # Convert to VectorDocuments with metadata
-        vector_docs = []
-        for i, chunk in enumerate(chunks):
-            doc = VectorDocument(
-                content=chunk,
-                metadata=metadata,
-                chunk_index=i,
-            )
-            vector_docs.append(doc)
+        logger.info(f"Created {len(vector_docs)} chunks from source")
         
         # Store in vector DB
         try:
-            stored_count = self.vector_store.add_documents(vector_docs)
-            logger.info(f"Successfully stored {stored_count} chunks")
+            written, unchanged = self._store_documents(vector_docs)
+            stored_count = written + unchanged
+            logger.info(f"Successfully stored {stored_count} chunks ({unchanged} unchanged, skipped)")
             return stored_count, vector_docs
         except Exception as e:
             logger.error(f"Failed to store chunks: {e}")
@@ -96,10 +139,15 @@ class IngestionPipeline:
         source_type: SourceType = SourceType.UPLOADED_PDF,
         uploaded_by: UploadedBy = UploadedBy.USER,
         session_id: Optional[str] = None,
+        collect_documents: bool = True,
     ) -> Tuple[int, List[VectorDocument]]:
         """
         Ingest a PDF file.
         
+        Streams: memory is bounded by one batch of chunks plus the pages
+        being extracted, independent of the page count. Chunks carry their
+        page range (page_start/page_end).
+        
         Args:
             file_path: Path to PDF file
             institution_name: Institution name
@@ -110,18 +158,12 @@ class IngestionPipeline:
             source_type: Type of source
             uploaded_by: Who uploaded
             session_id: Optional session ID for user uploads
+            collect_documents: False returns no documents (bounded memory)
             
         Returns:
             Tuple of (chunks_stored, list of VectorDocument)
         """
         try:
-            # Extract text from PDF
-            text_content = self._extract_text_from_pdf(file_path)
-            
-            if not text_content:
-                logger.warning(f"No text extracted from {file_path}")
-                return 0, []
-            
             # Create metadata
             metadata = VectorDocumentMetadata(
                 institution_name=institution_name,
@@ -132,11 +174,51 @@ class IngestionPipeline:
                 source_type=source_type,
                 uploaded_by=uploaded_by,
                 source_name=Path(file_path).name,
+                original_url=str(Path(file_path).absolute()),
                 session_id=session_id,
             )
+            logger.info(f"Ingesting PDF: {metadata.source_name}")
+            
+            # Pages stream in (page-parallel for large PDFs) and are chunked
+            # as they arrive; chunks are stored in embed_batch_size batches
+            chunker = SentenceChunker(self.chunk_max_tokens, self.chunk_overlap_tokens)
+            chunks = chunker.chunks_from_pages(PDFProcessor.iter_pages(file_path))
+            
+            stored_count = 0
+            chunk_count = 0
+            all_docs = []
+            batch = []
+            for i, (chunk, page_start, page_end) in enumerate(chunks):
+                chunk_count += 1
+                doc = VectorDocument(
+                    content=self._clean_text(chunk),
+                    metadata=metadata,
+                    chunk_index=i,
+                    page_start=page_start,
+                    page_end=page_end,
+                )
+                try:
+                    doc.validate()
+                except ValueError as e:
+                    logger.warning(f"Skipping chunk {i} (pages {page_start}-{page_end}) of {file_path}: {e}")
+                    continue
+                batch.append(doc)
+                if len(batch) >= self.embed_batch_size:
+                    stored_count += sum(self._store_documents(batch))
+                    if collect_documents:
+                        all_docs.extend(batch)
+                    batch = []
+            if batch:
+                stored_count += sum(self._store_documents(batch))
+                if collect_documents:
+                    all_docs.extend(batch)
             
-            # Ingest as text
-            return self.ingest_text(text_content, metadata)
+            if not chunk_count:
+                logger.warning(f"No text extracted from {file_path}")
+                return 0, []
+            
+            logger.info(f"Stored {stored_count} of {chunk_count} chunks from {metadata.source_name}")
+            return stored_count, all_docs
         
         except Exception as e:
             logger.error(f"Failed to ingest PDF {file_path}: {e}")
@@ -166,30 +248,33 @@ class IngestionPipeline:
         
         return text.strip()
     
-    def _chunk_text(self, text: str) -> List[str]:
+    def _chunk_text(self, text: str) -> Iterator[str]:
         """
-        Chunk text into overlapping chunks.
+        Lazily chunk text at sentence boundaries within the token budget.
         
         Args:
-            text: Text to chunk
+            text: Raw text (cleaned per chunk)
             
-        Returns:
-            List of text chunks
+        Yields:
+            Text chunks
         """
-        words = text.split()
-        chunks = []
-        
-        i = 0
-        while i < len(words):
-            # Extract chunk of words
-            chunk_words = words[i:i + self.chunk_size_words]
-            chunk = " ".join(chunk_words)
-            chunks.append(chunk)
-            
-            # Move by chunk size minus overlap
-            i += self.chunk_size_words - self.chunk_overlap_words
+        return self._sentence_chunks(text, self.chunk_max_tokens, self.chunk_overlap_tokens)
+    
+    @staticmethod
+    def _sentence_chunks(text: str, max_tokens: int, overlap_tokens: int) -> Iterator[str]:
+        """
+        Sentence-aware chunks of text, cleaned (picklable for worker processes).
         
-        return chunks
+        Args:
+            text: Raw text
+            max_tokens: Token budget per chunk
+            overlap_tokens: Tokens of trailing sentences repeated in the next chunk
+            
+        Yields:
+            Cleaned text chunks
+        """
+        for chunk in SentenceChunker(max_tokens, overlap_tokens).chunks(text):
+            yield IngestionPipeline._clean_text(chunk)
     
     @staticmethod
     def _extract_text_from_pdf(file_path: str) -> Optional[str]:
@@ -205,34 +290,42 @@ class IngestionPipeline:
             Extracted text or None
         """
         try:
-            import PyPDF2
-            
-            text_content = ""
-            with open(file_path, "rb") as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                for page in pdf_reader.pages:
-                    text_content += page.extract_text() + "\n"
-            
-            return text_content if text_content.strip() else None
-        
-        except ImportError:
-            logger.warning("PyPDF2 not installed. PDF ingestion unavailable.")
-            return None
+            return PDFProcessor.extract_text(file_path) or None
         except Exception as e:
             logger.error(f"Error extracting PDF text: {e}")
             return None
     
-    def ingest_from_folder(self, folder_path: str = "data/sample_curricula") -> Tuple[int, List[VectorDocument]]:
+    def ingest_from_folder(
+        self,
+        folder_path: str = "data/sample_curricula",
+        manifest_path: Optional[str] = None,
+        incremental: bool = True,
+        collect_documents: bool = True,
+    ) -> Tuple[int, List[VectorDocument]]:
         """
         Scan and ingest all .txt files from a curriculum folder.
         
         This is the PRIMARY way to load real curriculum data!
         
+        Incremental by default: a manifest (tools/ingestion_manifest.py)
+        records mtime, size, content hash and chunk ids per file, so a
+        re-run only reads added or modified files, drops the stale chunks
+        of modified files and deletes the chunks of removed files. Files
+        whose recorded chunks are missing from the store or the keyword
+        index (e.g. a fresh in-memory store) are re-ingested. Changed files are processed by
+        the staged parallel pipeline when workers > 1.
+        
         Args:
             folder_path: Path to folder containing .txt curriculum files
+            manifest_path: Manifest file (default: INGESTION_MANIFEST_PATH or
+                <persist_directory>/<collection>.ingest_manifest.json)
+            incremental: False re-ingests every file (the manifest is rebuilt)
+            collect_documents: False returns no documents (keeps memory flat
+                for large libraries)
             
         Returns:
-            Tuple of (chunks_stored, list of VectorDocument)
+            Tuple of (chunks_stored, list of VectorDocument) for the files
+            ingested in this run
         """
         logger.info(f"Scanning curriculum folder: {folder_path}")
         
@@ -241,50 +334,181 @@ class IngestionPipeline:
             logger.error(f"Folder not found: {folder_path}")
             return 0, []
         
-        txt_files = list(folder.glob("*.txt"))
+        txt_files = sorted(folder.glob("*.txt"))
         logger.info(f"Found {len(txt_files)} .txt files in {folder_path}")
         
-        if not txt_files:
-            logger.warning(f"No .txt files found in {folder_path}")
-            return 0, []
+        manifest = IngestionManifest(manifest_path or self._default_manifest_path())
+        if not incremental:
+            manifest.entries.clear()
+        changes = manifest.diff(folder, txt_files)
+        
+        # Unchanged files whose chunks are gone from the store are re-ingested
+        if changes.unchanged:
+            missing = self._files_missing_chunks(
+                {path: manifest.get(path).chunk_ids for path in changes.unchanged}
+            )
+            changes.modified.extend(path for path in changes.unchanged if path in missing)
+            changes.unchanged = [path for path in changes.unchanged if path not in missing]
+        
+        logger.info(
+            f"Manifest: {len(changes.added)} added, {len(changes.modified)} modified, "
+            f"{len(changes.unchanged)} unchanged, {len(changes.removed)} removed"
+        )
         
         total_stored = 0
         all_docs = []
         
-        for file_path in txt_files:
-            logger.info(f"Ingesting: {file_path.name}")
+        for result in self._ingest_files(changes.added + changes.modified):
+            if result.error:
+                logger.error(f"Failed to ingest {result.path.name}: {result.error}")
+                continue  # Not recorded: retried on the next run
             
-            try:
-                # Read file content
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                
-                # Create metadata from filename (e.g., java.txt → Java)
-                title = file_path.stem.replace("_", " ").title()
-                
-                metadata = VectorDocumentMetadata(
-                    institution_name="Sample Curriculum Library",
-                    degree_level="undergraduate",
-                    subject_domain="computer_science",
-                    audience_level="beginner",
-                    depth_level="foundational",
-                    source_type=SourceType.SYLLABUS,
-                    uploaded_by=UploadedBy.SYSTEM,
-                    source_name=title,
-                    original_url=str(file_path.absolute()),
-                )
-                
-                # Ingest the file
-                stored_count, docs = self.ingest_text(content, metadata)
-                total_stored += stored_count
+            docs = result.documents
+            total_stored += len(docs)
+            if collect_documents:
                 all_docs.extend(docs)
-                
-            except Exception as e:
-                logger.error(f"Failed to ingest {file_path.name}: {e}")
-                continue
-        
+            
+            # New chunks are stored before the old ones are dropped
+            chunk_ids = [doc.to_chroma_format()["id"] for doc in docs]
+            previous = manifest.get(result.path)
+            if previous is not None:
+                self._delete_documents(sorted(set(previous.chunk_ids) - set(chunk_ids)))
+            manifest.record(result.path, result.data, chunk_ids, stat=result.stat)
+        
+        for key in changes.removed:
+            deleted = self._delete_documents(manifest.entries[key].chunk_ids)
+            manifest.remove(key)
+            logger.info(f"Removed {deleted} chunks of deleted file {key}")
+        
+        manifest.save()
         logger.info(f"Folder ingestion complete: {total_stored} total chunks stored from {len(txt_files)} files")
         return total_stored, all_docs
+    
+    def _files_missing_chunks(self, recorded: Dict[Path, List[str]]) -> Set[Path]:
+        """
+        Files with a recorded chunk missing from the store or the keyword index.
+        
+        Ids are looked up CHUNK_CHECK_BATCH at a time. A lookup that fails
+        marks the files of that batch as missing, so they are re-ingested
+        (an upsert of the same chunks) instead of aborting the run.
+        
+        Args:
+            recorded: File -> chunk ids from the manifest
+            
+        Returns:
+            Files to re-ingest
+        """
+        pairs = [(path, chunk_id) for path, ids in recorded.items() for chunk_id in ids]
+        missing = set()
+        for start in range(0, len(pairs), self.CHUNK_CHECK_BATCH):
+            batch = pairs[start:start + self.CHUNK_CHECK_BATCH]
+            ids = [chunk_id for _, chunk_id in batch]
+            try:
+                present = self.vector_store.existing_ids(ids)
+                if self.keyword_index is not None:
+                    present &= self.keyword_index.existing_ids(ids)
+            except Exception as e:
+                logger.warning(f"Chunk check failed, re-ingesting the affected files: {e}")
+                present = set()
+            missing.update(path for path, chunk_id in batch if chunk_id not in present)
+        return missing
+    
+    def _ingest_files(self, files: List[Path]) -> Iterator[FileResult]:
+        """
+        Ingest files, yielding one result per file once its chunks are stored.
+        
+        With more than one worker (and file) the staged pipeline in
+        tools/parallel_ingestion.py is used; otherwise files go through
+        ingest_text one at a time.
+        
+        Args:
+            files: Files to ingest
+            
+        Yields:
+            FileResult per file (error set on failure)
+        """
+        if self.workers > 1 and len(files) > 1:
+            staged = StagedIngestion(
+                self.vector_store,
+                self._folder_metadata,
+                self.chunk_max_tokens,
+                self.chunk_overlap_tokens,
+                workers=self.workers,
+                embed_batch_size=self.embed_batch_size,
+                keyword_index=self.keyword_index,
+            )
+            yield from staged.run(files)
+            return
+        
+        for file_path in files:
+            logger.info(f"Ingesting: {file_path.name}")
+            try:
+                stat = file_path.stat()
+                data = file_path.read_bytes()
+                stored_count, docs = self.ingest_text(data.decode("utf-8"), self._folder_metadata(file_path))
+                if not docs:
+                    yield FileResult(path=file_path, error="nothing stored")
+                    continue
+                yield FileResult(path=file_path, data=data, stat=stat, documents=docs)
+            except Exception as e:
+                yield FileResult(path=file_path, error=str(e))
+    
+    def _store_documents(self, documents: List[VectorDocument]) -> Tuple[int, int]:
+        """
+        Upsert chunks into the vector store, then the keyword index.
+        
+        A keyword index failure is logged, not raised: the chunks are
+        retrievable by vector search, and folder ingestion re-ingests files
+        whose chunks the keyword index lacks.
+        
+        Returns:
+            (written, unchanged) counts of the vector store
+        """
+        written, unchanged = self.vector_store.upsert_documents(documents)
+        if self.keyword_index is not None and written + unchanged:
+            try:
+                self.keyword_index.upsert_documents(documents)
+            except Exception as e:
+                logger.warning(f"Keyword index update failed: {e}")
+        return written, unchanged
+    
+    def _delete_documents(self, ids: List[str]) -> int:
+        """
+        Delete chunks from the keyword index, then the vector store.
+        
+        Retrieval trusts the keyword index to hold no deleted chunks, so
+        its delete goes first and a failure is raised: the run stops
+        before the manifest is saved and the next run retries the delete.
+        
+        Returns:
+            Number of chunks deleted from the vector store
+        """
+        if self.keyword_index is not None:
+            self.keyword_index.delete_documents(ids)
+        return self.vector_store.delete_documents(ids)
+    
+    def _default_manifest_path(self) -> str:
+        """Manifest location for the pipeline's vector store collection."""
+        return os.getenv("INGESTION_MANIFEST_PATH") or os.path.join(
+            self.vector_store.persist_directory,
+            f"{self.vector_store.collection_name}.ingest_manifest.json",
+        )
+    
+    @staticmethod
+    def _folder_metadata(file_path: Path) -> VectorDocumentMetadata:
+        """Metadata for a curriculum library file (e.g., java.txt → Java)."""
+        title = file_path.stem.replace("_", " ").title()
+        return VectorDocumentMetadata(
+            institution_name="Sample Curriculum Library",
+            degree_level="undergraduate",
+            subject_domain="computer_science",
+            audience_level="beginner",
+            depth_level="foundational",
+            source_type=SourceType.SYLLABUS,
+            uploaded_by=UploadedBy.SYSTEM,
+            source_name=title,
+            original_url=str(file_path.absolute()),
+        )
 
     def ingest_example_curriculum(self) -> Tuple[int, List[VectorDocument]]:
         """
@@ -0,0 +1,165 @@
+"""
+PHASE 3 — Ingestion Manifest
+
+Records what folder ingestion has already stored, per source file:
+mtime, size, sha256 of the bytes and the chunk ids written for it.
+
+Change detection is two-level so a nightly refresh of a large library
+costs little more than a directory listing:
+- Same (mtime, size) as recorded: unchanged, the file is not read
+- Different stat: the file is hashed; same hash means unchanged (only
+  the stat is refreshed), otherwise it is modified
+
+Files recorded under the scanned folder but no longer present are removed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ManifestEntry:
+    """What was ingested from one file."""
+
+    mtime_ns: int
+    size: int
+    sha256: str
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FolderChanges:
+    """Result of comparing a folder listing with the manifest."""
+
+    added: List[Path] = field(default_factory=list)
+    modified: List[Path] = field(default_factory=list)
+    unchanged: List[Path] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)  # Manifest keys (absolute paths)
+
+
+class IngestionManifest:
+    """
+    JSON manifest of ingested files, keyed by absolute path.
+
+    One manifest belongs to one vector store collection and may cover
+    several folders; removal detection only looks at the folder scanned.
+    """
+
+    def __init__(self, path: str):
+        """
+        Load a manifest (a missing or unreadable file starts empty).
+
+        Args:
+            path: Manifest file path
+        """
+        self.path = path
+        self.entries: Dict[str, ManifestEntry] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    data = json.load(handle)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.entries = {key: ManifestEntry(**entry) for key, entry in data["files"].items()}
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable ingestion manifest {path}: {e}")
+
+    def diff(self, folder: Path, files: Iterable[Path]) -> FolderChanges:
+        """
+        Classify the files of a folder against the manifest.
+
+        Args:
+            folder: Folder that was scanned
+            files: Files found in it
+
+        Returns:
+            FolderChanges (removed = recorded under folder, not in files)
+        """
+        changes = FolderChanges()
+        seen = set()
+        for file_path in files:
+            key = self.key(file_path)
+            seen.add(key)
+            entry = self.entries.get(key)
+            if entry is None:
+                changes.added.append(file_path)
+                continue
+            stat = file_path.stat()
+            if stat.st_mtime_ns == entry.mtime_ns and stat.st_size == entry.size:
+                changes.unchanged.append(file_path)
+            elif self.hash_file(file_path) == entry.sha256:
+                entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size  # Touched only
+                changes.unchanged.append(file_path)
+            else:
+                changes.modified.append(file_path)
+
+        prefix = self.key(folder) + os.sep
+        changes.removed = [key for key in self.entries if key.startswith(prefix) and key not in seen]
+        return changes
+
+    def get(self, file_path: Path) -> Optional[ManifestEntry]:
+        """Recorded entry for a file, if any."""
+        return self.entries.get(self.key(file_path))
+
+    def record(
+        self,
+        file_path: Path,
+        data: bytes,
+        chunk_ids: List[str],
+        stat: Optional[os.stat_result] = None,
+    ) -> None:
+        """
+        Record a successfully ingested file.
+
+        Args:
+            file_path: Source file
+            data: The bytes that were ingested (hashed here)
+            chunk_ids: Ids of the chunks stored for it
+            stat: File stat taken before data was read (default: stat now)
+        """
+        stat = stat or file_path.stat()
+        self.entries[self.key(file_path)] = ManifestEntry(
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            sha256=hashlib.sha256(data).hexdigest(),
+            chunk_ids=chunk_ids,
+        )
+
+    def remove(self, key: str) -> None:
+        """Forget a file."""
+        self.entries.pop(key, None)
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"version": MANIFEST_VERSION, "files": {key: asdict(entry) for key, entry in self.entries.items()}},
+                handle,
+            )
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def key(file_path: Path) -> str:
+        """Manifest key of a path."""
+        return str(Path(file_path).absolute())
+
+    @staticmethod
+    def hash_file(file_path: Path) -> str:
+        """sha256 of a file's bytes, read in blocks."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
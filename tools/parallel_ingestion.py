@@ -0,0 +1,303 @@
+"""
+PHASE 3 — Staged Parallel Ingestion
+
+Folder ingestion as a pipeline of concurrent stages joined by bounded
+queues:
+
+    reader threads -> clean/chunk processes -> embedding batcher -> writer
+      (file I/O)       (decode, sentence         (existing-id check,   (caller's
+                        chunking, cleaning)       one embed_batch per   thread, bulk
+                                                  ~embed_batch_size     upsert into the
+                                                  chunks)               vector store and
+                                                                        keyword index)
+
+Cleaning and chunking are CPU bound and run in a process pool; reading
+and embedding release the GIL and run on threads. Every queue is bounded
+(and chunk jobs are capped at one in flight per worker process), so a full
+downstream stage blocks the stages above it: memory holds at most a few
+files per worker no matter how large the corpus is. A single writer keeps
+vector store mutations serialized.
+"""
+
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from schemas.vector_document import VectorDocument, VectorDocumentMetadata
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # End-of-stream marker between stages
+
+
+@dataclass
+class FileResult:
+    """Outcome of ingesting one file."""
+
+    path: Path
+    data: Optional[bytes] = None
+    stat: Optional[os.stat_result] = None
+    documents: List[VectorDocument] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def clean_and_chunk(data: bytes, chunk_max_tokens: int, chunk_overlap_tokens: int) -> List[str]:
+    """
+    Decode, chunk and clean one file (runs in a worker process).
+
+    Args:
+        data: Raw file bytes (UTF-8)
+        chunk_max_tokens: Token budget per chunk
+        chunk_overlap_tokens: Tokens shared by consecutive chunks
+
+    Returns:
+        List of text chunks
+    """
+    from tools.curriculum_ingestion import IngestionPipeline
+
+    return list(IngestionPipeline._sentence_chunks(data.decode("utf-8"), chunk_max_tokens, chunk_overlap_tokens))
+
+
+class StagedIngestion:
+    """
+    Runs files through the staged pipeline and yields per-file results.
+
+    Usage:
+        staged = StagedIngestion(store, metadata_fn, 667, 67, workers=8)
+        for result in staged.run(paths):
+            ...  # Called on the writer thread, after result's chunks are stored
+    """
+
+    def __init__(
+        self,
+        vector_store: Any,
+        metadata_fn: Callable[[Path], VectorDocumentMetadata],
+        chunk_max_tokens: int,
+        chunk_overlap_tokens: int,
+        workers: int,
+        embed_batch_size: int = 256,
+        queue_size: Optional[int] = None,
+        keyword_index: Optional[Any] = None,
+    ):
+        """
+        Initialize pipeline.
+
+        Args:
+            vector_store: Initialized VectorStore to write into
+            metadata_fn: Builds the chunk metadata of a file
+            chunk_max_tokens: Token budget per chunk
+            chunk_overlap_tokens: Tokens shared by consecutive chunks
+            workers: Clean/chunk processes (and reader threads)
+            embed_batch_size: Chunks per embedding call (files are not split)
+            queue_size: Capacity of each inter-stage queue (default 2 x workers)
+            keyword_index: KeywordIndex that also receives every stored chunk
+        """
+        self.vector_store = vector_store
+        self.metadata_fn = metadata_fn
+        self.chunk_max_tokens = chunk_max_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.workers = max(1, workers)
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.queue_size = queue_size or 2 * self.workers
+        self.keyword_index = keyword_index
+
+    def run(self, files: Sequence[Path]) -> Iterator[FileResult]:
+        """
+        Ingest files, yielding each result once its chunks are written.
+
+        Failed files are yielded with error set (and nothing stored for
+        them). Closing the iterator early stops every stage.
+
+        Args:
+            files: Files to ingest
+
+        Yields:
+            FileResult per file, in completion order
+        """
+        if not files:
+            return
+
+        stop = threading.Event()
+        paths: "queue.Queue" = queue.Queue()
+        for path in files:
+            paths.put(path)
+        paths.put(_DONE)
+        read_q: "queue.Queue" = queue.Queue(self.queue_size)
+        chunk_q: "queue.Queue" = queue.Queue(self.queue_size)
+        write_q: "queue.Queue" = queue.Queue(self.queue_size)
+
+        pool = ProcessPoolExecutor(max_workers=self.workers)
+        threads = [
+            *self._stage("ingest-read", self.workers, paths, read_q, self._read, stop),
+            *self._stage("ingest-chunk", self.workers, read_q, chunk_q, lambda item: self._chunk(pool, item), stop),
+            threading.Thread(target=self._embed_loop, args=(chunk_q, write_q, stop), name="ingest-embed", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = write_q.get()
+                if item is _DONE:
+                    break
+                yield from self._write(*item)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def _stage(
+        self,
+        name: str,
+        count: int,
+        in_q: "queue.Queue",
+        out_q: "queue.Queue",
+        fn: Callable[[Any], Any],
+        stop: threading.Event,
+    ) -> List[threading.Thread]:
+        """
+        Threads applying fn to every item of in_q; the last one to finish
+        forwards the end-of-stream marker to out_q.
+        """
+        remaining = [count]
+        lock = threading.Lock()
+
+        def work() -> None:
+            while True:
+                item = self._get(in_q, stop)
+                if item is _DONE:
+                    in_q.put(_DONE)  # Let sibling workers see it too
+                    break
+                if not self._put(out_q, fn(item), stop):
+                    return
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._put(out_q, _DONE, stop)
+
+        return [threading.Thread(target=work, name=f"{name}-{i}", daemon=True) for i in range(count)]
+
+    @staticmethod
+    def _read(path: Path) -> FileResult:
+        """Reader stage: stat, then read the bytes."""
+        try:
+            stat = path.stat()
+            return FileResult(path=path, data=path.read_bytes(), stat=stat)
+        except Exception as e:
+            return FileResult(path=path, error=str(e))
+
+    def _chunk(self, pool: ProcessPoolExecutor, result: FileResult) -> FileResult:
+        """Chunk stage: clean/chunk in a worker process, attach metadata."""
+        if result.error:
+            return result
+        try:
+            chunks = pool.submit(
+                clean_and_chunk, result.data, self.chunk_max_tokens, self.chunk_overlap_tokens
+            ).result()
+            metadata = self.metadata_fn(result.path)
+            result.documents = [
+                VectorDocument(content=chunk, metadata=metadata, chunk_index=i)
+                for i, chunk in enumerate(chunks)
+            ]
+            for doc in result.documents:
+                doc.validate()
+            if not result.documents:
+                result.error = "no text"
+        except Exception as e:
+            result.documents, result.error = [], str(e)
+        return result
+
+    def _embed_loop(self, chunk_q: "queue.Queue", write_q: "queue.Queue", stop: threading.Event) -> None:
+        """Embedding stage: group files into batches of about embed_batch_size chunks."""
+        batch: List[FileResult] = []
+        chunks = 0
+        while True:
+            result = self._get(chunk_q, stop)
+            if result is _DONE:
+                break
+            if result.error:
+                if not self._put(write_q, ([result], [], None), stop):
+                    return
+                continue
+            batch.append(result)
+            chunks += len(result.documents)
+            if chunks >= self.embed_batch_size:
+                if not self._put(write_q, self._embed(batch), stop):
+                    return
+                batch, chunks = [], 0
+        if batch and not stop.is_set():
+            self._put(write_q, self._embed(batch), stop)
+        self._put(write_q, _DONE, stop)
+
+    def _embed(self, batch: List[FileResult]) -> Tuple[List[FileResult], List[VectorDocument], Any]:
+        """Embed the chunks of a batch that the store doesn't hold yet."""
+        try:
+            documents = [doc for result in batch for doc in result.documents]
+            ids = [doc.to_chroma_format()["id"] for doc in documents]
+            existing = self.vector_store.existing_ids(ids)
+            pending = [doc for doc, doc_id in zip(documents, ids) if doc_id not in existing]
+            embeddings = (
+                self.vector_store.embedding_service.embed_batch([doc.content for doc in pending])
+                if pending else None
+            )
+            return batch, pending, embeddings
+        except Exception as e:
+            for result in batch:
+                result.error = f"embedding failed: {e}"
+            return batch, [], None
+
+    def _write(
+        self,
+        batch: List[FileResult],
+        pending: List[VectorDocument],
+        embeddings: Any,
+    ) -> Iterator[FileResult]:
+        """Writer stage (caller's thread): one bulk upsert per batch."""
+        if pending:
+            written, _ = self.vector_store.upsert_documents(pending, embeddings=embeddings)
+            if written == 0:
+                for result in batch:
+                    result.error = "vector store write failed"
+        if self.keyword_index is not None:
+            # All chunks, not just pending ones: the keyword index may lag the store
+            stored = [doc for result in batch if not result.error for doc in result.documents]
+            try:
+                self.keyword_index.upsert_documents(stored)
+            except Exception as e:
+                logger.warning(f"Keyword index update failed: {e}")
+        for result in batch:
+            if result.error:
+                result.documents = []
+            yield result
+
+    @staticmethod
+    def _get(in_q: "queue.Queue", stop: threading.Event) -> Any:
+        """Blocking get; returns the end-of-stream marker once the pipeline is stopped."""
+        while not stop.is_set():
+            try:
+                return in_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    @staticmethod
+    def _put(out_q: "queue.Queue", item: Any, stop: threading.Event) -> bool:
+        """Blocking put that gives up once the pipeline is stopped."""
+        while not stop.is_set():
+            try:
+                out_q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -1,22 +1,164 @@
-"""PDF handling tools."""
+"""
+PDF handling tools.
 
+Extraction streams page by page (PHASE 3+): pages are yielded as they are
+extracted and chunked incrementally, so memory is bounded by a chunk plus
+the pages in flight rather than by the document. Large PDFs spread page
+ranges over a process pool (text extraction is pure-Python CPU work).
+"""
+
+import logging
 import os
 import shutil
-from typing import Tuple, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extract pages [start, stop) of a PDF (runs in a worker process).
+    
+    Args:
+        file_path: Path to PDF file
+        start: First page index (0-based)
+        stop: Page index after the last one
+        
+    Returns:
+        Text of each page ("" for pages without text)
+    """
+    import PyPDF2
+    
+    with open(file_path, "rb") as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
 
 
 class PDFProcessor:
     """Utilities for PDF extraction and chunking."""
     
+    # Page-parallel extraction: used from this many pages, in tasks of PAGES_PER_TASK
+    PARALLEL_MIN_PAGES = 64
+    PAGES_PER_TASK = 16
+    
     @staticmethod
     def extract_text(file_path: str) -> str:
-        """Extract all text from PDF (PHASE 3+)."""
-        raise NotImplementedError("PHASE 3")
+        """
+        Extract all text from PDF (PHASE 3+).
+        
+        Args:
+            file_path: Path to PDF file
+            
+        Returns:
+            Extracted text ("" if PyPDF2 is unavailable or nothing extracted)
+        """
+        return "\n".join(text for _, text in PDFProcessor.iter_pages(file_path)).strip()
+    
+    @staticmethod
+    def iter_pages(file_path: str, workers: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Yield the text of each page, in order (PHASE 3+).
+        
+        PDFs with at least PARALLEL_MIN_PAGES pages are extracted by a
+        process pool, with at most two page ranges per worker in flight.
+        
+        Args:
+            file_path: Path to PDF file
+            workers: Extraction processes (default: PDF_EXTRACT_WORKERS or the
+                CPU count; 1 = in this process)
+            
+        Yields:
+            (page_number, text) with 1-based page numbers; nothing if PyPDF2
+            is unavailable
+        """
+        try:
+            import PyPDF2
+        except ImportError:
+            logger.warning("PyPDF2 not installed. PDF extraction unavailable.")
+            return
+        
+        workers = workers or int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+        with open(file_path, "rb") as pdf_file:
+            reader = PyPDF2.PdfReader(pdf_file)
+            page_count = len(reader.pages)
+            if workers <= 1 or page_count < PDFProcessor.PARALLEL_MIN_PAGES:
+                for i, page in enumerate(reader.pages):
+                    yield i + 1, page.extract_text() or ""
+                return
+        
+        def drain_oldest(in_flight: deque) -> Iterator[Tuple[int, str]]:
+            start, future = in_flight.popleft()
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, text
+        
+        step = PDFProcessor.PAGES_PER_TASK
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight: deque = deque()
+            for start in range(0, page_count, step):
+                stop = min(start + step, page_count)
+                in_flight.append((start, pool.submit(_extract_page_range, file_path, start, stop)))
+                if len(in_flight) >= 2 * workers:
+                    yield from drain_oldest(in_flight)
+            while in_flight:
+                yield from drain_oldest(in_flight)
     
     @staticmethod
-    def chunk_pdf_content(text: str, chunk_size: int = 500) -> list:
-        """Split PDF text into overlapping chunks (PHASE 3+)."""
-        raise NotImplementedError("PHASE 3")
+    def iter_chunks(
+        pages: Iterable[Tuple[int, str]],
+        chunk_size: int = 500,
+        overlap: int = 50,
+    ) -> Iterator[Tuple[str, int, int]]:
+        """
+        Incrementally cut paged text into overlapping word chunks (PHASE 3+).
+        
+        Only the current window of words is held, so pages can be consumed
+        from a generator. The last chunk is the remaining words plus the
+        overlap (no chunk consists of overlap only).
+        
+        Args:
+            pages: (page_number, text) pairs in reading order
+            chunk_size: Words per chunk
+            overlap: Words shared by consecutive chunks
+            
+        Yields:
+            (chunk_text, first_page, last_page)
+        """
+        if not 0 <= overlap < chunk_size:
+            raise ValueError("overlap must be >= 0 and smaller than chunk_size")
+        step = chunk_size - overlap
+        words: List[str] = []
+        word_pages: List[int] = []
+        fresh = 0  # Words not yet part of an emitted chunk
+        
+        for page_number, text in pages:
+            for word in text.split():
+                words.append(word)
+                word_pages.append(page_number)
+                fresh += 1
+                if len(words) == chunk_size:
+                    yield " ".join(words), word_pages[0], word_pages[-1]
+                    del words[:step], word_pages[:step]
+                    fresh = 0
+        
+        if fresh:
+            yield " ".join(words), word_pages[0], word_pages[-1]
+    
+    @staticmethod
+    def chunk_pdf_content(text: str, chunk_size: int = 500, overlap: int = 50) -> list:
+        """
+        Split PDF text into overlapping chunks (PHASE 3+).
+        
+        Args:
+            text: Extracted text
+            chunk_size: Words per chunk
+            overlap: Words shared by consecutive chunks
+            
+        Returns:
+            List of chunk strings
+        """
+        return [chunk for chunk, _, _ in PDFProcessor.iter_chunks([(1, text)], chunk_size, overlap)]
     
     @staticmethod
     def save_uploaded_pdf(uploaded_file, session_temp_dir: str) -> Tuple[str, dict]:
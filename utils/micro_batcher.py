@@ -0,0 +1,219 @@
+"""
+Micro-batching for batched model calls (PHASE 3+).
+
+Many requests each embed one query; a local model is far cheaper per item
+when it sees them together. MicroBatcher collects single-item submissions
+from any thread (or coroutine) and hands them to a batch function in
+one call.
+
+Batching is load-driven:
+- While a batch is being computed, new submissions queue up; the next
+  batch takes everything waiting, so batch size grows with concurrency
+- A lone request is dispatched immediately (max_wait_ms=0) or after a
+  short collection window
+- Batches are capped by item count and by total text size, so a burst of
+  long chunks is split instead of producing one oversized forward pass
+
+Batch functions run on a small thread pool, never on the asyncio loop.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-item calls into batched calls.
+
+    Usage:
+        batcher = MicroBatcher(model.embed_batch, max_batch_size=64)
+        vector = batcher.submit("query").result()   # from a worker thread
+        vector = await batcher.asubmit("query")     # from a coroutine
+        futures = batcher.submit_many(["q1", "q2"]) # several at once
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[str]], Sequence[Any]],
+        max_batch_size: int = 64,
+        max_batch_chars: int = 64_000,
+        max_wait_ms: float = 0.0,
+        num_workers: int = 1,
+    ):
+        """
+        Initialize batcher.
+
+        Args:
+            batch_fn: Maps a list of texts to one result per text (same order)
+            max_batch_size: Maximum items per batch_fn call
+            max_batch_chars: Maximum total characters per call (>= 1 item always)
+            max_wait_ms: Extra time to wait for companions once an item arrives
+            num_workers: Threads running batch_fn concurrently
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_batch_chars = max_batch_chars
+        self.max_wait_ms = max_wait_ms
+        self.num_workers = num_workers
+
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._slots = threading.Semaphore(num_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._carry: Optional[Tuple[str, Future]] = None  # Item that didn't fit the last batch
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue one item.
+
+        Args:
+            text: Input for batch_fn
+
+        Returns:
+            Future resolving to this item's result
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._ensure_started()
+            self._queue.put((text, future))
+        return future
+
+    def submit_many(self, texts: Sequence[str]) -> List[Future]:
+        """
+        Queue several items at once (e.g. all queries of one request).
+
+        They join whatever else is waiting, so a multi-query request and
+        concurrent single queries still share forward passes.
+
+        Args:
+            texts: Inputs for batch_fn
+
+        Returns:
+            One future per text (same order)
+        """
+        futures: List[Future] = [Future() for _ in texts]
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._ensure_started()
+            for text, future in zip(texts, futures):
+                self._queue.put((text, future))
+        return futures
+
+    async def asubmit(self, text: str) -> Any:
+        """Queue one item and await its result without blocking the loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get batch counters."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def close(self) -> None:
+        """Stop the dispatcher after queued items are processed."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            dispatcher = self._dispatcher
+            if dispatcher is not None:
+                self._queue.put(None)
+        if dispatcher is not None:
+            dispatcher.join()
+            self._executor.shutdown(wait=True)
+
+    def _ensure_started(self) -> None:
+        """Start the dispatcher thread and worker pool on first use."""
+        if self._dispatcher is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.num_workers, thread_name_prefix="micro-batch"
+            )
+            self._dispatcher = threading.Thread(
+                target=self._dispatch_loop, name="micro-batch-dispatcher", daemon=True
+            )
+            self._dispatcher.start()
+
+    def _dispatch_loop(self) -> None:
+        """Form batches as workers free up; exit on the close sentinel."""
+        while True:
+            self._slots.acquire()  # Wait for a free worker: items pile up meanwhile
+            batch, stop = self._collect()
+            if batch:
+                self._executor.submit(self._run_batch, batch)
+            else:
+                self._slots.release()
+            if stop:
+                return
+
+    def _collect(self) -> Tuple[List[Tuple[str, Future]], bool]:
+        """
+        Take the next batch off the queue.
+
+        Returns:
+            (items, stop) — stop is True once the close sentinel was seen
+        """
+        first = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        if first is None:
+            return [], True
+
+        batch = [first]
+        chars = len(first[0])
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            if chars + len(item[0]) > self.max_batch_chars:
+                self._carry = item
+                break
+            batch.append(item)
+            chars += len(item[0])
+        return batch, False
+
+    def _run_batch(self, batch: List[Tuple[str, Future]]) -> None:
+        """Call batch_fn once and resolve every future in the batch."""
+        try:
+            live = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not live:
+                return
+            with self._lock:
+                self.batches += 1
+                self.items += len(live)
+                self.largest_batch = max(self.largest_batch, len(live))
+            try:
+                results = self.batch_fn([text for text, _ in live])
+                if len(results) != len(live):
+                    raise RuntimeError(
+                        f"batch_fn returned {len(results)} results for {len(live)} inputs"
+                    )
+            except Exception as e:
+                for _, future in live:
+                    future.set_exception(e)
+                return
+            for (_, future), result in zip(live, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
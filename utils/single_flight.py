@@ -0,0 +1,112 @@
+"""
+Single-flight call coalescing (PHASE 2+).
+
+Concurrent callers asking for the same key share one in-flight execution
+instead of each doing the work. Used by the orchestrator to coalesce
+identical retrieval / web search queries across a batch.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls that share a key.
+
+    Design:
+    - The first caller for a key starts the work; later callers await it
+    - The shared task is shielded, so one caller being cancelled does not
+      cancel the work for everybody else
+    - memoize=True additionally keeps successful results for the lifetime
+      of this object (e.g., one batch); failures are never memoized, nor
+      are results a caller's cacheable() predicate rejects (e.g. degraded
+      outputs an agent returns instead of raising)
+    """
+
+    def __init__(self, memoize: bool = False):
+        """
+        Initialize coalescer.
+
+        Args:
+            memoize: Keep completed results and serve them to later callers
+        """
+        self.memoize = memoize
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._results: Dict[Hashable, Any] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Run fn() once per key among concurrent (or, if memoized, all) callers.
+
+        Args:
+            key: Hashable identity of the work
+            fn: Zero-arg coroutine factory that performs the work
+            cacheable: With memoize, only results it accepts are kept
+
+        Returns:
+            The (shared) result of fn()
+        """
+        return await asyncio.shield(self.start(key, fn, cacheable))
+
+    def start(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> asyncio.Future:
+        """
+        Join (or start) the shared execution for a key without awaiting it.
+
+        For callers that need the shared task itself, e.g. to follow its
+        progress; they must not cancel it while others may be waiting.
+
+        Args:
+            key: Hashable identity of the work
+            fn: Zero-arg coroutine factory, called now if nothing is in flight
+            cacheable: With memoize, only results it accepts are kept
+
+        Returns:
+            The shared task (an already completed future for memoized keys)
+        """
+        self.calls += 1
+
+        if self.memoize and key in self._results:
+            self.coalesced += 1
+            done = asyncio.get_running_loop().create_future()
+            done.set_result(self._results[key])
+            return done
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._on_done(k, t, cacheable))
+        return task
+
+    def _on_done(
+        self, key: Hashable, task: asyncio.Future, cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> None:
+        """Drop finished work from the in-flight table (and memoize success)."""
+        self._inflight.pop(key, None)
+        if self.memoize and not task.cancelled() and task.exception() is None:
+            if cacheable is None or cacheable(task.result()):
+                self._results[key] = task.result()
+
+    def stats(self) -> Dict[str, int]:
+        """Get call / coalescing counters."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "executed": self.calls - self.coalesced,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,207 @@
+"""
+Incremental JSON parser for streamed LLM output (PHASE 5+).
+
+LLM responses arrive as text chunks and are often wrapped in markdown fences
+or prose. This parser is fed chunk by chunk and:
+- Skips anything before the root JSON object (fences, "Here is...")
+- Yields items of selected top-level arrays (e.g. "modules") as soon as each
+  item closes, so downstream work can overlap with generation
+- Produces the full document once the root object closes
+
+Each character is inspected exactly once; a candidate root that turns out
+not to be valid JSON (e.g. "{braces}" in prose) is dropped and scanning
+simply continues, so the buffer is never rescanned. A backtick outside a
+string can't be JSON, so an unbalanced "{" in prose is dropped when the
+code fence after it opens and the fenced object becomes the candidate.
+"""
+
+import json
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    Resumable single-pass parser for one JSON object embedded in text.
+
+    Usage:
+        parser = IncrementalJSONParser(stream_arrays=("modules",))
+        async for chunk in llm.generate_streaming(prompt):
+            for key, item in parser.feed(chunk):
+                ...  # item of root[key], fully parsed
+        document = parser.close()
+    """
+
+    def __init__(self, stream_arrays: Iterable[str] = ()):
+        """
+        Initialize parser.
+
+        Args:
+            stream_arrays: Top-level keys whose array items are yielded early
+        """
+        self.stream_arrays = frozenset(stream_arrays)
+        self.discarded_candidates = 0  # Brace-delimited text that wasn't JSON
+        self._result: Any = None
+        self._done = False
+        self._reset_candidate()
+
+    def _reset_candidate(self) -> None:
+        """Forget the current root candidate (state only; input is not re-read)."""
+        self._stack: List[str] = []  # Open containers: "{" / "["
+        self._in_string = False
+        self._escape = False
+        self._root_chars: List[str] = []
+        self._key_chars: Optional[List[str]] = None  # Root-level string being read
+        self._last_key: Optional[str] = None
+        self._stream_key: Optional[str] = None  # Streamed array we are inside
+        self._item_chars: Optional[List[str]] = None
+
+    @property
+    def done(self) -> bool:
+        """True once a complete root object has been parsed."""
+        return self._done
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume the next chunk of text.
+
+        Args:
+            chunk: Raw LLM output
+
+        Returns:
+            (array_key, item) pairs completed within this chunk
+        """
+        completed = []
+        if self._done:
+            return completed
+
+        stack = self._stack
+        for char in chunk:
+            if not stack:
+                if char != "{":
+                    continue  # Preamble / fence before the root object
+                self._root_chars = []
+
+            self._root_chars.append(char)
+            if self._item_chars is not None:
+                self._item_chars.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                    continue
+                if self._key_chars is not None:
+                    self._key_chars.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if len(stack) == 1:
+                    self._key_chars = []
+            elif char == "{" or char == "[":
+                stack.append(char)
+                depth = len(stack)
+                if depth == 2 and char == "[" and self._last_key in self.stream_arrays:
+                    self._stream_key = self._last_key
+                elif depth == 3 and self._stream_key is not None:
+                    self._item_chars = [char]
+            elif char == "`":
+                # Code fence (or inline code) inside a candidate: it wasn't JSON
+                self.discarded_candidates += 1
+                self._reset_candidate()
+                stack = self._stack
+            elif char == "}" or char == "]":
+                stack.pop()
+                depth = len(stack)
+                if depth == 2 and self._item_chars is not None:
+                    try:
+                        completed.append((self._stream_key, json.loads("".join(self._item_chars))))
+                    except json.JSONDecodeError:
+                        pass  # Surfaces (or not) when the root is parsed
+                    self._item_chars = None
+                elif depth == 1 and char == "]":
+                    self._stream_key = None
+                elif depth == 0:
+                    self._finish_candidate()
+                    if self._done:
+                        break
+                    stack = self._stack
+
+        return completed
+
+    def _finish_candidate(self) -> None:
+        """Root braces balanced: parse it, or drop it and keep scanning."""
+        try:
+            self._result = json.loads("".join(self._root_chars))
+            self._done = True
+        except json.JSONDecodeError:
+            self.discarded_candidates += 1
+            self._reset_candidate()
+
+    def close(self) -> Any:
+        """
+        Finish parsing.
+
+        Returns:
+            The parsed root object
+
+        Raises:
+            ValueError: If no complete, valid JSON object was seen
+        """
+        if self._done:
+            return self._result
+        if self._stack:
+            raise ValueError("Truncated JSON: stream ended inside the root object")
+        raise ValueError("No JSON object found in response")
+
+
+def parse_json_document(text: str, parser: Optional[IncrementalJSONParser] = None) -> Any:
+    """
+    Parse the JSON object of an LLM response (fences/prose tolerated).
+
+    A ```json fenced block is the answer when it parses: prose before it
+    may hold a complete object of its own (e.g. "returns `{}` when
+    empty"), which the scan would otherwise return first. Without one,
+    the first object found by the scan wins; if the scan fails (e.g.
+    prose before a fence opened a string that swallowed it), each other
+    fenced block is tried on its own.
+
+    Args:
+        text: Full LLM response
+        parser: IncrementalJSONParser already fed text (e.g. while
+            streaming), so the scan is not repeated
+
+    Returns:
+        Parsed object
+
+    Raises:
+        ValueError: If no valid JSON object is found
+    """
+    for block in _JSON_FENCED_BLOCK.findall(text):
+        fenced = IncrementalJSONParser()
+        fenced.feed(block)
+        if fenced.done:
+            return fenced.close()
+    if parser is None:
+        parser = IncrementalJSONParser()
+        parser.feed(text)
+    try:
+        return parser.close()
+    except ValueError:
+        for block in _FENCED_BLOCK.findall(text):
+            fenced = IncrementalJSONParser()
+            fenced.feed(block)
+            if fenced.done:
+                return fenced.close()
+        raise
+
+
+_FENCED_BLOCK = re.compile(r"```[^\n`]*\n(.*?)```", re.DOTALL)
+_JSON_FENCED_BLOCK = re.compile(r"```[ \t]*json[ \t]*\n(.*?)```", re.DOTALL | re.IGNORECASE)
@@ -0,0 +1,197 @@
+"""
+Sentence-aware streaming text chunker (PHASE 3+).
+
+Walks the text once with a regex over sentence boundaries and packs whole
+sentences into chunks under a token budget. Only the sentences of the
+current chunk are held, so memory per document is O(chunk) and chunks are
+yielded lazily; nothing splits the whole document into a word list.
+
+Rules:
+- Boundaries are sentence punctuation followed by whitespace, and line
+  breaks (syllabi are full of unpunctuated headings and list items)
+- The sentences of a chunk add up to at most max_tokens; a single
+  sentence longer than that is cut at word boundaries
+- Consecutive chunks share up to overlap_tokens of trailing whole sentences
+- A final chunk below min_tokens is merged into the previous one (which
+  may then exceed the budget by less than min_tokens), so no document ends
+  with a fragment too short to index
+"""
+
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+# Same heuristic as the LLM services' estimate_tokens fallback (no tokenizer needed)
+CHARS_PER_TOKEN = 4
+
+# Sentence end (punctuation, optional closing quote/bracket, whitespace) or line break
+_BOUNDARY = re.compile(r"[.!?][\"'”’)\]]*\s+|\s*\n\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text (at least 1 for non-empty text)."""
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def iter_sentences(text: str) -> Iterator[str]:
+    """
+    Yield the sentences of text, whitespace-normalized, in one pass.
+
+    Args:
+        text: Raw text
+
+    Yields:
+        Non-empty sentences (or lines) with internal whitespace collapsed
+    """
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        sentence = " ".join(text[start:match.end()].split())
+        if sentence:
+            yield sentence
+        start = match.end()
+    sentence = " ".join(text[start:].split())
+    if sentence:
+        yield sentence
+
+
+class SentenceChunker:
+    """
+    Packs sentences into token-budgeted, overlapping chunks.
+
+    Usage:
+        chunker = SentenceChunker(max_tokens=600, overlap_tokens=60)
+        for chunk in chunker.chunks(text):
+            ...
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 600,
+        overlap_tokens: int = 60,
+        min_tokens: Optional[int] = None,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ):
+        """
+        Initialize chunker.
+
+        Args:
+            max_tokens: Token budget per chunk
+            overlap_tokens: Tokens of trailing sentences repeated in the next chunk
+            min_tokens: Smallest final chunk kept on its own (default max_tokens // 4)
+            token_counter: Maps text to a token count
+        """
+        if max_tokens < 1 or not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("need max_tokens >= 1 and 0 <= overlap_tokens < max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = max_tokens // 4 if min_tokens is None else min_tokens
+        self.token_counter = token_counter
+
+    def chunks(self, text: str) -> Iterator[str]:
+        """
+        Chunk one text lazily.
+
+        Args:
+            text: Raw text (whitespace is normalized per sentence)
+
+        Yields:
+            Chunk strings
+        """
+        for chunk, _, _ in self.pack((sentence, 0) for sentence in iter_sentences(text)):
+            yield chunk
+
+    def chunks_from_pages(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[str, int, int]]:
+        """
+        Chunk paged text (e.g. a PDF page stream) lazily.
+
+        Sentences are taken per page, so a sentence running across a page
+        break counts as two.
+
+        Args:
+            pages: (page_number, text) pairs in reading order
+
+        Yields:
+            (chunk, first_page, last_page)
+        """
+        return self.pack(
+            (sentence, page_number)
+            for page_number, text in pages
+            for sentence in iter_sentences(text)
+        )
+
+    def pack(self, sentences: Iterable[Tuple[str, int]]) -> Iterator[Tuple[str, int, int]]:
+        """
+        Pack tagged sentences into chunks.
+
+        Args:
+            sentences: (sentence, tag) pairs; tags are reported as the
+                chunk's first/last tag (page numbers)
+
+        Yields:
+            (chunk, first_tag, last_tag)
+        """
+        window: List[Tuple[str, int, int]] = []  # (sentence, tag, tokens)
+        window_tokens = 0
+        fresh = 0  # Trailing sentences of window not yet in an emitted chunk
+        held: Optional[Tuple[str, int, int]] = None  # Last chunk, held back for a tail merge
+
+        for sentence, tag, tokens in self._bounded(sentences):
+            if fresh and window_tokens + tokens > self.max_tokens:
+                if held is not None:
+                    yield held
+                held = self._join(window)
+                window, window_tokens = self._overlap(window)
+                fresh = 0
+                while window and window_tokens + tokens > self.max_tokens:
+                    window_tokens -= window.pop(0)[2]
+            window.append((sentence, tag, tokens))
+            window_tokens += tokens
+            fresh += 1
+
+        if not fresh:
+            if held is not None:
+                yield held
+            return
+        tail = window[-fresh:]
+        if held is not None and sum(tokens for _, _, tokens in tail) < self.min_tokens:
+            text, first, _ = held
+            yield f"{text} {self._join(tail)[0]}", first, tail[-1][1]
+            return
+        if held is not None:
+            yield held
+        yield self._join(window)
+
+    def _bounded(self, sentences: Iterable[Tuple[str, int]]) -> Iterator[Tuple[str, int, int]]:
+        """Count sentence tokens, cutting sentences over budget at word boundaries."""
+        for sentence, tag in sentences:
+            tokens = self.token_counter(sentence)
+            if tokens <= self.max_tokens:
+                yield sentence, tag, tokens
+                continue
+            piece: List[str] = []
+            piece_tokens = 0
+            for word in sentence.split():
+                tokens = self.token_counter(word + " ")
+                if piece and piece_tokens + tokens > self.max_tokens:
+                    yield " ".join(piece), tag, piece_tokens
+                    piece, piece_tokens = [], 0
+                piece.append(word)
+                piece_tokens += tokens
+            if piece:
+                yield " ".join(piece), tag, piece_tokens
+
+    def _overlap(self, window: List[Tuple[str, int, int]]) -> Tuple[List[Tuple[str, int, int]], int]:
+        """Trailing sentences of window within overlap_tokens (never all of it)."""
+        kept: List[Tuple[str, int, int]] = []
+        kept_tokens = 0
+        for entry in reversed(window[1:]):
+            if kept_tokens + entry[2] > self.overlap_tokens:
+                break
+            kept.append(entry)
+            kept_tokens += entry[2]
+        kept.reverse()
+        return kept, kept_tokens
+
+    @staticmethod
+    def _join(window: List[Tuple[str, int, int]]) -> Tuple[str, int, int]:
+        """Chunk text and tag range of a window."""
+        return " ".join(sentence for sentence, _, _ in window), window[0][1], window[-1][1]
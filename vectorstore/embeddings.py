@@ -1,16 +1,52 @@
 """Embeddings wrapper (PHASE 3)."""
 
+import asyncio
+from typing import List, Optional
+
+from services.embedding_service import EmbeddingService, get_embedding_service
 from vectorstore.chroma_client import EmbeddingProvider
 
 
 class LangChainEmbeddings(EmbeddingProvider):
     """
-    Use LangChain Embeddings abstraction for flexibility.
-    
-    Supports:
-    - OpenAI Embeddings
-    - Anthropic Embeddings
-    - Local embeddings (sentence-transformers)
+    LangChain-compatible view of the configured EmbeddingService.
+
+    Implements the LangChain Embeddings interface (embed_documents /
+    embed_query and their async variants) by duck typing, so LangChain
+    components share the same backend, micro-batcher and vectors as the
+    rest of the system without importing langchain here.
     """
-    
-    pass
+
+    def __init__(self, service: Optional[EmbeddingService] = None):
+        """
+        Initialize wrapper.
+
+        Args:
+            service: Embedding service (default: global get_embedding_service())
+        """
+        self.service = service or get_embedding_service()
+
+    def embed_text(self, text: str) -> List[float]:
+        """Generate embedding for text."""
+        return self.service.embed_text(text)
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for batch of texts."""
+        return self.service.embed_texts(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """LangChain: embed documents for storage."""
+        return self.service.embed_texts(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """LangChain: embed a search query."""
+        return self.service.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """LangChain: async embed_documents (runs on a worker thread)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.service.embed_texts, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """LangChain: async embed_query (micro-batched when supported)."""
+        return await self.service.aembed_query(text)